@@ -0,0 +1,153 @@
+import asyncio
+import json
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+from fastapi import WebSocket, WebSocketDisconnect
+
+logger = logging.getLogger("BroadcastHub")
+
+class Subscriber:
+    """A connected websocket client with its own bounded outbound queue."""
+    __slots__ = ('websocket', 'queue', 'min_interval', 'last_enqueued', 'dropped', 'sent', 'closed')
+
+    def __init__(self, websocket: WebSocket, queue_size: int, max_rate_hz: Optional[float]):
+        self.websocket = websocket
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.min_interval = 1.0 / max_rate_hz if max_rate_hz else 0.0
+        self.last_enqueued = 0.0
+        self.dropped = 0
+        self.sent = 0
+        self.closed = False
+
+class BroadcastHub:
+    """
+    Publish/subscribe fan-out for dashboard websockets.
+    A single producer task builds and serializes each update once; every subscriber
+    gets the same string through a bounded queue. Full queues drop their oldest
+    message (clients only need the latest state), and clients that keep falling
+    behind or block on send are disconnected so they can't stall the others.
+    """
+
+    def __init__(
+        self,
+        producer: Callable[[], Awaitable[Dict[str, Any]]],
+        interval: float = 1.0,
+        queue_size: int = 4,
+        max_dropped: int = 20,
+        send_timeout: float = 2.0
+    ):
+        """
+        Args:
+            producer: Coroutine function returning the next update (JSON-serializable dict).
+            interval (float): Seconds between updates (the fastest rate any client can get).
+            queue_size (int): Per-client outbound buffer.
+            max_dropped (int): Consecutive drops after which a client is disconnected.
+            send_timeout (float): Seconds a single send may block before the client is dropped.
+        """
+        self.producer = producer
+        self.interval = interval
+        self.queue_size = queue_size
+        self.max_dropped = max_dropped
+        self.send_timeout = send_timeout
+        self.subscribers = set()
+        self.running = False
+        self._task: Optional[asyncio.Task] = None
+        self.metrics = {
+            'published': 0,
+            'deliveries': 0,
+            'dropped': 0,
+            'slow_disconnects': 0,
+            'producer_errors': 0,
+            'last_produce_ms': 0.0
+        }
+
+    async def start(self):
+        if self.running:
+            return
+        self.running = True
+        self._task = asyncio.create_task(self._produce_loop())
+        logger.info(f"Broadcast hub started ({1 / self.interval:.1f} updates/s)")
+
+    async def stop(self):
+        self.running = False
+        if self._task:
+            self._task.cancel()
+            self._task = None
+        for subscriber in list(self.subscribers):
+            await self._disconnect(subscriber)
+
+    async def serve(self, websocket: WebSocket, max_rate_hz: Optional[float] = None):
+        """Stream updates to an accepted websocket until it disconnects or falls behind."""
+        subscriber = Subscriber(websocket, self.queue_size, max_rate_hz)
+        self.subscribers.add(subscriber)
+        logger.info(f"Subscriber joined ({len(self.subscribers)} connected)")
+        try:
+            while not subscriber.closed:
+                message = await subscriber.queue.get()
+                if message is None: # Disconnect sentinel
+                    break
+                await asyncio.wait_for(websocket.send_text(message), self.send_timeout)
+                subscriber.sent += 1
+                subscriber.dropped = 0
+                self.metrics['deliveries'] += 1
+        except asyncio.TimeoutError:
+            self.metrics['slow_disconnects'] += 1
+            logger.warning("Subscriber send timed out. Disconnecting slow client.")
+        except WebSocketDisconnect:
+            pass
+        finally:
+            self.subscribers.discard(subscriber)
+            await self._close_socket(subscriber)
+            logger.info(f"Subscriber left ({len(self.subscribers)} connected)")
+
+    def publish(self, message: str):
+        """Fan one serialized message out to every subscriber without awaiting any of them."""
+        now = time.monotonic()
+        for subscriber in list(self.subscribers):
+            if subscriber.closed or now - subscriber.last_enqueued < subscriber.min_interval:
+                continue
+            if subscriber.queue.full():
+                subscriber.queue.get_nowait() # Drop oldest, keep the freshest state
+                subscriber.dropped += 1
+                self.metrics['dropped'] += 1
+                if subscriber.dropped >= self.max_dropped:
+                    self.metrics['slow_disconnects'] += 1
+                    logger.warning(f"Subscriber dropped {subscriber.dropped} updates. Disconnecting slow client.")
+                    self._evict(subscriber)
+                    continue
+            subscriber.queue.put_nowait(message)
+            subscriber.last_enqueued = now
+        self.metrics['published'] += 1
+
+    async def _produce_loop(self):
+        while self.running:
+            started = time.perf_counter()
+            if self.subscribers:
+                try:
+                    payload = await self.producer()
+                    self.publish(json.dumps(payload))
+                except Exception as e:
+                    self.metrics['producer_errors'] += 1
+                    logger.error(f"Broadcast producer error: {e}")
+            elapsed = time.perf_counter() - started
+            self.metrics['last_produce_ms'] = elapsed * 1000
+            await asyncio.sleep(max(self.interval - elapsed, 0.0))
+
+    def _evict(self, subscriber: Subscriber):
+        """Wake the subscriber's sender with the disconnect sentinel."""
+        subscriber.closed = True
+        while not subscriber.queue.empty():
+            subscriber.queue.get_nowait()
+        subscriber.queue.put_nowait(None)
+
+    async def _disconnect(self, subscriber: Subscriber):
+        self._evict(subscriber)
+        await self._close_socket(subscriber)
+
+    @staticmethod
+    async def _close_socket(subscriber: Subscriber):
+        try:
+            await subscriber.websocket.close()
+        except Exception:
+            pass # Already closed by the client
@@ -6,6 +6,8 @@ from typing import Optional, List
 import logging
 import asyncio
 import json
+import time
+from datetime import datetime, timezone
 
 import sys
 import os
@@ -16,6 +18,7 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../../"
 # Import Core Modules
 from app.config.config import settings
 from core.execution import ExecutionEngine
+from core.order_tracker import OrderTracker
 try:
     from core.sentiment import SentimentEngine
 except ImportError:
@@ -26,6 +29,7 @@ except ImportError:
         async def get_social_sentiment(self): return 0.0
 from db.timescale import db
 from backend.brain.swarm_manager import SwarmManager
+from backend.api.broadcast import BroadcastHub
 
 # Configure Logging
 logging.basicConfig(level=logging.INFO)
@@ -58,9 +62,12 @@ async def get_api_key(api_key_header: str = Security(api_key_header)):
     )
 
 # --- Engines ---
-execution_engine = ExecutionEngine(exchange_client=None)
+PORTFOLIO_VALUE = 10000.0 # Mock account equity until balances are fetched from the exchange
+execution_engine = ExecutionEngine(exchange_client=None, order_tracker=OrderTracker(db=db))
 sentiment_engine = SentimentEngine()
 swarm_manager = SwarmManager()
+# The gate's VaR budget (risk_gate.var_check) stays unset until returns are streamed into
+# swarm_manager.risk_engine (update_returns); then wire it with check_risk(..., require_history=True).
 
 # --- Data Models ---
 class TrainingRequest(BaseModel):
@@ -186,46 +193,55 @@ async def startup_event():
     
     # 2. Start Engines
     asyncio.create_task(sentiment_engine.start())
+    await broadcast_hub.start()
     # execution_engine is event-driven, so it waits for calls
+    await execution_engine.start() # Batched trade_history writer (+ VaR budget refresh once var_check is wired)
     
 @app.on_event("shutdown")
 async def shutdown_event():
     logger.info("Shutting down Neural Swarm...")
     await sentiment_engine.stop()
+    await broadcast_hub.stop()
     await execution_engine.close()
+    swarm_manager.close()
     await db.disconnect()
 
+async def build_dashboard_update() -> dict:
+    """One dashboard update; computed once per tick by the broadcast hub and shared by all clients."""
+    # Mock market data for now, or fetch from execution engine if possible
+    market_data = {
+        "orderbook_features": [0.5] * 10,
+        "ohlcv_features": [0.5] * 10,
+        "portfolio_value": PORTFOLIO_VALUE,
+        "positions": []
+    }
+
+    # Get decision from Swarm
+    decision = await swarm_manager.get_swarm_decision(market_data, tick_id=int(time.time()))
+
+    return {
+        "pnl": 0.0, # Placeholder
+        "active_agents": decision["active_agents"],
+        "signals": {
+            "action": decision["action"],
+            "confidence": decision["confidence"],
+            "agent_decisions": decision["agent_decisions"]
+        },
+        "timestamp": datetime.now(timezone.utc).isoformat()
+    }
+
+broadcast_hub = BroadcastHub(build_dashboard_update, interval=1.0)
+
 @app.websocket("/ws")
-async def websocket_endpoint(websocket: WebSocket):
+async def websocket_endpoint(websocket: WebSocket, rate: Optional[float] = None):
+    """
+    Live dashboard stream. `rate` (updates per second) lets a client ask for fewer
+    updates than the hub publishes, e.g. /ws?rate=0.2 for one update every 5s.
+    """
     await websocket.accept()
     logger.info("WebSocket Client Connected")
     try:
-        while True:
-            # Mock market data for now, or fetch from execution engine if possible
-            market_data = {
-                "orderbook_features": [0.5] * 10,
-                "ohlcv_features": [0.5] * 10,
-                "portfolio_value": 10000.0,
-                "positions": []
-            }
-            
-            # Get decision from Swarm
-            decision = await swarm_manager.get_swarm_decision(market_data)
-            
-            payload = {
-                "pnl": 0.0, # Placeholder
-                "active_agents": decision["active_agents"],
-                "signals": {
-                    "action": decision["action"],
-                    "confidence": decision["confidence"],
-                    "agent_decisions": decision["agent_decisions"]
-                },
-                "timestamp": "2025-11-30T00:00:00Z" # Should be dynamic
-            }
-            await websocket.send_text(json.dumps(payload))
-            await asyncio.sleep(1)
-    except WebSocketDisconnect:
-        logger.info("WebSocket Client Disconnected")
+        await broadcast_hub.serve(websocket, max_rate_hz=rate)
     except Exception as e:
         logger.error(f"WebSocket Error: {e}")
-        await websocket.close()
+    logger.info("WebSocket Client Disconnected")
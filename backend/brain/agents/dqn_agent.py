@@ -1,9 +1,15 @@
-import gymnasium as gym
-from gymnasium import spaces
 import numpy as np
 import os
-from stable_baselines3 import DQN
 import logging
+from core.policy_runtime import PolicyRuntime
+
+# Training-only dependencies; inference can run from an exported policy without them
+try:
+    import gymnasium as gym
+    from gymnasium import spaces
+    GYM_AVAILABLE = True
+except ImportError:
+    GYM_AVAILABLE = False
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -24,22 +30,35 @@ class DQNScalperAgent:
         self._initialize_model()
 
     def _initialize_model(self):
+        self.model = PolicyRuntime.find(self.model_path)
+        if self.model:
+            logger.info(f"Loaded exported DQN policy for {self.model_path}")
+            return
+        self.model = self._load_training_model()
+
+    def _load_training_model(self):
+        """The trainable SB3 model: the saved zip if present, else a fresh one."""
+        from stable_baselines3 import DQN
         if os.path.exists(self.model_path + ".zip"):
             logger.info(f"Loading existing DQN model from {self.model_path}...")
-            self.model = DQN.load(self.model_path)
-        else:
-            logger.info("No existing model found. Creating a new DQN model...")
-            # Create a dummy environment to initialize the model structure
-            # In production, you would train this offline first.
-            env = DummyScalperEnv(self.observation_space_size)
-            self.model = DQN("MlpPolicy", env, verbose=1)
-            # Save immediately to have a base model
-            self.model.save(self.model_path)
+            return DQN.load(self.model_path)
+        logger.info("No existing model found. Creating a new DQN model...")
+        # Create a dummy environment to initialize the model structure
+        # In production, you would train this offline first.
+        env = DummyScalperEnv(self.observation_space_size)
+        model = DQN("MlpPolicy", env, verbose=1)
+        # Save immediately to have a base model
+        model.save(self.model_path)
+        return model
 
     def train(self, env, total_timesteps=10000):
         """
         Train the agent on a given environment.
+        An exported (inference-only) policy is swapped for the SB3 model first;
+        re-export after training to serve the new weights from the runtime.
         """
+        if self.model is None or isinstance(self.model, PolicyRuntime):
+            self.model = self._load_training_model()
         logger.info(f"Training DQN Agent for {total_timesteps} steps...")
         self.model.set_env(env)
         self.model.learn(total_timesteps=total_timesteps)
@@ -54,12 +73,12 @@ class DQNScalperAgent:
             # Ensure observation is numpy array and correct shape
             obs = np.array(observation).reshape(1, -1)
             action, _states = self.model.predict(obs, deterministic=True)
-            return int(action)
+            return int(np.asarray(action).reshape(-1)[0])
         else:
             logger.error("Model not initialized.")
             return 0 # Default to Hold
 
-class DummyScalperEnv(gym.Env):
+class DummyScalperEnv(gym.Env if GYM_AVAILABLE else object):
     """
     Dummy Environment for initializing DQN model structure.
     """
@@ -1,17 +1,22 @@
-import gymnasium as gym
-from gymnasium import spaces
 import numpy as np
 import pandas as pd
-from stable_baselines3 import PPO
-from stable_baselines3.common.vec_env import DummyVecEnv
 import logging
 import os
+from core.policy_runtime import PolicyRuntime
+
+# Training-only dependencies; inference can run from an exported policy without them
+try:
+    import gymnasium as gym
+    from gymnasium import spaces
+    GYM_AVAILABLE = True
+except ImportError:
+    GYM_AVAILABLE = False
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-class CryptoTradingEnv(gym.Env):
+class CryptoTradingEnv(gym.Env if GYM_AVAILABLE else object):
     """
     Custom Environment that follows gym interface for Crypto Trading.
     Includes fee simulation, slippage, and position management.
@@ -114,6 +119,9 @@ class DRLAgent:
         """
         Train the PPO agent.
         """
+        from stable_baselines3 import PPO
+        from stable_baselines3.common.vec_env import DummyVecEnv
+
         logger.info("Initializing Environment for Training...")
         env = DummyVecEnv([lambda: CryptoTradingEnv(data)])
         
@@ -129,9 +137,13 @@ class DRLAgent:
 
     def load(self):
         """
-        Load a trained model.
+        Load a trained model, preferring an exported ONNX/TorchScript policy.
         """
-        if os.path.exists(self.model_path + ".zip"):
+        self.model = PolicyRuntime.find(self.model_path)
+        if self.model:
+            logger.info("Exported policy loaded successfully.")
+        elif os.path.exists(self.model_path + ".zip"):
+            from stable_baselines3 import PPO
             self.model = PPO.load(self.model_path)
             logger.info("Model loaded successfully.")
         else:
@@ -0,0 +1,79 @@
+import argparse
+import logging
+from typing import Tuple
+import torch
+import torch.nn as nn
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("PolicyExport")
+
+class DeterministicActorPolicy(nn.Module):
+    """
+    Frozen PPO (actor-critic) policy: observation -> deterministic discrete action.
+    Preprocessing is included; the value head is dropped.
+    """
+    def __init__(self, policy):
+        super(DeterministicActorPolicy, self).__init__()
+        self.policy = policy
+
+    def forward(self, observation):
+        actions, _values, _log_prob = self.policy(observation, deterministic=True)
+        return actions
+
+class GreedyQPolicy(nn.Module):
+    """Frozen DQN policy: observation -> argmax of Q-values."""
+    def __init__(self, q_net):
+        super(GreedyQPolicy, self).__init__()
+        self.q_net = q_net
+
+    def forward(self, observation):
+        return self.q_net(observation).argmax(dim=1)
+
+def load_policy_module(model_path: str, algo: str) -> Tuple[nn.Module, Tuple[int, ...]]:
+    """Load an SB3 model zip and wrap its policy network for export. Returns (module, observation shape)."""
+    from stable_baselines3 import DQN, PPO
+
+    if algo == "dqn":
+        model = DQN.load(model_path, device="cpu")
+        module = GreedyQPolicy(model.q_net)
+    else:
+        model = PPO.load(model_path, device="cpu")
+        module = DeterministicActorPolicy(model.policy)
+    module.eval()
+    return module, model.observation_space.shape
+
+def export_policy(model_path: str, algo: str = "ppo", formats=("onnx", "torchscript")):
+    """
+    Export `<model_path>.zip` to `<model_path>.onnx` and/or `<model_path>.pt`.
+    Both files accept a float32 (batch, n_features) tensor and return int64 actions;
+    they are picked up automatically by core.policy_runtime.PolicyRuntime.find().
+    """
+    module, obs_shape = load_policy_module(model_path, algo)
+    dummy = torch.zeros((1, *obs_shape), dtype=torch.float32)
+
+    with torch.no_grad():
+        if "onnx" in formats:
+            torch.onnx.export(
+                module,
+                dummy,
+                model_path + ".onnx",
+                opset_version=17,
+                input_names=["observation"],
+                output_names=["action"],
+                dynamic_axes={"observation": {0: "batch"}, "action": {0: "batch"}}
+            )
+            logger.info(f"Exported ONNX policy to {model_path}.onnx")
+
+        if "torchscript" in formats:
+            traced = torch.jit.trace(module, dummy)
+            traced = torch.jit.freeze(traced.eval())
+            traced.save(model_path + ".pt")
+            logger.info(f"Exported TorchScript policy to {model_path}.pt")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Freeze a trained SB3 policy for the live inference path.")
+    parser.add_argument("model_path", help="Model path without the .zip extension (e.g. models/ppo_agent)")
+    parser.add_argument("--algo", choices=["ppo", "dqn"], default="ppo")
+    parser.add_argument("--formats", nargs="+", choices=["onnx", "torchscript"], default=["onnx", "torchscript"])
+    args = parser.parse_args()
+    export_policy(args.model_path, args.algo, tuple(args.formats))
@@ -1,6 +1,8 @@
 import asyncio
 import logging
-from typing import Dict, List, Any
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Any, Callable, Hashable, Optional
 import numpy as np
 
 # Import Agents
@@ -25,11 +27,21 @@ except ImportError:
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("SwarmManager")
 
+ACTION_MAP = {0: "HOLD", 1: "BUY", 2: "SELL"}
+
 class SwarmManager:
     """
     Orchestrates multiple agents (Scalper, Trend, Risk) using a Mixture of Experts approach.
+    Agents are evaluated concurrently in a bounded thread pool with per-agent timeouts,
+    and one decision per market tick is shared by every caller asking for that tick.
     """
-    def __init__(self):
+    def __init__(self, max_workers: int = 4, agent_timeout: float = 0.25, risk_timeout: float = 0.5):
+        """
+        Args:
+            max_workers (int): Threads available for agent inference (bounds CPU use).
+            agent_timeout (float): Seconds before a model vote falls back to HOLD.
+            risk_timeout (float): Seconds before the risk check fails closed (VETO).
+        """
         self.agents = {}
         self.weights = {
             "scalper": 0.4,
@@ -38,6 +50,20 @@ class SwarmManager:
         }
         self.risk_engine = None
         self.active_agents = []
+        self.agent_timeout = agent_timeout
+        self.risk_timeout = risk_timeout
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="swarm-agent")
+
+        # Decision sharing: the task computing the latest tick, keyed by tick id
+        self._decision_tick: Optional[Hashable] = None
+        self._decision_task: Optional[asyncio.Task] = None
+        self.metrics = {
+            "decisions": 0,
+            "shared_decisions": 0,
+            "timeouts": 0,
+            "errors": 0,
+            "last_latency_ms": 0.0
+        }
         
         self._initialize_agents()
 
@@ -73,47 +99,60 @@ class SwarmManager:
             except Exception as e:
                 logger.error(f"Failed to init Risk Engine: {e}")
 
-    async def get_swarm_decision(self, market_data: Dict[str, Any]) -> Dict[str, Any]:
+    async def get_swarm_decision(self, market_data: Dict[str, Any], tick_id: Optional[Hashable] = None) -> Dict[str, Any]:
         """
         Aggregates votes from all agents to make a final trading decision.
+        Callers passing the same `tick_id` share a single evaluation (computed once,
+        awaited by all); without a tick id every call is evaluated.
         Returns: { "action": "BUY"|"SELL"|"HOLD", "confidence": float, "details": {} }
         """
+        if tick_id is None:
+            return await self._compute_decision(market_data)
+
+        if tick_id != self._decision_tick or self._decision_task is None:
+            self._decision_tick = tick_id
+            self._decision_task = asyncio.create_task(self._compute_decision(market_data))
+        else:
+            self.metrics["shared_decisions"] += 1
+        # Shield so a cancelled subscriber doesn't cancel the evaluation for the others
+        return await asyncio.shield(self._decision_task)
+
+    async def _compute_decision(self, market_data: Dict[str, Any]) -> Dict[str, Any]:
+        started = time.perf_counter()
         votes = {"BUY": 0.0, "SELL": 0.0, "HOLD": 0.0}
         agent_decisions = {}
 
-        # 1. Get Scalper Vote
+        # Fan out: every agent runs concurrently in the pool
+        calls = {}
         if "scalper" in self.agents:
             # Assuming scalper takes order book features
-            scalper_action = self.agents["scalper"].predict(market_data.get("orderbook_features", []))
-            # Map action ID to string (0: HOLD, 1: BUY, 2: SELL)
-            action_map = {0: "HOLD", 1: "BUY", 2: "SELL"}
-            decision = action_map.get(scalper_action, "HOLD")
-            votes[decision] += self.weights["scalper"]
-            agent_decisions["scalper"] = decision
-
-        # 2. Get Trend Vote
+            calls["scalper"] = self._call_agent("scalper", self.agents["scalper"].predict, self.agent_timeout, market_data.get("orderbook_features", []))
         if "trend" in self.agents:
             # Assuming trend agent takes OHLCV data
-            trend_action = self.agents["trend"].predict(market_data.get("ohlcv_features", []))
-            # Map action ID to string (0: HOLD, 1: BUY, 2: SELL) - verify mapping with PPO agent
-            # Assuming same mapping for now
-            action_map = {0: "HOLD", 1: "BUY", 2: "SELL"}
-            decision = action_map.get(trend_action, "HOLD")
-            votes[decision] += self.weights["trend"]
-            agent_decisions["trend"] = decision
-
-        # 3. Risk Check (Veto Power)
-        risk_veto = False
+            calls["trend"] = self._call_agent("trend", self.agents["trend"].predict, self.agent_timeout, market_data.get("ohlcv_features", []))
         if self.risk_engine:
             # Check VaR/CVaR
-            is_risky = self.risk_engine.check_risk(market_data.get("portfolio_value", 0), market_data.get("positions", []))
-            if is_risky:
+            calls["risk"] = self._call_agent("risk", self.risk_engine.check_risk, self.risk_timeout, market_data.get("portfolio_value", 0), market_data.get("positions", []))
+        results = dict(zip(calls, await asyncio.gather(*calls.values())))
+
+        # 1 & 2. Model Votes (0: HOLD, 1: BUY, 2: SELL); a missing/late vote counts as HOLD
+        for name in ("scalper", "trend"):
+            if name in results:
+                decision = self._to_decision(results[name])
+                votes[decision] += self.weights[name]
+                agent_decisions[name] = decision
+
+        # 3. Risk Check (Veto Power); fails closed if the engine errors or times out
+        risk_veto = False
+        if "risk" in results:
+            is_risky = results["risk"]
+            if is_risky is None or is_risky:
                 logger.warning("Risk Engine triggered VETO. Forcing HOLD/SELL.")
                 risk_veto = True
                 votes["BUY"] = 0.0 # Nullify buy votes
                 votes["SELL"] += self.weights["risk"] # Encourage selling/reducing risk
                 votes["HOLD"] += self.weights["risk"]
-                agent_decisions["risk"] = "VETO"
+                agent_decisions["risk"] = "VETO" if is_risky is not None else "TIMEOUT"
             else:
                 agent_decisions["risk"] = "PASS"
 
@@ -125,6 +164,8 @@ class SwarmManager:
         total_weight = sum(self.weights.values())
         normalized_confidence = min(confidence / total_weight, 1.0)
 
+        self.metrics["decisions"] += 1
+        self.metrics["last_latency_ms"] = (time.perf_counter() - started) * 1000
         logger.info(f"Swarm Decision: {best_action} (Conf: {normalized_confidence:.2f}) | Votes: {votes}")
 
         return {
@@ -133,3 +174,30 @@ class SwarmManager:
             "agent_decisions": agent_decisions,
             "active_agents": self.active_agents
         }
+
+    async def _call_agent(self, name: str, fn: Callable, timeout: float, *args) -> Any:
+        """Run a blocking agent call in the pool; None on timeout or error."""
+        loop = asyncio.get_running_loop()
+        try:
+            return await asyncio.wait_for(loop.run_in_executor(self.executor, fn, *args), timeout)
+        except asyncio.TimeoutError:
+            self.metrics["timeouts"] += 1
+            logger.warning(f"Agent '{name}' timed out after {timeout * 1000:.0f}ms, using fallback.")
+        except Exception as e:
+            self.metrics["errors"] += 1
+            logger.error(f"Agent '{name}' failed: {e}")
+        return None
+
+    @staticmethod
+    def _to_decision(action) -> str:
+        """Map a model output (int, numpy scalar/array or None) to HOLD/BUY/SELL."""
+        if action is None:
+            return "HOLD"
+        try:
+            return ACTION_MAP.get(int(np.asarray(action).reshape(-1)[0]), "HOLD")
+        except (TypeError, ValueError, IndexError):
+            return "HOLD"
+
+    def close(self):
+        """Release the inference thread pool."""
+        self.executor.shutdown(wait=False, cancel_futures=True)
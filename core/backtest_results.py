@@ -0,0 +1,208 @@
+import logging
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict, List, Optional
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+FILL_DTYPE = np.dtype([
+    ('bar', np.int64),
+    ('symbol_code', np.int32),
+    ('side', np.int8), # +1 buy, -1 sell
+    ('quantity', np.float64),
+    ('price', np.float64),
+    ('commission', np.float64),
+    ('slippage', np.float64),
+    ('cost', np.float64)
+])
+
+class FillRecorder:
+    """
+    Preallocated structured array of fills.
+    Capacity doubles when full, so appends are amortised O(1) without per-fill objects.
+    """
+
+    def __init__(self, capacity: int = 1024):
+        self._data = np.empty(capacity, dtype=FILL_DTYPE)
+        self.size = 0
+
+    def append(self, bar: int, symbol_code: int, side: int, quantity: float, price: float, commission: float, slippage: float, cost: float):
+        if self.size == len(self._data):
+            grown = np.empty(len(self._data) * 2, dtype=FILL_DTYPE)
+            grown[:self.size] = self._data
+            self._data = grown
+        self._data[self.size] = (bar, symbol_code, side, quantity, price, commission, slippage, cost)
+        self.size += 1
+
+    @property
+    def records(self) -> np.ndarray:
+        """View of the recorded fills."""
+        return self._data[:self.size]
+
+    def __len__(self) -> int:
+        return self.size
+
+@dataclass
+class BacktestResults:
+    """
+    Machine-readable backtest output.
+    Holds the per-row equity curve (one point per market event, so one per symbol
+    per bar), gross exposure and fills as arrays; risk metrics are computed
+    vectorially on demand from the equity at the end of each timestamp.
+    """
+    initial_capital: float
+    timestamps: np.ndarray
+    equity: np.ndarray
+    gross_exposure: np.ndarray
+    fills: np.ndarray
+    symbols: List[str]
+    summary: Dict[str, float]
+    periods_per_year: Optional[float] = None
+    params: Dict = field(default_factory=dict)
+
+    def __post_init__(self):
+        if self.periods_per_year is None:
+            self.periods_per_year = infer_periods_per_year(self.timestamps)
+
+    @property
+    def bar_equity(self) -> np.ndarray:
+        """Equity after the last row of each distinct timestamp, in time order."""
+        if len(self.equity) < 2 or len(self.timestamps) != len(self.equity):
+            return self.equity
+        return pd.Series(self.equity).groupby(np.asarray(self.timestamps), sort=True).last().to_numpy()
+
+    @property
+    def returns(self) -> np.ndarray:
+        """Simple per-bar returns (across all symbols), matching periods_per_year."""
+        equity = self.bar_equity
+        if len(equity) < 2:
+            return np.empty(0)
+        return np.diff(equity) / equity[:-1]
+
+    @property
+    def sharpe(self) -> float:
+        returns = self.returns
+        if len(returns) < 2:
+            return 0.0
+        std = returns.std(ddof=1)
+        return float(returns.mean() / std * np.sqrt(self.periods_per_year)) if std > 0 else 0.0
+
+    @property
+    def sortino(self) -> float:
+        returns = self.returns
+        if len(returns) < 2:
+            return 0.0
+        downside = np.sqrt(np.mean(np.minimum(returns, 0.0) ** 2))
+        return float(returns.mean() / downside * np.sqrt(self.periods_per_year)) if downside > 0 else 0.0
+
+    @property
+    def max_drawdown(self) -> float:
+        """Largest peak-to-trough loss as a fraction of the peak."""
+        equity = self.bar_equity
+        if len(equity) == 0:
+            return 0.0
+        peaks = np.maximum.accumulate(equity)
+        return float(np.max(1.0 - equity / peaks))
+
+    @property
+    def turnover(self) -> float:
+        """Traded notional divided by average equity."""
+        if len(self.equity) == 0:
+            return 0.0
+        traded = np.sum(self.fills['quantity'] * self.fills['price'])
+        return float(traded / self.equity.mean())
+
+    @property
+    def exposure(self) -> float:
+        """Average gross position value as a fraction of equity."""
+        if len(self.equity) == 0:
+            return 0.0
+        return float(np.mean(self.gross_exposure / self.equity))
+
+    def metrics(self) -> Dict[str, float]:
+        """TCA summary plus risk metrics, flat and ready for a results table."""
+        metrics = dict(self.params)
+        metrics.update({key: float(value) for key, value in self.summary.items()})
+        metrics.update({
+            'sharpe': self.sharpe,
+            'sortino': self.sortino,
+            'max_drawdown': self.max_drawdown,
+            'turnover': self.turnover,
+            'exposure': self.exposure
+        })
+        return metrics
+
+    def equity_frame(self) -> pd.DataFrame:
+        return pd.DataFrame({
+            'timestamp': self.timestamps,
+            'equity': self.equity,
+            'gross_exposure': self.gross_exposure
+        })
+
+    def fills_frame(self) -> pd.DataFrame:
+        frame = pd.DataFrame(self.fills)
+        frame.insert(1, 'symbol', np.asarray(self.symbols, dtype=object)[frame['symbol_code'].to_numpy()] if len(frame) else [])
+        frame.insert(0, 'timestamp', self.timestamps[frame['bar'].to_numpy()] if len(frame) else [])
+        return frame
+
+    def to_arrow(self) -> Dict[str, 'pa.Table']:
+        """Arrow tables for the equity curve and fills (requires pyarrow)."""
+        if not PYARROW_AVAILABLE:
+            raise ImportError("pyarrow is required for Arrow export")
+        return {
+            'equity': pa.Table.from_pandas(self.equity_frame(), preserve_index=False),
+            'fills': pa.Table.from_pandas(self.fills_frame(), preserve_index=False)
+        }
+
+    def to_parquet(self, path_prefix: str):
+        """
+        Write `<prefix>_equity.parquet` and `<prefix>_fills.parquet`.
+        Metrics and params are stored as Parquet key-value metadata on both files.
+        """
+        metadata = {key: str(value) for key, value in self.metrics().items()}
+        for name, table in self.to_arrow().items():
+            existing = table.schema.metadata or {}
+            table = table.replace_schema_metadata({**existing, **{k.encode(): v.encode() for k, v in metadata.items()}})
+            pq.write_table(table, f"{path_prefix}_{name}.parquet")
+
+def metrics_table(results: List[BacktestResults]) -> pd.DataFrame:
+    """Collect the metrics of many runs into one DataFrame (e.g. for `to_parquet`)."""
+    return pd.DataFrame([r.metrics() for r in results])
+
+def infer_periods_per_year(timestamps: np.ndarray) -> float:
+    """
+    Bars per year from the median spacing of the distinct timestamps, so rows of several
+    symbols sharing a bar time count once. Assumes daily bars if timestamps are not datetimes.
+    """
+    bar_times = _datetime_ns(timestamps)
+    if bar_times is None:
+        return 365.0
+    bar_times = np.unique(bar_times)
+    if len(bar_times) < 2:
+        return 365.0
+    spacing = np.median(np.diff(bar_times))
+    return 365.0 * 24 * 3600 * 1e9 / spacing
+
+def _datetime_ns(timestamps) -> Optional[np.ndarray]:
+    """UTC nanoseconds for datetime64 or (tz-aware) Timestamp arrays, None for anything else."""
+    timestamps = np.asarray(timestamps)
+    if len(timestamps) < 2:
+        return None
+    if np.issubdtype(timestamps.dtype, np.datetime64):
+        return timestamps.astype('datetime64[ns]').astype(np.int64)
+    if timestamps.dtype == object and isinstance(timestamps[0], (datetime, np.datetime64)):
+        try:
+            utc = pd.to_datetime(timestamps, utc=True).tz_convert(None)
+            return np.asarray(utc, dtype='datetime64[ns]').astype(np.int64)
+        except (TypeError, ValueError):
+            return None
+    return None
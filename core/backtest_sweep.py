@@ -0,0 +1,245 @@
+import asyncio
+import itertools
+import logging
+import random
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+
+from core.backtester import EventDrivenBacktester, ColumnarMarketData
+from core.vectorized_backtester import VectorizedBacktester
+
+logger = logging.getLogger(__name__)
+
+# Column arrays attached from shared memory inside each worker process
+_WORKER_ARRAYS: Dict[str, np.ndarray] = {}
+_WORKER_SYMBOLS: List[str] = []
+_WORKER_SHM: List[shared_memory.SharedMemory] = []
+
+class SharedPriceArrays:
+    """
+    Publishes the historical column arrays to shared memory once.
+    Workers attach by name, so a sweep never pickles the price history per task.
+    """
+    COLUMNS = ('timestamps', 'symbol_codes', 'close', 'volume')
+
+    def __init__(self, market_data: ColumnarMarketData):
+        self.symbols = list(market_data.symbols)
+        self.blocks: List[shared_memory.SharedMemory] = []
+        self.spec: Dict[str, Tuple[str, Tuple[int, ...], str]] = {}
+
+        for column in self.COLUMNS:
+            array = np.ascontiguousarray(getattr(market_data, column))
+            if array.dtype.hasobject:
+                # Object timestamps cannot live in shared memory; fall back to bar indexes
+                array = np.arange(len(array), dtype=np.int64)
+            block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+            np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[:] = array
+            self.blocks.append(block)
+            self.spec[column] = (block.name, array.shape, array.dtype.str)
+
+    def close(self):
+        for block in self.blocks:
+            block.close()
+            block.unlink()
+        self.blocks = []
+
+class RandomSampler:
+    """
+    Uniform random sampler over a parameter space.
+    Values may be lists (sampled by choice) or (low, high) tuples (sampled uniformly;
+    integers if both bounds are ints). Follows the ask/tell protocol used by `ParameterSweep`,
+    so model-based (e.g. Bayesian) samplers can be swapped in.
+    """
+    def __init__(self, param_space: Dict[str, Any], seed: Optional[int] = None):
+        self.param_space = param_space
+        self.rng = random.Random(seed)
+
+    def ask(self, n: int) -> List[Dict[str, Any]]:
+        return [{name: self._draw(space) for name, space in self.param_space.items()} for _ in range(n)]
+
+    def tell(self, params: List[Dict[str, Any]], scores: List[float]):
+        pass # Random search ignores feedback
+
+    def _draw(self, space):
+        if isinstance(space, tuple):
+            low, high = space
+            if isinstance(low, int) and isinstance(high, int):
+                return self.rng.randint(low, high)
+            return self.rng.uniform(low, high)
+        return self.rng.choice(list(space))
+
+class ParameterSweep:
+    """
+    Parallel Parameter Sweep / Walk-Forward Runner.
+    Fans backtests out over a ProcessPoolExecutor and collects a ranked table of TCA and risk metrics.
+
+    `strategy_factory(params)` must be picklable (a module-level function) and return:
+        - engine='event': an async strategy callback for EventDrivenBacktester.run
+        - engine='vectorized': a function taking the bar frame and returning target positions
+    """
+
+    def __init__(self, data: pd.DataFrame, strategy_factory: Callable, engine: str = 'event', max_workers: Optional[int] = None, backtester_kwargs: Optional[Dict] = None):
+        """
+        Args:
+            data (pd.DataFrame): Bars with 'timestamp', 'symbol', 'close', 'volume'.
+            strategy_factory (Callable): Builds a strategy from a parameter dict.
+            engine (str): 'event' (columnar EventDrivenBacktester) or 'vectorized'.
+            max_workers (int): Worker processes (defaults to CPU count).
+            backtester_kwargs (Dict): Passed to the backtester (fees, slippage, capital).
+        """
+        if engine not in ('event', 'vectorized'):
+            raise ValueError(f"Unknown engine: {engine}")
+        self.market_data = ColumnarMarketData.from_frame(data)
+        self.strategy_factory = strategy_factory
+        self.engine = engine
+        self.max_workers = max_workers
+        self.backtester_kwargs = backtester_kwargs or {}
+
+    @staticmethod
+    def grid(param_grid: Dict[str, Iterable]) -> List[Dict[str, Any]]:
+        """Expand {'name': [values]} into the full cartesian product of parameter dicts."""
+        names = list(param_grid)
+        return [dict(zip(names, values)) for values in itertools.product(*(param_grid[n] for n in names))]
+
+    def run(self, params_list: Optional[List[Dict]] = None, param_grid: Optional[Dict[str, Iterable]] = None, sampler=None, n_samples: int = 100, batch_size: int = 32, rank_by: str = 'pnl') -> pd.DataFrame:
+        """
+        Run a sweep over the full history.
+
+        Args:
+            params_list (List[Dict]): Explicit parameter sets.
+            param_grid (Dict): Grid to expand with `grid()`.
+            sampler: Object with ask(n)/tell(params, scores); queried in batches until n_samples.
+            n_samples (int): Total parameter sets drawn from the sampler.
+            batch_size (int): Parameter sets per sampler round.
+            rank_by (str): Summary column to sort by (descending).
+
+        Returns:
+            pd.DataFrame: One row per parameter set, best first.
+        """
+        window = (0, len(self.market_data))
+        with self._pool() as pool:
+            if sampler is not None:
+                rows = []
+                while len(rows) < n_samples:
+                    batch = sampler.ask(min(batch_size, n_samples - len(rows)))
+                    results = self._evaluate(pool, batch, window)
+                    sampler.tell(batch, [r[rank_by] for r in results])
+                    rows.extend(results)
+            else:
+                if params_list is None:
+                    params_list = self.grid(param_grid or {})
+                rows = self._evaluate(pool, params_list, window)
+
+        return _rank(rows, rank_by)
+
+    def walk_forward(self, train_size: int, test_size: int, params_list: Optional[List[Dict]] = None, param_grid: Optional[Dict[str, Iterable]] = None, step: Optional[int] = None, rank_by: str = 'pnl') -> pd.DataFrame:
+        """
+        Walk-forward optimisation: pick the best parameters on each training window,
+        then score them on the following out-of-sample window.
+
+        Args:
+            train_size (int): Bars per in-sample window.
+            test_size (int): Bars per out-of-sample window.
+            step (int): Bars to roll forward between windows (defaults to test_size).
+
+        Returns:
+            pd.DataFrame: One row per window with the chosen params and out-of-sample metrics.
+        """
+        if params_list is None:
+            params_list = self.grid(param_grid or {})
+        step = step or test_size
+
+        rows = []
+        with self._pool() as pool:
+            for start in range(0, len(self.market_data) - train_size - test_size + 1, step):
+                train = (start, start + train_size)
+                test = (train[1], train[1] + test_size)
+
+                in_sample = self._evaluate(pool, params_list, train)
+                best = max(range(len(in_sample)), key=lambda i: in_sample[i][rank_by])
+
+                out_of_sample = self._evaluate(pool, [params_list[best]], test)[0]
+                out_of_sample.update({
+                    'train_start': train[0],
+                    'train_end': train[1],
+                    'test_start': test[0],
+                    'test_end': test[1],
+                    f'train_{rank_by}': in_sample[best][rank_by]
+                })
+                rows.append(out_of_sample)
+
+        return pd.DataFrame(rows)
+
+    def _pool(self):
+        shared = SharedPriceArrays(self.market_data)
+        pool = ProcessPoolExecutor(
+            max_workers=self.max_workers,
+            initializer=_attach_shared_arrays,
+            initargs=(shared.spec, shared.symbols)
+        )
+        return _SharedPool(pool, shared)
+
+    def _evaluate(self, pool, params_list: List[Dict], window: Tuple[int, int]) -> List[Dict]:
+        futures = [
+            pool.submit(_run_backtest, self.engine, self.strategy_factory, params, window, self.backtester_kwargs)
+            for params in params_list
+        ]
+        return [future.result() for future in futures]
+
+class _SharedPool:
+    """Context manager that shuts the pool down before releasing shared memory."""
+    def __init__(self, pool: ProcessPoolExecutor, shared: SharedPriceArrays):
+        self.pool = pool
+        self.shared = shared
+
+    def __enter__(self):
+        return self.pool
+
+    def __exit__(self, *exc):
+        self.pool.shutdown()
+        self.shared.close()
+
+def _attach_shared_arrays(spec: Dict[str, Tuple[str, Tuple[int, ...], str]], symbols: List[str]):
+    """Worker initializer: map the shared blocks into NumPy arrays without copying."""
+    _WORKER_SYMBOLS[:] = symbols
+    for column, (name, shape, dtype) in spec.items():
+        block = shared_memory.SharedMemory(name=name)
+        _WORKER_SHM.append(block)
+        _WORKER_ARRAYS[column] = np.ndarray(shape, dtype=np.dtype(dtype), buffer=block.buf)
+
+def _run_backtest(engine: str, strategy_factory: Callable, params: Dict, window: Tuple[int, int], backtester_kwargs: Dict) -> Dict:
+    """Worker task: backtest one parameter set on a window of the shared history."""
+    start, stop = window
+    market_data = ColumnarMarketData(
+        timestamps=_WORKER_ARRAYS['timestamps'][start:stop],
+        symbol_codes=_WORKER_ARRAYS['symbol_codes'][start:stop],
+        symbols=_WORKER_SYMBOLS,
+        close=_WORKER_ARRAYS['close'][start:stop],
+        volume=_WORKER_ARRAYS['volume'][start:stop]
+    )
+    strategy = strategy_factory(params)
+
+    if engine == 'vectorized':
+        frame = pd.DataFrame({
+            'timestamp': market_data.timestamps,
+            'symbol': pd.Categorical.from_codes(market_data.symbol_codes, categories=market_data.symbols),
+            'close': market_data.close,
+            'volume': market_data.volume
+        })
+        results = VectorizedBacktester(**backtester_kwargs).run(frame, strategy(frame))
+    else:
+        backtester = EventDrivenBacktester(columnar=True, **backtester_kwargs)
+        backtester.load_columns(market_data)
+        results = asyncio.run(backtester.run(strategy, report=False))
+
+    results.params = dict(params)
+    return results.metrics()
+
+def _rank(rows: List[Dict], rank_by: str) -> pd.DataFrame:
+    table = pd.DataFrame(rows)
+    if table.empty:
+        return table
+    return table.sort_values(rank_by, ascending=False, kind='stable').reset_index(drop=True)
@@ -1,36 +1,42 @@
 import asyncio
+import heapq
+import itertools
 import logging
 from collections import deque
 from dataclasses import dataclass, field
 from typing import List, Dict, Optional
+import numpy as np
 import pandas as pd
 import datetime
 
+from core.backtest_results import BacktestResults, FillRecorder
+from core.fill_models import FillModel, FlatSlippageFillModel, SimulatedFill
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 # --- Event Definitions ---
-@dataclass
+@dataclass(kw_only=True)
 class Event:
     timestamp: datetime.datetime
     type: str
 
-@dataclass
+@dataclass(kw_only=True)
 class MarketEvent(Event):
     symbol: str
     price: float
     volume: float
     type: str = 'MARKET'
 
-@dataclass
+@dataclass(kw_only=True)
 class SignalEvent(Event):
     symbol: str
     side: str # 'buy' or 'sell'
     strength: float
     type: str = 'SIGNAL'
 
-@dataclass
+@dataclass(kw_only=True)
 class OrderEvent(Event):
     symbol: str
     side: str
@@ -39,7 +45,7 @@ class OrderEvent(Event):
     price: Optional[float] = None
     type: str = 'ORDER'
 
-@dataclass
+@dataclass(kw_only=True)
 class FillEvent(Event):
     symbol: str
     side: str
@@ -50,6 +56,61 @@ class FillEvent(Event):
     cost: float
     type: str = 'FILL'
 
+# --- Columnar Replay ---
+@dataclass
+class ColumnarMarketData:
+    """
+    Historical bars stored as NumPy column arrays.
+    Symbols are factorized to integer codes so the replay loop never touches pandas.
+    """
+    timestamps: np.ndarray
+    symbol_codes: np.ndarray
+    symbols: List[str]
+    close: np.ndarray
+    volume: np.ndarray
+
+    @classmethod
+    def from_frame(cls, data: pd.DataFrame) -> 'ColumnarMarketData':
+        """Build column arrays from a DataFrame with 'timestamp', 'symbol', 'close', 'volume'."""
+        codes, uniques = pd.factorize(data['symbol'])
+        return cls(
+            timestamps=data['timestamp'].to_numpy(),
+            symbol_codes=codes.astype(np.int32),
+            symbols=list(uniques),
+            close=data['close'].to_numpy(dtype=np.float64),
+            volume=data['volume'].to_numpy(dtype=np.float64)
+        )
+
+    def __len__(self) -> int:
+        return len(self.close)
+
+class EventQueue:
+    """
+    Small heap-backed priority queue for strategy-generated events.
+    Orders are processed before signals; ties keep insertion order.
+    Exposes the async `put` used by strategy callbacks on `asyncio.Queue`.
+    """
+    PRIORITY = {'ORDER': 0, 'SIGNAL': 1, 'MARKET': 2}
+
+    def __init__(self):
+        self._heap = []
+        self._seq = itertools.count()
+
+    async def put(self, event: Event):
+        self.put_nowait(event)
+
+    def put_nowait(self, event: Event):
+        heapq.heappush(self._heap, (self.PRIORITY.get(event.type, 3), next(self._seq), event))
+
+    def get_nowait(self) -> Event:
+        return heapq.heappop(self._heap)[2]
+
+    def empty(self) -> bool:
+        return not self._heap
+
+    def qsize(self) -> int:
+        return len(self._heap)
+
 # --- Backtester Engine ---
 class EventDrivenBacktester:
     """
@@ -57,30 +118,100 @@ class EventDrivenBacktester:
     Simulates trading tick-by-tick with Transaction Cost Analysis (TCA).
     """
 
-    def __init__(self, initial_capital: float = 10000.0, maker_fee: float = 0.001, taker_fee: float = 0.002, slippage_model: float = 0.0005):
+    REPLAY_CHUNK = 65536 # Bars converted to Python objects at a time in columnar mode
+
+    def __init__(self, initial_capital: float = 10000.0, maker_fee: float = 0.001, taker_fee: float = 0.002, slippage_model: float = 0.0005, columnar: bool = False, fill_model: Optional[FillModel] = None):
         """
         Args:
             initial_capital (float): Starting cash.
             maker_fee (float): Fee for limit orders (0.1% default).
             taker_fee (float): Fee for market orders (0.2% default).
             slippage_model (float): Estimated slippage percentage (0.05% default).
+            columnar (bool): Replay history from NumPy column arrays with a cursor
+                             instead of queueing one MarketEvent per row.
+            fill_model (FillModel): Fill simulator (e.g. L2FillModel); defaults to
+                                    flat `slippage_model` fills.
         """
         self.initial_capital = initial_capital
         self.current_capital = initial_capital
         self.positions = {} # {symbol: quantity}
-        self.events = asyncio.Queue()
-        self.trades: List[FillEvent] = []
+        self.columnar = columnar
+        self.events = EventQueue() if columnar else asyncio.Queue()
+        self.market_data: Optional[ColumnarMarketData] = None
+        self.fills = FillRecorder()
         self.maker_fee = maker_fee
         self.taker_fee = taker_fee
         self.slippage_model = slippage_model
+        self.fill_model = fill_model or FlatSlippageFillModel(slippage_model)
         self.current_market_data = {} # {symbol: price}
 
+        # Per-bar recording, preallocated once the history length is known
+        self.timestamps = np.empty(0)
+        self.symbols: List[str] = []
+        self._symbol_codes: Dict[str, int] = {}
+        self.equity_curve = np.empty(0)
+        self.gross_exposure = np.empty(0)
+        self._bar = -1
+        self._holdings_value = 0.0 # sum(qty * price), kept incrementally
+        self._gross_value = 0.0 # sum(|qty| * price), kept incrementally
+
+    @property
+    def trades(self) -> List[FillEvent]:
+        """Fills as FillEvent dataclasses, materialised from the fill arrays."""
+        return [
+            FillEvent(
+                timestamp=self.timestamps[fill['bar']],
+                symbol=self.symbols[fill['symbol_code']],
+                side='buy' if fill['side'] > 0 else 'sell',
+                quantity=float(fill['quantity']),
+                price=float(fill['price']),
+                commission=float(fill['commission']),
+                slippage=float(fill['slippage']),
+                cost=float(fill['cost'])
+            )
+            for fill in self.fills.records
+        ]
+
+    def _allocate(self, timestamps: np.ndarray, symbols: List[str]):
+        """Preallocate the per-bar equity and exposure arrays."""
+        self.timestamps = timestamps
+        self.symbols = list(symbols)
+        self._symbol_codes = {symbol: code for code, symbol in enumerate(self.symbols)}
+        self.equity_curve = np.full(len(timestamps), np.nan)
+        self.gross_exposure = np.zeros(len(timestamps))
+        self._bar = -1
+
+    def _mark(self, symbol: str, price: float):
+        """Update the last price of a symbol and the running holdings values."""
+        qty = self.positions.get(symbol, 0)
+        if qty:
+            move = price - self.current_market_data.get(symbol, price)
+            self._holdings_value += qty * move
+            self._gross_value += abs(qty) * move
+        self.current_market_data[symbol] = price
+
+    def _fill_resting(self, symbol: str, timestamp):
+        """Apply fills of resting limit orders produced by the fill model."""
+        for order, fill in self.fill_model.on_market(symbol, timestamp):
+            self._execute_fill(order, fill)
+
+    def _record_bar(self):
+        self.equity_curve[self._bar] = self.current_capital + self._holdings_value
+        self.gross_exposure[self._bar] = self._gross_value
+
     async def load_data(self, data: pd.DataFrame):
         """
         Load historical data and push MarketEvents to the queue.
         Assumes DataFrame has 'timestamp', 'symbol', 'close', 'volume'.
+        In columnar mode the frame is converted to column arrays instead.
         """
+        if self.columnar:
+            logger.info("Loading data into column arrays...")
+            self.load_columns(ColumnarMarketData.from_frame(data))
+            return
+
         logger.info("Loading data into event queue...")
+        self._allocate(data['timestamp'].to_numpy(), list(pd.unique(data['symbol'])))
         for index, row in data.iterrows():
             event = MarketEvent(
                 timestamp=row['timestamp'],
@@ -93,14 +224,29 @@ class EventDrivenBacktester:
         # Signal end of data
         await self.events.put(None) 
 
-    async def run(self, strategy_callback):
+    def load_columns(self, market_data: ColumnarMarketData):
+        """Use already-built column arrays (e.g. shared-memory views) for a columnar replay."""
+        self.market_data = market_data
+        self._allocate(market_data.timestamps, market_data.symbols)
+
+    async def run(self, strategy_callback, report: bool = True) -> BacktestResults:
         """
         Main Event Loop.
         
         Args:
             strategy_callback: Async function that takes (backtester, event) and generates signals.
+            report (bool): Print the TCA report when the replay ends.
+
+        Returns:
+            BacktestResults: Equity curve, fills and risk metrics of the run.
         """
         logger.info("Starting Backtest...")
+
+        if self.columnar:
+            await self._run_columnar(strategy_callback)
+            if report:
+                self.generate_report()
+            return self.results()
         
         while True:
             event = await self.events.get()
@@ -108,8 +254,11 @@ class EventDrivenBacktester:
                 break
             
             if event.type == 'MARKET':
-                self.current_market_data[event.symbol] = event.price
+                self._bar += 1
+                self._mark(event.symbol, event.price)
+                self._fill_resting(event.symbol, event.timestamp)
                 await strategy_callback(self, event)
+                self._record_bar()
                 
             elif event.type == 'SIGNAL':
                 await self.handle_signal(event)
@@ -118,8 +267,59 @@ class EventDrivenBacktester:
                 await self.process_order(event)
             
             self.events.task_done()
+
+        # Orders processed after the last bar are marked into its equity
+        if self._bar >= 0:
+            self._record_bar()
             
-        self.generate_report()
+        if report:
+            self.generate_report()
+        return self.results()
+
+    async def _run_columnar(self, strategy_callback):
+        """
+        Walk the column arrays with a cursor.
+        After every bar the strategy's signals and the resulting orders are drained
+        from the priority queue, so they execute against that bar's prices.
+        """
+        data = self.market_data
+        if data is None:
+            logger.warning("No data loaded for columnar replay")
+            return
+
+        symbols = data.symbols
+        events = self.events
+
+        # Convert the columns chunk by chunk: Python floats are much faster to
+        # index than NumPy scalars, while memory stays bounded to one chunk.
+        for start in range(0, len(data), self.REPLAY_CHUNK):
+            stop = start + self.REPLAY_CHUNK
+            timestamps = data.timestamps[start:stop]
+            codes = data.symbol_codes[start:stop].tolist()
+            closes = data.close[start:stop].tolist()
+            volumes = data.volume[start:stop].tolist()
+
+            for cursor in range(len(closes)):
+                self._bar = start + cursor
+                symbol = symbols[codes[cursor]]
+                price = closes[cursor]
+                self._mark(symbol, price)
+                self._fill_resting(symbol, timestamps[cursor])
+                await strategy_callback(self, MarketEvent(
+                    timestamp=timestamps[cursor],
+                    symbol=symbol,
+                    price=price,
+                    volume=volumes[cursor]
+                ))
+
+                while not events.empty():
+                    event = events.get_nowait()
+                    if event.type == 'SIGNAL':
+                        await self.handle_signal(event)
+                    elif event.type == 'ORDER':
+                        await self.process_order(event)
+
+                self._record_bar()
 
     async def handle_signal(self, signal: SignalEvent):
         """Convert Signal to Order."""
@@ -147,79 +347,110 @@ class EventDrivenBacktester:
         if not price:
             return
 
-        # Apply Slippage
-        # Buy executes higher, Sell executes lower
-        slippage_impact = price * self.slippage_model
-        exec_price = price + slippage_impact if order.side == 'buy' else price - slippage_impact
-        
+        for fill in self.fill_model.execute(order, price):
+            self._execute_fill(order, fill)
+
+    def _execute_fill(self, order: OrderEvent, fill: SimulatedFill):
+        """Book one (possibly partial) fill against cash and positions."""
+        exec_price = fill.price
+        quantity = fill.quantity
+        slippage_impact = fill.slippage
+
         # Calculate Fees
-        fee_rate = self.maker_fee if order.order_type == 'limit' else self.taker_fee
-        commission = (exec_price * order.quantity) * fee_rate
+        fee_rate = self.maker_fee if fill.maker else self.taker_fee
+        commission = (exec_price * quantity) * fee_rate
         
-        cost = (exec_price * order.quantity) + commission if order.side == 'buy' else (exec_price * order.quantity) - commission
+        cost = (exec_price * quantity) + commission if order.side == 'buy' else (exec_price * quantity) - commission
         
         # Update Portfolio
         if order.side == 'buy':
             if self.current_capital >= cost:
                 self.current_capital -= cost
-                self.positions[order.symbol] = self.positions.get(order.symbol, 0) + order.quantity
-                
-                fill = FillEvent(
-                    timestamp=order.timestamp,
-                    symbol=order.symbol,
-                    side=order.side,
-                    quantity=order.quantity,
-                    price=exec_price,
-                    commission=commission,
-                    slippage=slippage_impact,
-                    cost=cost
-                )
-                self.trades.append(fill)
+                self._apply_fill(order.symbol, quantity, exec_price, commission, slippage_impact, cost)
             else:
                 logger.warning("Insufficient funds for buy order")
                 
         elif order.side == 'sell':
             current_pos = self.positions.get(order.symbol, 0)
-            if current_pos >= order.quantity:
-                self.current_capital += (exec_price * order.quantity) - commission
-                self.positions[order.symbol] -= order.quantity
-                
-                fill = FillEvent(
-                    timestamp=order.timestamp,
-                    symbol=order.symbol,
-                    side=order.side,
-                    quantity=order.quantity,
-                    price=exec_price,
-                    commission=commission,
-                    slippage=slippage_impact,
-                    cost=cost
-                )
-                self.trades.append(fill)
+            if current_pos >= quantity:
+                self.current_capital += (exec_price * quantity) - commission
+                self._apply_fill(order.symbol, -quantity, exec_price, commission, slippage_impact, cost)
             else:
                 logger.warning("Insufficient position for sell order")
 
-    def generate_report(self):
-        """Generate Performance Report with TCA."""
-        logger.info("--- Backtest Report ---")
-        total_trades = len(self.trades)
-        total_commission = sum(t.commission for t in self.trades)
-        total_slippage_cost = sum(t.slippage * t.quantity for t in self.trades)
-        
+    def _apply_fill(self, symbol: str, signed_qty: float, exec_price: float, commission: float, slippage: float, cost: float):
+        """Update the position and running holdings values, and record the fill."""
+        old_qty = self.positions.get(symbol, 0)
+        new_qty = old_qty + signed_qty
+        self.positions[symbol] = new_qty
+
+        mark = self.current_market_data[symbol]
+        self._holdings_value += signed_qty * mark
+        self._gross_value += (abs(new_qty) - abs(old_qty)) * mark
+
+        self.fills.append(
+            max(self._bar, 0),
+            self._symbol_codes.get(symbol, -1),
+            1 if signed_qty > 0 else -1,
+            abs(signed_qty),
+            exec_price,
+            commission,
+            slippage,
+            cost
+        )
+
+    def summary(self) -> Dict[str, float]:
+        """Compute the TCA totals reported by `generate_report`."""
+        fills = self.fills.records
+        total_commission = float(fills['commission'].sum())
+        total_slippage_cost = float(np.dot(fills['slippage'], fills['quantity']))
+
         # Mark to Market Portfolio Value
         portfolio_value = self.current_capital
         for symbol, qty in self.positions.items():
             price = self.current_market_data.get(symbol, 0)
             portfolio_value += qty * price
-            
-        pnl = portfolio_value - self.initial_capital
-        roi = (pnl / self.initial_capital) * 100
-        
-        print(f"Total Trades: {total_trades}")
-        print(f"Final Portfolio Value: ${portfolio_value:.2f}")
-        print(f"Total PnL: ${pnl:.2f} ({roi:.2f}%)")
-        print(f"Total Fees Paid: ${total_commission:.2f}")
-        print(f"Est. Slippage Cost: ${total_slippage_cost:.2f}")
-        print("-----------------------")
+
+        return build_summary(self.initial_capital, portfolio_value, len(fills), total_commission, total_slippage_cost)
+
+    def results(self) -> BacktestResults:
+        """Structured results of the replay so far."""
+        bars = self._bar + 1
+        return BacktestResults(
+            initial_capital=self.initial_capital,
+            timestamps=self.timestamps[:bars],
+            equity=self.equity_curve[:bars],
+            gross_exposure=self.gross_exposure[:bars],
+            fills=self.fills.records.copy(),
+            symbols=self.symbols,
+            summary=self.summary()
+        )
+
+    def generate_report(self):
+        """Generate Performance Report with TCA."""
+        print_tca_report(self.summary())
+
+def build_summary(initial_capital: float, portfolio_value: float, total_trades: int, total_commission: float, total_slippage_cost: float) -> Dict[str, float]:
+    """Assemble the TCA summary shared by all backtest engines."""
+    pnl = portfolio_value - initial_capital
+    return {
+        'total_trades': total_trades,
+        'portfolio_value': portfolio_value,
+        'pnl': pnl,
+        'roi': (pnl / initial_capital) * 100,
+        'total_commission': total_commission,
+        'total_slippage_cost': total_slippage_cost
+    }
+
+def print_tca_report(summary: Dict[str, float]):
+    """Print a TCA summary in the standard report format."""
+    logger.info("--- Backtest Report ---")
+    print(f"Total Trades: {summary['total_trades']}")
+    print(f"Final Portfolio Value: ${summary['portfolio_value']:.2f}")
+    print(f"Total PnL: ${summary['pnl']:.2f} ({summary['roi']:.2f}%)")
+    print(f"Total Fees Paid: ${summary['total_commission']:.2f}")
+    print(f"Est. Slippage Cost: ${summary['total_slippage_cost']:.2f}")
+    print("-----------------------")
 
 # Example Strategy Callback
 async def example_strategy(backtester, event):
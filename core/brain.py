@@ -1,9 +1,11 @@
+import asyncio
 import logging
+from typing import List, Optional, Sequence
 import numpy as np
 import pandas as pd
 # import shap # Commented out to avoid import error if not installed, but architecture is ready
-from stable_baselines3 import PPO
 import os
+from core.policy_runtime import PolicyRuntime
 
 logger = logging.getLogger(__name__)
 
@@ -14,8 +16,14 @@ class Brain:
         self.load_model()
 
     def load_model(self):
-        if os.path.exists(self.model_path + ".zip"):
+        # Prefer an exported ONNX/TorchScript policy (see backend/brain/policy_export.py):
+        # it serves on CPU without loading stable-baselines3 or the training stack.
+        self.model = PolicyRuntime.find(self.model_path)
+        if self.model:
+            logger.info("Loaded exported PPO policy")
+        elif os.path.exists(self.model_path + ".zip"):
             try:
+                from stable_baselines3 import PPO
                 self.model = PPO.load(self.model_path)
                 logger.info("Loaded PPO Model")
             except Exception as e:
@@ -23,36 +31,71 @@ class Brain:
         else:
             logger.warning("No model found. Running in Random/Heuristic mode.")
 
-    def predict(self, features: pd.DataFrame):
+    @staticmethod
+    def _last_row(features):
+        """Latest feature row from a DataFrame, or a single row (dict/Series) as-is."""
+        if isinstance(features, pd.DataFrame):
+            return features.iloc[-1]
+        return features
+
+    def predict(self, features):
         """
         Returns action: 0 (Hold), 1 (Buy), 2 (Sell)
+        Accepts a feature DataFrame (last row is used) or a single feature row.
         """
+        last_row = self._last_row(features)
         if self.model:
             # Ensure input matches training shape (drop timestamp if present)
-            obs = features.iloc[-1].copy()
-            if 'timestamp' in obs:
-                obs = obs.drop('timestamp')
+            obs = [value for key, value in last_row.items() if key != 'timestamp']
             
             # Reshape for model (1, n_features)
-            obs_array = obs.values.reshape(1, -1)
+            obs_array = np.asarray(obs).reshape(1, -1)
             
             action, _states = self.model.predict(obs_array)
             return int(action[0])
         else:
             # Fallback: Simple Heuristic
-            last_row = features.iloc[-1]
             if last_row['rsi'] < 30:
                 return 1 # Buy
             elif last_row['rsi'] > 70:
                 return 2 # Sell
             return 0 # Hold
 
-    def explain_decision(self, features: pd.DataFrame):
+    def predict_batch(self, observations, feature_names: Optional[Sequence[str]] = None) -> np.ndarray:
+        """
+        Actions for many symbols/strategies in one forward pass.
+
+        Args:
+            observations: (n_rows, n_features) matrix, or a DataFrame with one row per symbol.
+            feature_names: Column names of the matrix (needed for the heuristic fallback).
+
+        Returns:
+            np.ndarray: int actions, 0 (Hold), 1 (Buy), 2 (Sell), one per row.
+        """
+        if isinstance(observations, pd.DataFrame):
+            observations = observations.drop(columns='timestamp', errors='ignore')
+            feature_names = list(observations.columns)
+            observations = observations.to_numpy()
+        obs = np.asarray(observations)
+        if obs.ndim == 1:
+            obs = obs.reshape(1, -1)
+
+        if self.model:
+            actions, _states = self.model.predict(obs)
+            return np.asarray(actions, dtype=np.int64).reshape(-1)
+
+        # Fallback: Simple Heuristic, vectorised over rows
+        if feature_names is None or 'rsi' not in feature_names:
+            raise ValueError("feature_names with 'rsi' are required for heuristic batch prediction")
+        rsi = obs[:, list(feature_names).index('rsi')].astype(np.float64)
+        return np.where(rsi < 30, 1, np.where(rsi > 70, 2, 0)).astype(np.int64)
+
+    def explain_decision(self, features):
         """
         Returns SHAP values or text explanation.
         """
         # Mock XAI for now
-        last_row = features.iloc[-1]
+        last_row = self._last_row(features)
         explanation = {
             "reason": "Unknown",
             "confidence": 0.85
@@ -67,3 +110,68 @@ class Brain:
              explanation["reason"] += f" & Price deviation high (Z={last_row['z_score']:.2f})"
 
         return explanation
+
+
+class BrainBatcher:
+    """
+    Micro-batching front end for a shared Brain.
+    Requests from concurrent strategies arriving within `window_ms` of the first one
+    are answered by a single `predict_batch` call.
+    """
+    def __init__(self, brain: Brain, window_ms: float = 1.0, max_batch: int = 256):
+        """
+        Args:
+            brain (Brain): Model used for inference.
+            window_ms (float): How long to wait for more requests after the first.
+            max_batch (int): Flush immediately once this many requests are queued.
+        """
+        self.brain = brain
+        self.window = window_ms / 1000.0
+        self.max_batch = max_batch
+        self._pending: List[tuple] = [] # (feature_names, vector, future)
+        self._timer = None
+        self.batches = 0
+        self.requests = 0
+
+    async def predict(self, features) -> int:
+        """Same contract as Brain.predict, resolved together with other queued requests."""
+        row = Brain._last_row(features)
+        names = tuple(key for key in row.keys() if key != 'timestamp')
+        vector = [row[key] for key in names]
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((names, vector, future))
+        self.requests += 1
+
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        pending, self._pending = self._pending, []
+        if not pending:
+            return
+
+        # Rows with different feature layouts cannot share a matrix
+        groups = {}
+        for names, vector, future in pending:
+            groups.setdefault(names, []).append((vector, future))
+
+        for names, items in groups.items():
+            self.batches += 1
+            try:
+                actions = self.brain.predict_batch(np.asarray([vector for vector, _ in items]), feature_names=names)
+            except Exception as e:
+                for _, future in items:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            for (_, future), action in zip(items, actions):
+                if not future.done():
+                    future.set_result(int(action))
@@ -1,14 +1,28 @@
 import asyncio
 import json
 import logging
+import time
 import aiohttp
-from typing import List, Callable, Dict
+import numpy as np
+from typing import List, Callable, Dict, Optional
+from core.vwap_executor import parse_agg_trade
+from core.market_cache import market_cache, MarketDataCache
+from core.local_order_book import LocalOrderBookManager
 from config.config import settings
-from db.redis_client import redis_client
+from db.redis_client import redis_client, CoalescingWriter
 from db.timescale import db
+from db.batch_writer import BatchWriter, MARKET_DATA_COLUMNS, market_data_row
 
 logger = logging.getLogger(__name__)
 
+try:
+    import orjson
+    _loads = orjson.loads
+    ORJSON_AVAILABLE = True
+except ImportError:
+    _loads = json.loads
+    ORJSON_AVAILABLE = False
+
 class WebSocketManager:
     """
     Manages WebSocket connections with auto-reconnection and heartbeat logic.
@@ -50,74 +64,245 @@ class WebSocketManager:
         if self.ws:
             await self.ws.close()
 
+# Stream kinds subscribed per symbol; the stream id is symbol_index * len(STREAM_SUFFIXES) + kind
+STREAM_TICKER = 0
+STREAM_DEPTH = 1
+STREAM_TRADE = 2
+STREAM_DIFF_DEPTH = 3
+STREAM_SUFFIXES = ('@ticker', '@depth10@100ms', '@aggTrade', '@depth@100ms')
+
+# Latest decoded values per symbol, one preallocated row each
+SYMBOL_STATE_DTYPE = np.dtype([
+    ('last', np.float64),
+    ('volume', np.float64),
+    ('bid', np.float64),
+    ('ask', np.float64),
+    ('bid_qty', np.float64),
+    ('ask_qty', np.float64),
+    ('trade_price', np.float64),
+    ('trade_qty', np.float64),
+    ('event_time', np.int64),
+    ('messages', np.int64)
+])
+
 class CEXFeed:
     """
     Real-time Data Feed from Centralized Exchanges via WebSocket.
+
+    Streams are multiplexed over Binance combined-stream connections
+    (`/stream?streams=...`), sharded by symbol count so hundreds of symbols stay
+    under the per-connection stream limit. Every stream name is mapped to an integer
+    id up front; a message is decoded once (orjson when installed) and dispatched by
+    id into preallocated per-symbol rows (`self.state`), the market cache and the
+    trade listeners. With `order_books`, the partial depth10 snapshots are replaced
+    by the diff-depth stream maintaining full local books.
     """
-    def __init__(self):
-        # Binance WebSocket URL
-        self.base_url = "wss://stream.binance.com:9443/ws"
-        self.symbols = ['btcusdt', 'ethusdt']
+    LATENCY_SAMPLES = 4096
+
+    def __init__(self, symbols: Optional[List[str]] = None, symbols_per_connection: int = 100, cache: MarketDataCache = market_cache, db_writer: Optional[BatchWriter] = None, redis_writer: Optional[CoalescingWriter] = None, order_books: Optional[LocalOrderBookManager] = None, book_levels: int = 20):
+        """
+        Args:
+            symbols (List[str]): Symbols to subscribe ('btcusdt', 'BTC/USDT', ...).
+            symbols_per_connection (int): Symbols per combined-stream connection
+                (each symbol opens three streams; Binance allows 1024).
+            cache (MarketDataCache): In-process top of book / last trade for the execution algorithms.
+            db_writer (BatchWriter): Batched market_data writer (defaults to one on the shared db).
+            redis_writer (CoalescingWriter): Latest-value Redis writer (defaults to one on the shared client).
+            order_books (LocalOrderBookManager): Full-depth local books fed by the diff-depth stream.
+            book_levels (int): Levels of a local book published to the cache and Redis per update.
+        """
+        self.market_cache = cache
+        # Ticks are buffered and COPYed in batches instead of one INSERT task per message
+        self.db_writer = db_writer or BatchWriter(db, 'market_data', MARKET_DATA_COLUMNS)
+        # Ticker and book snapshots are coalesced per key and sent as one MSET per flush
+        self.redis_writer = redis_writer or CoalescingWriter(redis_client)
+        self.order_books = order_books
+        self.book_levels = book_levels
+        if order_books is not None and cache.order_books is None:
+            cache.order_books = order_books
+
+        # Binance combined-stream WebSocket URL
+        self.base_url = "wss://stream.binance.com:9443/stream?streams="
+        self.symbols = [s.replace('/', '').lower() for s in (symbols or ['btcusdt', 'ethusdt'])]
+        self.symbol_names = [s.upper() for s in self.symbols] # Exchange symbols, indexed like self.state
+        self.symbol_index = {name: i for i, name in enumerate(self.symbol_names)}
+        self.state = np.zeros(len(self.symbols), dtype=SYMBOL_STATE_DTYPE)
+
+        # ticker, L2 Order Book (partial snapshots or diffs), Trade prints (volume for VWAP/POV)
+        depth_kind = STREAM_DEPTH if order_books is None else STREAM_DIFF_DEPTH
+        self.stream_kinds = (STREAM_TICKER, depth_kind, STREAM_TRADE)
         self.streams = []
-        for s in self.symbols:
-            self.streams.append(f"{s}@ticker")
-            self.streams.append(f"{s}@depth10@100ms") # L2 Order Book
-        
-        self.stream_url = f"{self.base_url}/{'/'.join(self.streams)}"
-        self.ws_manager = WebSocketManager(self.stream_url, self.handle_message)
+        self.stream_ids: Dict[str, int] = {}
+        for index, s in enumerate(self.symbols):
+            for kind in self.stream_kinds:
+                self.stream_ids[f"{s}{STREAM_SUFFIXES[kind]}"] = index * len(STREAM_SUFFIXES) + kind
+                self.streams.append(f"{s}{STREAM_SUFFIXES[kind]}")
+
+        # Synchronous trade callbacks per exchange symbol (e.g. 'BTCUSDT'); they must not block
+        self.trade_listeners: Dict[str, List[Callable]] = {}
+
+        streams_per_connection = max(symbols_per_connection, 1) * len(self.stream_kinds)
+        self.stream_urls = [
+            self.base_url + '/'.join(self.streams[i:i + streams_per_connection])
+            for i in range(0, len(self.streams), streams_per_connection)
+        ]
+        self.ws_managers = [WebSocketManager(url, self.handle_message) for url in self.stream_urls]
+        self.stream_url = self.stream_urls[0]
+        self.ws_manager = self.ws_managers[0]
+
+        self._decode_latencies = np.zeros(self.LATENCY_SAMPLES)
+        self._started_at: Optional[float] = None
+        self.metrics = {
+            'messages': 0,
+            'bytes': 0,
+            'errors': 0,
+            'unknown_streams': 0,
+            'by_kind': [0] * len(STREAM_SUFFIXES),
+            'decode_seconds': 0.0,
+            'max_decode_us': 0.0
+        }
 
     async def start(self):
-        logger.info("Starting CEX WebSocket Feed...")
-        await self.ws_manager.connect()
+        logger.info(f"Starting CEX WebSocket Feed: {len(self.streams)} streams over {len(self.ws_managers)} connection(s) (orjson={ORJSON_AVAILABLE})...")
+        self._started_at = time.monotonic()
+        await self.db_writer.start()
+        await self.redis_writer.start()
+        await asyncio.gather(*(manager.connect() for manager in self.ws_managers))
 
-    async def handle_message(self, message: str):
+    async def handle_message(self, message):
+        started = time.perf_counter()
         try:
-            data = json.loads(message)
-            stream = data.get('stream')
-            payload = data.get('data')
+            data = _loads(message)
+        except Exception as e:
+            self.metrics['errors'] += 1
+            logger.error(f"Error decoding message: {e}")
+            return
+        elapsed = time.perf_counter() - started
+
+        metrics = self.metrics
+        count = metrics['messages']
+        self._decode_latencies[count % self.LATENCY_SAMPLES] = elapsed
+        metrics['messages'] = count + 1
+        metrics['bytes'] += len(message)
+        metrics['decode_seconds'] += elapsed
+        if elapsed * 1e6 > metrics['max_decode_us']:
+            metrics['max_decode_us'] = elapsed * 1e6
 
-            if not stream or not payload:
-                return
+        stream_id = self.stream_ids.get(data.get('stream'))
+        payload = data.get('data')
+        if stream_id is None or not payload:
+            metrics['unknown_streams'] += 1
+            return
+        index, kind = divmod(stream_id, len(STREAM_SUFFIXES))
+        metrics['by_kind'][kind] += 1
 
-            if 'ticker' in stream:
+        try:
+            row = self.state[index]
+            row['messages'] += 1
+            if kind == STREAM_TRADE:
+                row['trade_price'] = payload['p']
+                row['trade_qty'] = payload['q']
+                row['event_time'] = payload['E']
+                self.process_trade(payload)
+            elif kind == STREAM_TICKER:
+                row['last'] = payload['c']
+                row['volume'] = payload['q']
+                row['bid'] = payload['b']
+                row['ask'] = payload['a']
+                row['bid_qty'] = payload['B']
+                row['ask_qty'] = payload['A']
+                row['event_time'] = payload['E']
                 await self.process_ticker(payload)
-            elif 'depth' in stream:
-                await self.process_order_book(payload)
+            elif kind == STREAM_DEPTH:
+                # Partial depth payloads carry no symbol; it comes from the stream id
+                await self.process_order_book(payload, self.symbol_names[index])
+            else:
+                book = self.order_books.on_depth_event(self.symbol_names[index], payload)
+                if book is not None:
+                    await self.process_order_book(book.snapshot(self.book_levels), book.symbol)
 
         except Exception as e:
+            metrics['errors'] += 1
             logger.error(f"Error handling message: {e}")
 
+    def symbol_state(self, symbol: str) -> Optional[np.void]:
+        """Latest decoded row for a symbol (a view into self.state), or None if not subscribed."""
+        index = self.symbol_index.get(symbol.replace('/', '').upper())
+        return None if index is None else self.state[index]
+
+    def stats(self) -> Dict:
+        """Throughput and decode latency since start."""
+        count = self.metrics['messages']
+        elapsed = time.monotonic() - self._started_at if self._started_at else 0.0
+        stats = {
+            'messages': count,
+            'messages_per_second': count / elapsed if elapsed else 0.0,
+            'bytes_per_second': self.metrics['bytes'] / elapsed if elapsed else 0.0,
+            'avg_decode_us': self.metrics['decode_seconds'] / count * 1e6 if count else 0.0,
+            'max_decode_us': self.metrics['max_decode_us'],
+            'by_kind': dict(zip(('ticker', 'depth', 'trade', 'diff_depth'), self.metrics['by_kind'])),
+            'errors': self.metrics['errors'],
+            'connections': len(self.ws_managers)
+        }
+        stats.update(self.latency_percentiles())
+        return stats
+
+    def latency_percentiles(self, percentiles: List[float] = (50, 99)) -> Dict[str, float]:
+        """Decode latency percentiles in microseconds over the recent samples."""
+        samples = self._decode_latencies[:min(self.metrics['messages'], self.LATENCY_SAMPLES)]
+        if not samples.size:
+            return {}
+        values = np.percentile(samples, percentiles) * 1e6
+        return {f'decode_p{p:g}_us': float(v) for p, v in zip(percentiles, values)}
+
     async def process_ticker(self, data: dict):
         symbol = data['s']
         price = float(data['c'])
         volume = float(data['q'])
+        self.market_cache.update_ticker(symbol, data)
         
         # Save to Redis for ultra-low latency access
-        await redis_client.redis.set(f"ticker:{symbol}", json.dumps({
+        self.redis_writer.set_json(f"ticker:{symbol}", {
             'price': price,
             'volume': volume,
             'time': data['E']
-        }))
+        })
 
-        # Async insert to TimescaleDB (fire and forget to avoid blocking)
-        asyncio.create_task(self.save_to_db(symbol, price, volume))
+        # Queue for the batched TimescaleDB writer, stamped with the exchange event time
+        self.db_writer.add(market_data_row(symbol, price, volume, data['E']))
 
-    async def process_order_book(self, data: dict):
-        symbol = data['s']
+    def add_trade_listener(self, symbol: str, callback: Callable):
+        """Register `callback(trade)` for a symbol ('BTC/USDT' or 'BTCUSDT')."""
+        self.trade_listeners.setdefault(symbol.replace('/', '').upper(), []).append(callback)
+
+    def remove_trade_listener(self, symbol: str, callback: Callable):
+        listeners = self.trade_listeners.get(symbol.replace('/', '').upper(), [])
+        if callback in listeners:
+            listeners.remove(callback)
+
+    def process_trade(self, data: dict):
+        trade = parse_agg_trade(data)
+        self.market_cache.on_trade(trade)
+        listeners = self.trade_listeners.get(data['s'])
+        if not listeners:
+            return
+        for callback in listeners:
+            try:
+                callback(trade)
+            except Exception as e:
+                logger.error(f"Trade listener error: {e}")
+
+    async def process_order_book(self, data: dict, symbol: str = None):
+        symbol = data.get('s', symbol)
         # data['bids'] and data['asks'] are lists of [price, quantity]
+        self.market_cache.update_depth(symbol, data)
         # Snapshot to Redis
-        await redis_client.set_order_book(symbol, data)
-
-    async def save_to_db(self, symbol, price, volume):
-        try:
-            async with db.pool.acquire() as conn:
-                await conn.execute("""
-                    INSERT INTO market_data (time, symbol, price, volume, source)
-                    VALUES (NOW(), $1, $2, $3, 'binance_ws')
-                """, symbol, price, volume)
-        except Exception as e:
-            logger.error(f"DB Insert Error: {e}")
+        self.redis_writer.set_order_book(symbol, data)
 
     async def stop(self):
-        await self.ws_manager.stop()
+        await asyncio.gather(*(manager.stop() for manager in self.ws_managers))
+        await self.db_writer.close()
+        await self.redis_writer.close()
+        if self.order_books is not None:
+            await self.order_books.close()
         logger.info("CEX Feed stopped")
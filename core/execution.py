@@ -3,6 +3,11 @@ import logging
 import math
 from typing import Optional, Dict, List
 import time
+from core.pretrade_risk import PreTradeRiskGate
+from core.order_tracker import OrderTracker, TrackedOrder
+from core.vwap_executor import VWAPExecutor
+from core.market_cache import MarketDataCache, market_cache as shared_market_cache
+from core.stop_manager import StopManager, StopOrder, close_orders
 
 try:
     import rust_core
@@ -21,18 +26,65 @@ class ExecutionEngine:
     Handles order placement, risk management, and algorithmic execution (TWAP/VWAP).
     """
 
-    def __init__(self, exchange_client):
+    def __init__(self, exchange_client, risk_gate: Optional[PreTradeRiskGate] = None, order_tracker: Optional[OrderTracker] = None, market_cache: Optional[MarketDataCache] = None, quote_max_age: float = 2.0):
         """
         Initialize the ExecutionEngine.
 
         Args:
             exchange_client: An initialized CCXT exchange instance or compatible wrapper.
+            risk_gate (PreTradeRiskGate): Pre-trade limits checked before every order
+                                          (defaults to a gate with only the price band enabled).
+            order_tracker (OrderTracker): Order state machine / PnL (pass one with a db to persist history).
+            market_cache (MarketDataCache): Stream-fed quotes (defaults to the process-wide cache CEXFeed writes to).
+            quote_max_age (float): Seconds before a cached quote is stale and REST is used instead.
         """
         self.exchange = exchange_client
-        self.active_orders = {}
-        self.trailing_stops = {}  # {symbol: {'entry_price': float, 'high_water_mark': float, 'trailing_pct': float}}
+        self.market_cache = market_cache or shared_market_cache
+        self.quote_max_age = quote_max_age
+        self.risk_gate = risk_gate or PreTradeRiskGate()
+        if self.risk_gate.market_cache is None:
+            self.risk_gate.market_cache = self.market_cache
+        self.orders = order_tracker or OrderTracker()
+        self.stops = StopManager()
+        self.trailing_stops = {}  # {symbol: stop_id} for the single-position set_trailing_stop API
+        self.stop_close_slippage = 0.002 # Close orders cross the trigger price by 0.2% to get filled
 
-    async def place_limit_order(self, symbol: str, side: str, amount: float, price: float) -> Optional[Dict]:
+    @property
+    def active_orders(self) -> Dict[str, TrackedOrder]:
+        """Working (non-terminal) orders by exchange id."""
+        return self.orders.orders
+
+    async def start(self):
+        """Start the background parts: batched order history and the gate's VaR budget refresh."""
+        await self.orders.start()
+        await self.risk_gate.start()
+
+    def risk_positions(self) -> List[Dict]:
+        """Open positions as RiskEngine position dicts (symbol, signed quantity, mark price)."""
+        return [
+            {'symbol': position.symbol, 'quantity': position.quantity, 'price': position.mark_price or position.avg_price}
+            for position in self.orders.positions.values() if position.quantity
+        ]
+
+    def mark_positions(self):
+        """Mark open positions to the cached last trade (or quote mid) for unrealized PnL."""
+        for symbol, position in self.orders.positions.items():
+            if not position.quantity:
+                continue
+            price = self.market_cache.last_price(symbol)
+            if not price:
+                quote = self.market_cache.top(symbol)
+                price = 0.5 * (quote[0] + quote[1]) if quote and quote[0] > 0 and quote[1] > 0 else 0.0
+            if price:
+                self.orders.mark(symbol, price)
+
+    @property
+    def current_pnl(self) -> float:
+        """Realized + unrealized PnL of positions traded through this engine, marked to the market cache."""
+        self.mark_positions()
+        return self.orders.realized_pnl + self.orders.unrealized_pnl
+
+    async def place_limit_order(self, symbol: str, side: str, amount: float, price: float, client_order_id: Optional[str] = None, strategy: Optional[str] = None) -> Optional[Dict]:
         """
         Place a Limit Order to act as a Maker and save fees.
 
@@ -41,10 +93,18 @@ class ExecutionEngine:
             side (str): 'buy' or 'sell'.
             amount (float): Quantity to trade.
             price (float): Limit price.
+            client_order_id (str): Our id for the order (sent as clientOrderId).
+            strategy (str): Tag stored with the order in trade_history.
 
         Returns:
             Optional[Dict]: Order response from exchange or None on failure.
         """
+        # Pre-Trade Risk Gate (precomputed limits, no I/O). Acceptance reserves the
+        # quantity as pending exposure before the first await, so concurrent orders count.
+        accepted, reason = self.risk_gate.check(symbol, side, amount, price)
+        if not accepted:
+            return None
+        placed = False
         try:
             # Rust-based Pre-Trade Validation (Nanosecond latency)
             if RUST_AVAILABLE:
@@ -55,12 +115,22 @@ class ExecutionEngine:
                     return None
 
             logger.info(f"Placing LIMIT {side.upper()} order for {symbol}: {amount} @ {price}")
-            order = await self.exchange.create_order(symbol, 'limit', side, amount, price)
-            self.active_orders[order['id']] = order
+            params = {'clientOrderId': client_order_id} if client_order_id else {}
+            order = await self.exchange.create_order(symbol, 'limit', side, amount, price, params)
+            if not order:
+                logger.error(f"Exchange returned no order for {symbol} {side} {amount} @ {price}")
+                return None
+            self.orders.add(str(order['id']), symbol, side, amount, price, client_order_id, strategy)
+            placed = True
+            # The response may already carry fills (marketable limit orders)
+            self.on_order_update(order)
             return order
         except Exception as e:
             logger.error(f"Failed to place limit order for {symbol}: {e}")
             return None
+        finally:
+            if not placed:
+                self.risk_gate.on_cancel(symbol, side, amount) # Release the reservation
 
     async def execute_twap(self, symbol: str, side: str, total_amount: float, duration_minutes: int, num_splits: int):
         """
@@ -81,9 +151,9 @@ class ExecutionEngine:
 
         for i in range(num_splits):
             try:
-                # Fetch current best bid/ask to place a competitive limit order
-                ticker = await self.exchange.fetch_ticker(symbol)
-                current_price = ticker['bid'] if side == 'buy' else ticker['ask']
+                # Best bid/ask from the stream-fed cache (REST fetch_ticker only if stale)
+                quote = await self.market_cache.get_quote(symbol, self.exchange, self.quote_max_age)
+                current_price = quote['bid'] if side == 'buy' else quote['ask']
                 
                 # Place child order
                 await self.place_limit_order(symbol, side, amount_per_order, current_price)
@@ -98,23 +168,51 @@ class ExecutionEngine:
         
         logger.info(f"TWAP execution for {symbol} completed.")
 
-    async def execute_vwap(self, symbol: str, side: str, total_amount: float, volume_profile: List[float]):
+    async def execute_vwap(self, symbol: str, side: str, total_amount: float, volume_profile: List[float], feed=None, bucket_seconds: float = 60.0, timeout: Optional[float] = None, **kwargs) -> Dict:
         """
         Execute a Volume-Weighted Average Price (VWAP) strategy.
-        Splits orders based on historical volume profile.
+        Splits orders based on historical volume profile, pacing each bucket by the
+        volume actually traded in the market (from the feed's trade stream).
         
         Args:
             volume_profile (List[float]): List of percentages (0.0 to 1.0) summing to 1.0, 
                                           representing volume distribution over time intervals.
+            feed (CEXFeed): Source of live trades (anything with add/remove_trade_listener).
+            bucket_seconds (float): Length of each profile interval.
+            timeout (float): Give up after this many seconds (defaults to the profile length plus one
+                             bucket to sweep the rest); children still working are then canceled.
+            **kwargs: Passed to VWAPExecutor (max_participation, min_child, price_offset_bps).
+
+        Returns:
+            Dict: Execution summary (submitted and filled quantity, children, fill participation).
         """
-        # Simplified implementation assuming equal time intervals matching the profile length
         logger.info(f"Starting VWAP execution for {symbol}")
-        
-        # This is a placeholder for the complex logic of matching real-time volume
-        # In a real HFT system, this would subscribe to trade stream and execute based on volume buckets
-        pass
+        executor = VWAPExecutor(self, symbol, side, total_amount, volume_profile=volume_profile, bucket_seconds=bucket_seconds, **kwargs)
+        if timeout is None:
+            timeout = (len(volume_profile) + 1) * bucket_seconds
+        return await self._run_executor(executor, feed, timeout)
 
-    def set_trailing_stop(self, symbol: str, entry_price: float, trailing_percent: float):
+    async def execute_pov(self, symbol: str, side: str, total_amount: float, participation_rate: float, feed=None, timeout: Optional[float] = None, **kwargs) -> Dict:
+        """
+        Percentage-of-Volume execution: trade `participation_rate` of market volume until done.
+        """
+        logger.info(f"Starting POV execution for {symbol} at {participation_rate:.1%} participation")
+        executor = VWAPExecutor(self, symbol, side, total_amount, participation_rate=participation_rate, **kwargs)
+        return await self._run_executor(executor, feed, timeout)
+
+    async def _run_executor(self, executor: VWAPExecutor, feed, timeout: Optional[float]) -> Dict:
+        if feed is None:
+            raise ValueError("Volume-driven execution needs a trade feed (e.g. CEXFeed)")
+        feed.add_trade_listener(executor.symbol, executor.on_trade)
+        try:
+            await executor.wait(timeout)
+        finally:
+            feed.remove_trade_listener(executor.symbol, executor.on_trade)
+        summary = executor.summary()
+        logger.info(f"Execution for {executor.symbol} completed: {summary}")
+        return summary
+
+    def set_trailing_stop(self, symbol: str, entry_price: float, trailing_percent: float, side: str = 'long', quantity: Optional[float] = None, account: Optional[str] = None) -> StopOrder:
         """
         Initialize a trailing stop for a position.
 
@@ -122,14 +220,17 @@ class ExecutionEngine:
             symbol (str): Trading pair.
             entry_price (float): The price at which the position was entered.
             trailing_percent (float): The percentage distance for the stop (e.g., 0.02 for 2%).
+            side (str): Position side, 'long' or 'short'.
+            quantity (float): Position size to close automatically when triggered (None = signal only).
+            account (str): Sub-account the position belongs to.
         """
-        self.trailing_stops[symbol] = {
-            'entry_price': entry_price,
-            'high_water_mark': entry_price, # Initialize with entry price
-            'trailing_pct': trailing_percent,
-            'active': True
-        }
+        previous = self.trailing_stops.get(symbol)
+        if previous is not None:
+            self.stops.cancel(previous)
+        stop = self.stops.add_trailing(symbol, side, entry_price, trailing_percent, quantity, account)
+        self.trailing_stops[symbol] = stop.stop_id
         logger.info(f"Trailing stop set for {symbol} at {trailing_percent*100}%")
+        return stop
 
     async def check_trailing_stop(self, symbol: str, current_price: float) -> bool:
         """
@@ -143,35 +244,88 @@ class ExecutionEngine:
         Returns:
             bool: True if stop triggered (should sell), False otherwise.
         """
-        stop_data = self.trailing_stops.get(symbol)
-        if not stop_data or not stop_data['active']:
-            return False
+        stop_id = self.trailing_stops.get(symbol)
+        triggered = await self.on_price(symbol, current_price)
+        if stop_id is not None and any(stop.stop_id == stop_id for stop in triggered):
+            logger.warning(f"Trailing Stop Triggered for {symbol}! Price: {current_price}")
+            del self.trailing_stops[symbol]
+            return True
+        return False
 
-        # Update high water mark (assuming long position for simplicity)
-        if current_price > stop_data['high_water_mark']:
-            stop_data['high_water_mark'] = current_price
-            # logger.debug(f"New high water mark for {symbol}: {current_price}")
+    async def on_price(self, symbol: str, price: float) -> List[StopOrder]:
+        """
+        Run all stops of a symbol against a price update; positions with a quantity are
+        closed with one aggregated order per sub-account and side, sent concurrently.
+        """
+        triggered = self.stops.on_price(symbol, price)
+        if triggered:
+            batch = close_orders(triggered)
+            if batch:
+                await asyncio.gather(*(self._send_close(order) for order in batch))
+        return triggered
 
-        # Calculate dynamic stop price
-        stop_price = stop_data['high_water_mark'] * (1 - stop_data['trailing_pct'])
-        
-        if current_price <= stop_price:
-            logger.warning(f"Trailing Stop Triggered for {symbol}! Price: {current_price}, Stop: {stop_price}")
-            stop_data['active'] = False # Deactivate after trigger
+    async def _send_close(self, order: Dict) -> Optional[Dict]:
+        slip = self.stop_close_slippage
+        price = order['price'] * (1 - slip if order['side'] == 'sell' else 1 + slip)
+        logger.warning(f"Stop close: {order['side'].upper()} {order['amount']} {order['symbol']} (account={order['account']}, stops={order['stop_ids']})")
+        return await self.place_limit_order(order['symbol'], order['side'], order['amount'], price, strategy='stop')
+
+    def on_order_update(self, update: Dict) -> Optional[TrackedOrder]:
+        """
+        Feed an exchange order update (CCXT order dict, e.g. from fetch_order or a
+        user-data stream) into the order state machine and the pre-trade gate.
+        """
+        order, fill_quantity, _fill_price = self.orders.on_exchange_update(update)
+        if order is None:
+            return None
+        if fill_quantity:
+            self.risk_gate.on_fill(order.symbol, order.side, fill_quantity)
+        if order.is_terminal and order.remaining: # Canceled, rejected or closed short of its quantity
+            self.risk_gate.on_cancel(order.symbol, order.side, order.remaining)
+        return order
+
+    async def cancel_order(self, order_id: str) -> bool:
+        """Cancel one working order and release its open exposure."""
+        order = self.orders.get(order_id)
+        if order is None:
+            return False
+        try:
+            update = await self.exchange.cancel_order(order_id, order.symbol)
+            if isinstance(update, dict) and update.get('status'):
+                self.on_order_update(update)
+            if not order.is_terminal:
+                self.orders.on_cancel(order_id)
+                self.risk_gate.on_cancel(order.symbol, order.side, order.remaining)
             return True
-            
-        return False
+        except Exception as e:
+            logger.error(f"Failed to cancel order {order_id}: {e}")
+            return False
+
+    async def close(self):
+        """Stop the VaR refresh, flush order history and close the exchange session."""
+        await self.risk_gate.stop()
+        await self.orders.close()
+        if self.exchange is not None and hasattr(self.exchange, 'close'):
+            try:
+                await self.exchange.close()
+            except Exception as e:
+                logger.error(f"Failed to close exchange session: {e}")
 
     async def cancel_all_orders(self, symbol: Optional[str] = None):
         """
         Cancel all open orders. Used for emergency stop or cleanup.
+        Without a symbol, cancels per symbol with working tracked orders (not all
+        exchanges support cancel_all without one). Tracked orders of each symbol
+        whose cancel succeeded move to canceled and release their open exposure.
         """
-        try:
-            if symbol:
-                await self.exchange.cancel_all_orders(symbol)
-            else:
-                # Note: Some exchanges don't support cancel_all without symbol
-                # This would need to iterate over all active symbols in a real scenario
-                logger.warning("Cancel all orders without symbol might not be supported by all exchanges.")
-        except Exception as e:
-            logger.error(f"Failed to cancel orders: {e}")
+        symbols = [symbol] if symbol else sorted({order.symbol for order in self.orders.open_orders()})
+        for sym in symbols:
+            try:
+                await self.exchange.cancel_all_orders(sym)
+            except Exception as e:
+                logger.error(f"Failed to cancel orders for {sym}: {e}")
+                continue
+            for order in self.orders.open_orders(sym):
+                remaining = order.remaining
+                if self.orders.on_cancel(order.order_id) is not None:
+                    self.risk_gate.on_cancel(order.symbol, order.side, remaining)
@@ -1,6 +1,9 @@
 import pandas as pd
 import numpy as np
 import logging
+import math
+from collections import deque
+from typing import Dict, Optional
 
 logger = logging.getLogger(__name__)
 
@@ -66,3 +69,154 @@ class FeatureEngineer:
         loss = (-delta.where(delta < 0, 0)).rolling(window=period).mean()
         rs = gain / loss
         return 100 - (100 / (1 + rs))
+
+
+class RollingWindow:
+    """
+    Fixed-size rolling window with O(1) updates.
+    Keeps a compensated running sum and Welford mean/M2 under add/remove,
+    mirroring how pandas' rolling mean/std are computed.
+    """
+    def __init__(self, window: int):
+        self.window = window
+        self.values = deque()
+        self._sum = 0.0
+        self._compensation = 0.0
+        self._mean = 0.0
+        self._m2 = 0.0
+        self._nonzero = 0
+        self._same_run = 0 # Length of the current run of identical values
+
+    def push(self, x: float):
+        if len(self.values) == self.window:
+            self._remove(self.values.popleft())
+        if self.values and x == self.values[-1]:
+            self._same_run += 1
+        else:
+            self._same_run = 1
+        self.values.append(x)
+        self._add(x)
+
+    @property
+    def full(self) -> bool:
+        return len(self.values) == self.window
+
+    def sum(self) -> float:
+        # Exact zero when nothing non-zero is left, instead of accumulated rounding error
+        return self._sum + self._compensation if self._nonzero else 0.0
+
+    def mean(self) -> float:
+        if self._same_run >= len(self.values):
+            return self.values[-1]
+        return self.sum() / len(self.values)
+
+    def std(self) -> float:
+        """Sample standard deviation (ddof=1)."""
+        n = len(self.values)
+        if n < 2 or self._same_run >= n:
+            return 0.0
+        return math.sqrt(max(self._m2, 0.0) / (n - 1))
+
+    def _kahan_add(self, x: float):
+        # Neumaier compensated summation
+        total = self._sum + x
+        if abs(self._sum) >= abs(x):
+            self._compensation += (self._sum - total) + x
+        else:
+            self._compensation += (x - total) + self._sum
+        self._sum = total
+
+    def _add(self, x: float):
+        self._kahan_add(x)
+        if x != 0:
+            self._nonzero += 1
+        n = len(self.values)
+        delta = x - self._mean
+        self._mean += delta / n
+        self._m2 += delta * (x - self._mean)
+
+    def _remove(self, x: float):
+        self._kahan_add(-x)
+        if x != 0:
+            self._nonzero -= 1
+        n = len(self.values)
+        if n == 0:
+            self._mean = 0.0
+            self._m2 = 0.0
+            return
+        delta = x - self._mean
+        self._mean -= delta / n
+        self._m2 -= delta * (x - self._mean)
+
+class StreamingFeatureEngineer:
+    """
+    Stateful counterpart of FeatureEngineer.calculate_features with O(1) work per tick.
+    `update` returns the same values as the last row of the batch path over the full
+    history, or None while indicators are warming up (or the row would be dropped by dropna).
+    """
+    def __init__(self, rsi_period: int = 14, sma_window: int = 20, flow_window: int = 5):
+        self.rsi_period = rsi_period
+        self.sma_window = sma_window
+        self.flow_window = flow_window
+        self.reset()
+
+    def reset(self):
+        self.prev_close = None
+        self.gains = RollingWindow(self.rsi_period)
+        self.losses = RollingWindow(self.rsi_period)
+        self.closes = RollingWindow(self.sma_window)
+        self.buy_vol = RollingWindow(self.flow_window)
+        self.sell_vol = RollingWindow(self.flow_window)
+        self.total_vol = RollingWindow(self.flow_window)
+
+    def update(self, market_data: Dict, on_chain_data: dict = None) -> Optional[Dict]:
+        """
+        Expects a tick dict with at least 'close' and 'volume'.
+        Returns the tick's fields plus features, in the batch column order.
+        """
+        close = float(market_data['close'])
+        volume = float(market_data['volume'])
+
+        # 1. Price change (the first tick counts as no change, like the batch path)
+        change = 0.0 if self.prev_close is None else close - self.prev_close
+        self.prev_close = close
+
+        self.gains.push(change if change > 0 else 0.0)
+        self.losses.push(-change if change < 0 else 0.0)
+        self.closes.push(close)
+        self.buy_vol.push(volume if change > 0 else 0.0)
+        self.sell_vol.push(volume if change < 0 else 0.0)
+        self.total_vol.push(volume)
+
+        if not (self.closes.full and self.gains.full):
+            return None
+
+        # 2. Technical Indicators
+        with np.errstate(divide='ignore', invalid='ignore'):
+            rs = np.float64(self.gains.mean()) / np.float64(self.losses.mean())
+            rsi = 100 - (100 / (1 + rs))
+            sma = self.closes.mean()
+            std = self.closes.std()
+            z_score = np.float64(close - sma) / np.float64(std)
+        if np.isnan(rsi) or np.isnan(z_score):
+            return None
+
+        # 3. Order Flow Toxicity
+        if self.total_vol.full:
+            total = self.total_vol.sum()
+            toxicity = (self.buy_vol.sum() - self.sell_vol.sum()) / (total if total != 0 else 1)
+        else:
+            toxicity = 0.0
+
+        features = dict(market_data)
+        features.update({
+            'rsi': float(rsi),
+            'sma_20': sma,
+            'std_20': std,
+            'bollinger_upper': sma + (std * 2),
+            'bollinger_lower': sma - (std * 2),
+            'z_score': float(z_score),
+            'order_flow_toxicity': toxicity,
+            'mvrv_ratio': on_chain_data['mvrv_ratio'] if on_chain_data and 'mvrv_ratio' in on_chain_data else 1.0
+        })
+        return features
@@ -0,0 +1,253 @@
+import logging
+from collections import namedtuple
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# One (possibly partial) execution produced by a fill model.
+# `slippage` is the per-unit price impact versus the reference price; `maker` selects the fee.
+SimulatedFill = namedtuple('SimulatedFill', ['quantity', 'price', 'slippage', 'maker'])
+
+def to_ns(timestamp) -> int:
+    """Normalise a datetime-like or epoch-nanosecond timestamp to int64 nanoseconds."""
+    if isinstance(timestamp, (int, np.integer)):
+        return int(timestamp)
+    return int(np.datetime64(timestamp, 'ns').astype(np.int64))
+
+class FillModel:
+    """
+    Base class for backtest fill simulation.
+    `execute` fills a new order; `on_market` returns fills for resting limit orders.
+    """
+
+    def execute(self, order, reference_price: float) -> List[SimulatedFill]:
+        raise NotImplementedError
+
+    def on_market(self, symbol: str, timestamp) -> List[tuple]:
+        """Returns [(order, SimulatedFill)] for resting orders filled up to `timestamp`."""
+        return []
+
+class FlatSlippageFillModel(FillModel):
+    """
+    Original model: fills the whole order immediately at the reference price
+    shifted by a flat slippage percentage.
+    """
+    def __init__(self, slippage_model: float = 0.0005):
+        self.slippage_model = slippage_model
+
+    def execute(self, order, reference_price: float) -> List[SimulatedFill]:
+        # Buy executes higher, Sell executes lower
+        slippage_impact = reference_price * self.slippage_model
+        exec_price = reference_price + slippage_impact if order.side == 'buy' else reference_price - slippage_impact
+        return [SimulatedFill(order.quantity, exec_price, slippage_impact, order.order_type == 'limit')]
+
+class DepthSnapshots:
+    """
+    Recorded L2 snapshots for one symbol as compact NumPy arrays.
+    Price/quantity matrices have shape (n_snapshots, levels); missing levels are NaN / 0.
+    Bids are best-first (descending), asks best-first (ascending).
+    """
+
+    def __init__(self, timestamps: np.ndarray, bid_px: np.ndarray, bid_qty: np.ndarray, ask_px: np.ndarray, ask_qty: np.ndarray):
+        self.timestamps = np.asarray(timestamps, dtype=np.int64)
+        self.bid_px = bid_px
+        self.bid_qty = bid_qty
+        self.ask_px = ask_px
+        self.ask_qty = ask_qty
+
+    @classmethod
+    def from_records(cls, records: Iterable[Dict], levels: int = 10) -> 'DepthSnapshots':
+        """
+        Build from exchange depth payloads, e.g. the dicts CEXFeed.process_order_book stores:
+        {'E' (ms) or 'timestamp', 'bids': [[price, qty], ...], 'asks': [[price, qty], ...]}.
+        """
+        records = list(records)
+        n = len(records)
+        timestamps = np.empty(n, dtype=np.int64)
+        bid_px = np.full((n, levels), np.nan)
+        ask_px = np.full((n, levels), np.nan)
+        bid_qty = np.zeros((n, levels))
+        ask_qty = np.zeros((n, levels))
+
+        for i, record in enumerate(records):
+            if 'timestamp' in record:
+                timestamps[i] = to_ns(record['timestamp'])
+            else:
+                timestamps[i] = int(record['E']) * 1_000_000
+            bids = np.asarray(record.get('bids') or record.get('b') or [], dtype=np.float64)[:levels]
+            asks = np.asarray(record.get('asks') or record.get('a') or [], dtype=np.float64)[:levels]
+            if len(bids):
+                bid_px[i, :len(bids)] = bids[:, 0]
+                bid_qty[i, :len(bids)] = bids[:, 1]
+            if len(asks):
+                ask_px[i, :len(asks)] = asks[:, 0]
+                ask_qty[i, :len(asks)] = asks[:, 1]
+
+        order = np.argsort(timestamps, kind='stable')
+        return cls(timestamps[order], bid_px[order], bid_qty[order], ask_px[order], ask_qty[order])
+
+    def index_at(self, timestamp_ns: int) -> int:
+        """Index of the latest snapshot at or before the timestamp (-1 if none)."""
+        return int(np.searchsorted(self.timestamps, timestamp_ns, side='right')) - 1
+
+    def __len__(self) -> int:
+        return len(self.timestamps)
+
+@dataclass
+class RestingOrder:
+    order: object
+    remaining: float
+    queue_ahead: float # Quantity resting ahead of us at our price level
+    level_qty: float # Visible quantity at our level in the last processed snapshot
+    last_index: int # Last snapshot already accounted for
+
+class L2FillModel(FillModel):
+    """
+    Order-book-aware fill model.
+    Market orders walk the recorded book and fill at the VWAP of the consumed levels;
+    anything beyond visible depth is left unfilled (partial fill).
+    Limit orders take liquidity up to their price and rest the remainder.
+    A resting order joins the back of the queue at its level; the queue ahead is reduced
+    by decreases in visible level quantity, and the order fills once the queue is
+    consumed or the opposite side trades through its price.
+    """
+
+    def __init__(self, books: Dict[str, DepthSnapshots], fallback: Optional[FillModel] = None):
+        """
+        Args:
+            books (Dict[str, DepthSnapshots]): Recorded depth per symbol.
+            fallback (FillModel): Used for symbols/timestamps without a snapshot.
+        """
+        self.books = books
+        self.fallback = fallback or FlatSlippageFillModel()
+        self.resting: Dict[str, List[RestingOrder]] = {}
+
+    def execute(self, order, reference_price: float) -> List[SimulatedFill]:
+        book = self.books.get(order.symbol)
+        index = book.index_at(to_ns(order.timestamp)) if book is not None else -1
+        if index < 0:
+            return self.fallback.execute(order, reference_price)
+
+        is_buy = order.side == 'buy'
+        px = book.ask_px[index] if is_buy else book.bid_px[index]
+        qty = book.ask_qty[index] if is_buy else book.bid_qty[index]
+        mid = _mid(book, index, reference_price)
+
+        # Limit orders only take levels at or better than their price
+        limit = order.price if order.order_type == 'limit' and order.price is not None else None
+        if limit is not None:
+            takeable = (px <= limit) if is_buy else (px >= limit)
+            qty = np.where(takeable, qty, 0.0)
+
+        filled, vwap = walk_levels(px, qty, order.quantity)
+        fills = []
+        if filled > 0:
+            fills.append(SimulatedFill(filled, vwap, abs(vwap - mid), False))
+
+        remaining = order.quantity - filled
+        if limit is not None and remaining > 0:
+            own_px = book.bid_px[index] if is_buy else book.ask_px[index]
+            own_qty = book.bid_qty[index] if is_buy else book.ask_qty[index]
+            level_qty = float(own_qty[own_px == limit].sum())
+            self.resting.setdefault(order.symbol, []).append(
+                RestingOrder(order, remaining, level_qty, level_qty, index)
+            )
+        elif remaining > 0:
+            logger.warning(f"Partial fill for {order.symbol}: {remaining} unfilled beyond visible depth")
+        return fills
+
+    def on_market(self, symbol: str, timestamp) -> List[tuple]:
+        resting = self.resting.get(symbol)
+        book = self.books.get(symbol)
+        if not resting or book is None:
+            return []
+
+        index = book.index_at(to_ns(timestamp))
+        fills = []
+        still_resting = []
+        for rest in resting:
+            fill = self._advance(book, rest, index)
+            if fill is not None:
+                fills.append((rest.order, fill))
+            if rest.remaining > 0:
+                still_resting.append(rest)
+        self.resting[symbol] = still_resting
+        return fills
+
+    def cancel(self, symbol: str):
+        """Drop all resting orders for a symbol."""
+        self.resting.pop(symbol, None)
+
+    def _advance(self, book: DepthSnapshots, rest: RestingOrder, index: int) -> Optional[SimulatedFill]:
+        """Replay snapshots (last_index, index] for one resting order, vectorised over the range."""
+        if index <= rest.last_index:
+            return None
+        window = slice(rest.last_index + 1, index + 1)
+        limit = rest.order.price
+        is_buy = rest.order.side == 'buy'
+
+        # 1. Trade-through: the opposite best reaches our price
+        opposite_best = book.ask_px[window, 0] if is_buy else book.bid_px[window, 0]
+        crossed = (opposite_best <= limit) if is_buy else (opposite_best >= limit)
+
+        # 2. Queue depletion from decreases in visible quantity at our level
+        own_px = book.bid_px[window] if is_buy else book.ask_px[window]
+        own_qty = book.bid_qty[window] if is_buy else book.ask_qty[window]
+        level_qty = np.where(own_px == limit, own_qty, 0.0).sum(axis=1)
+        worst = np.fmin.reduce(own_px, axis=1) if is_buy else np.fmax.reduce(own_px, axis=1)
+        visible = (limit >= worst) if is_buy else (limit <= worst)
+        # While our level is outside the visible depth, carry its last known quantity
+        level_qty = np.where(visible, level_qty, np.nan)
+        level_qty = _forward_fill(np.concatenate(([rest.level_qty], level_qty)))
+        depleted = np.cumsum(np.maximum(-np.diff(level_qty), 0.0))
+        queue_done = depleted >= rest.queue_ahead
+
+        rest.last_index = index
+        rest.level_qty = float(level_qty[-1])
+
+        if crossed.any():
+            filled = rest.remaining
+        elif queue_done.any():
+            # Volume traded past the front of the queue is ours, up to our size
+            filled = min(rest.remaining, float(depleted[-1] - rest.queue_ahead))
+            rest.queue_ahead = 0.0
+            if filled <= 0:
+                return None
+        else:
+            rest.queue_ahead -= float(depleted[-1]) if len(depleted) else 0.0
+            return None
+
+        rest.remaining -= filled
+        return SimulatedFill(filled, limit, 0.0, True)
+
+def walk_levels(px: np.ndarray, qty: np.ndarray, quantity: float):
+    """
+    Consume `quantity` from best-first price levels.
+    Returns (filled quantity, VWAP); filled is less than quantity if depth runs out.
+    """
+    qty = np.nan_to_num(qty)
+    cum = np.cumsum(qty)
+    available = cum[-1] if len(cum) else 0.0
+    filled = min(quantity, available)
+    if filled <= 0:
+        return 0.0, 0.0
+    # Full levels before the last touched one, plus the partial remainder on it
+    last = int(np.searchsorted(cum, filled, side='left'))
+    taken = qty[:last + 1].copy()
+    taken[last] = filled - (cum[last - 1] if last > 0 else 0.0)
+    vwap = float(np.dot(taken, px[:last + 1]) / filled)
+    return float(filled), vwap
+
+def _mid(book: DepthSnapshots, index: int, default: float) -> float:
+    bid, ask = book.bid_px[index, 0], book.ask_px[index, 0]
+    if np.isnan(bid) or np.isnan(ask):
+        return default
+    return (bid + ask) / 2
+
+def _forward_fill(values: np.ndarray) -> np.ndarray:
+    mask = ~np.isnan(values)
+    idx = np.where(mask, np.arange(len(values)), 0)
+    np.maximum.accumulate(idx, out=idx)
+    return values[idx]
@@ -0,0 +1,258 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+import aiohttp
+import numpy as np
+from core.market_cache import symbol_key
+
+logger = logging.getLogger(__name__)
+
+class _BookSide:
+    """
+    One side of the book as preallocated parallel arrays ordered so the best level is
+    last: `keys` (price for bids, -price for asks, ascending) for binary search and
+    `levels` ([price, qty] rows). Updates near the top of the book only shift the few
+    levels above them.
+    """
+    __slots__ = ('sign', 'keys', 'levels', 'size')
+
+    def __init__(self, bids: bool, capacity: int):
+        self.sign = 1.0 if bids else -1.0
+        self.keys = np.empty(capacity)
+        self.levels = np.empty((capacity, 2))
+        self.size = 0
+
+    def _reserve(self, size: int):
+        capacity = len(self.keys)
+        if size <= capacity:
+            return
+        capacity = max(size, 2 * capacity)
+        keys, levels = np.empty(capacity), np.empty((capacity, 2))
+        keys[:self.size] = self.keys[:self.size]
+        levels[:self.size] = self.levels[:self.size]
+        self.keys, self.levels = keys, levels
+
+    def load(self, levels: np.ndarray):
+        """Replace the side with snapshot levels ((n, 2) [price, qty], any order)."""
+        levels = levels[levels[:, 1] > 0]
+        keys = levels[:, 0] * self.sign
+        order = np.argsort(keys, kind='stable')
+        n = len(order)
+        self._reserve(n)
+        self.keys[:n] = keys[order]
+        self.levels[:n] = levels[order]
+        self.size = n
+
+    def update(self, price: float, qty: float):
+        """Set a level's absolute quantity (0 removes it)."""
+        n = self.size
+        key = price * self.sign
+        i = int(self.keys[:n].searchsorted(key))
+        exists = i < n and self.keys[i] == key
+        if qty > 0:
+            if exists:
+                self.levels[i, 1] = qty
+                return
+            self._reserve(n + 1)
+            self.keys[i + 1:n + 1] = self.keys[i:n]
+            self.levels[i + 1:n + 1] = self.levels[i:n]
+            self.keys[i] = key
+            self.levels[i, 0] = price
+            self.levels[i, 1] = qty
+            self.size = n + 1
+        elif exists:
+            self.keys[i:n - 1] = self.keys[i + 1:n]
+            self.levels[i:n - 1] = self.levels[i + 1:n]
+            self.size = n - 1
+
+    def top(self, levels: int) -> np.ndarray:
+        """Best `levels` as an (n, 2) view, best first (reversed stride, no copy)."""
+        size = self.size
+        return self.levels[max(size - levels, 0):size][::-1]
+
+class LocalOrderBook:
+    """
+    Full-depth L2 book for one symbol, maintained from a REST snapshot plus the
+    Binance diff-depth stream (`<symbol>@depth@100ms`).
+
+    Events arriving before a snapshot are buffered. After `apply_snapshot`, events
+    with u <= lastUpdateId are dropped and each applied event must start at most one
+    past the last applied update id (U <= last_update_id + 1); anything later is a
+    sequence gap, which marks the book out of sync until the next snapshot.
+    `top()` returns views into the live arrays: they change with the next update,
+    so copy them to keep a snapshot.
+    """
+
+    def __init__(self, symbol: str, capacity: int = 8192, max_buffer: int = 1000):
+        """
+        Args:
+            symbol (str): Exchange symbol (e.g. 'BTCUSDT').
+            capacity (int): Preallocated levels per side (grows if exceeded).
+            max_buffer (int): Diff events kept while waiting for a snapshot.
+        """
+        self.symbol = symbol
+        self.bids = _BookSide(True, capacity)
+        self.asks = _BookSide(False, capacity)
+        self.last_update_id = 0
+        self.synced = False
+        self.event_time = 0 # Exchange event time (ms) of the last applied update
+        self.updated_at = 0.0 # time.monotonic() of the last applied update
+        self._buffer = deque(maxlen=max_buffer)
+        self.metrics = {'updates': 0, 'stale': 0, 'gaps': 0, 'snapshots': 0}
+
+    def apply_snapshot(self, snapshot: Dict):
+        """Load a REST depth snapshot ({'lastUpdateId', 'bids', 'asks'}) and replay buffered diffs."""
+        self.bids.load(np.asarray(snapshot['bids'], dtype=np.float64).reshape(-1, 2))
+        self.asks.load(np.asarray(snapshot['asks'], dtype=np.float64).reshape(-1, 2))
+        self.last_update_id = snapshot['lastUpdateId']
+        self.synced = True
+        self.updated_at = time.monotonic()
+        self.metrics['snapshots'] += 1
+
+        buffered = list(self._buffer)
+        self._buffer.clear()
+        for index, event in enumerate(buffered):
+            self.on_diff(event)
+            if not self.synced:
+                self._buffer.extend(buffered[index + 1:]) # Gap: keep the rest for the next snapshot
+                break
+
+    def on_diff(self, event: Dict) -> bool:
+        """Apply a diff-depth event ({'U', 'u', 'b', 'a', 'E'}). Returns True if the book changed."""
+        if not self.synced:
+            self._buffer.append(event)
+            return False
+        if event['u'] <= self.last_update_id:
+            self.metrics['stale'] += 1
+            return False
+        if event['U'] > self.last_update_id + 1:
+            self.metrics['gaps'] += 1
+            logger.warning(f"{self.symbol} depth gap: expected update {self.last_update_id + 1}, got {event['U']}. Resyncing.")
+            self.synced = False
+            self._buffer.clear()
+            self._buffer.append(event)
+            return False
+
+        for side, changes in ((self.bids, event['b']), (self.asks, event['a'])):
+            for price, qty in changes:
+                side.update(float(price), float(qty))
+        self.last_update_id = event['u']
+        self.event_time = event.get('E', self.event_time)
+        self.updated_at = time.monotonic()
+        self.metrics['updates'] += 1
+        return True
+
+    # --- Readers ---
+
+    def top(self, levels: int = 10) -> Tuple[np.ndarray, np.ndarray]:
+        """Top `levels` bids and asks as (n, 2) [price, qty] views, best first."""
+        return self.bids.top(levels), self.asks.top(levels)
+
+    def best_bid(self) -> Optional[Tuple[float, float]]:
+        side = self.bids
+        return tuple(side.levels[side.size - 1]) if side.size else None
+
+    def best_ask(self) -> Optional[Tuple[float, float]]:
+        side = self.asks
+        return tuple(side.levels[side.size - 1]) if side.size else None
+
+    def mid(self) -> float:
+        bid, ask = self.best_bid(), self.best_ask()
+        return 0.5 * (bid[0] + ask[0]) if bid and ask else 0.0
+
+    def depth(self) -> Tuple[int, int]:
+        return self.bids.size, self.asks.size
+
+    def snapshot(self, levels: int = 10) -> Dict:
+        """Top `levels` as a plain depth payload (copied lists), e.g. for Redis or the market cache."""
+        bids, asks = self.top(levels)
+        return {'lastUpdateId': self.last_update_id, 'E': self.event_time, 'bids': bids.tolist(), 'asks': asks.tolist()}
+
+class LocalOrderBookManager:
+    """
+    Local books for many symbols. Diff events are routed to their book; a book that
+    is new or hit a sequence gap is resynced from a REST snapshot in a background
+    task (with backoff) while its diffs keep buffering.
+    """
+
+    def __init__(
+        self,
+        snapshot_fetcher: Optional[Callable[[str], Awaitable[Dict]]] = None,
+        snapshot_limit: int = 1000,
+        capacity: int = 8192,
+        rest_url: str = "https://api.binance.com/api/v3/depth",
+        resync_delay: float = 1.0
+    ):
+        """
+        Args:
+            snapshot_fetcher (Callable): async fetcher(symbol) -> {'lastUpdateId', 'bids', 'asks'};
+                defaults to the Binance REST depth endpoint.
+            snapshot_limit (int): Levels requested per snapshot.
+            capacity (int): Preallocated levels per book side.
+            rest_url (str): Depth snapshot endpoint for the default fetcher.
+            resync_delay (float): Initial delay between failed resync attempts (doubles up to 30s).
+        """
+        self.snapshot_fetcher = snapshot_fetcher or self._fetch_snapshot
+        self.snapshot_limit = snapshot_limit
+        self.capacity = capacity
+        self.rest_url = rest_url
+        self.resync_delay = resync_delay
+        self.books: Dict[str, LocalOrderBook] = {}
+        self._resyncs: Dict[str, asyncio.Task] = {}
+        self.metrics = {'resyncs': 0, 'resync_errors': 0}
+
+    def book(self, symbol: str) -> LocalOrderBook:
+        symbol = symbol_key(symbol)
+        book = self.books.get(symbol)
+        if book is None:
+            book = self.books[symbol] = LocalOrderBook(symbol, self.capacity)
+        return book
+
+    def on_depth_event(self, symbol: str, event: Dict) -> Optional[LocalOrderBook]:
+        """Route a diff event; returns the book if it was updated, scheduling a resync if it is out of sync."""
+        book = self.book(symbol)
+        if book.on_diff(event):
+            return book
+        if not book.synced and book.symbol not in self._resyncs:
+            task = asyncio.get_running_loop().create_task(self.resync(book.symbol))
+            self._resyncs[book.symbol] = task
+            task.add_done_callback(lambda _: self._resyncs.pop(book.symbol, None))
+        return None
+
+    async def resync(self, symbol: str):
+        """Fetch snapshots until the book is back in sync with the stream."""
+        book = self.book(symbol)
+        delay = self.resync_delay
+        while not book.synced:
+            self.metrics['resyncs'] += 1
+            try:
+                book.apply_snapshot(await self.snapshot_fetcher(symbol))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.metrics['resync_errors'] += 1
+                logger.error(f"Depth snapshot for {symbol} failed: {e}")
+            if not book.synced:
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 30.0)
+        logger.info(f"{symbol} local book synced at update {book.last_update_id} ({book.depth()[0]}x{book.depth()[1]} levels)")
+
+    async def _fetch_snapshot(self, symbol: str) -> Dict:
+        async with aiohttp.ClientSession() as session:
+            async with session.get(self.rest_url, params={'symbol': symbol, 'limit': self.snapshot_limit}) as response:
+                response.raise_for_status()
+                return await response.json()
+
+    def top(self, symbol: str, levels: int = 10) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        """Zero-copy top-of-book views for a synced book, else None."""
+        book = self.books.get(symbol_key(symbol))
+        if book is None or not book.synced:
+            return None
+        return book.top(levels)
+
+    async def close(self):
+        for task in list(self._resyncs.values()):
+            task.cancel()
+        self._resyncs.clear()
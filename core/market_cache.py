@@ -0,0 +1,157 @@
+import logging
+import time
+from typing import Dict, Optional, Tuple
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+def symbol_key(symbol: str) -> str:
+    """'BTC/USDT', 'btcusdt' and 'BTCUSDT' all map to 'BTCUSDT'."""
+    return symbol.replace('/', '').upper()
+
+class _Book:
+    """Latest market state for one symbol."""
+    __slots__ = ('bid', 'ask', 'bid_qty', 'ask_qty', 'bids', 'asks', 'last_price', 'last_qty', 'updated_at', 'event_time')
+
+    def __init__(self):
+        self.bid = 0.0
+        self.ask = 0.0
+        self.bid_qty = 0.0
+        self.ask_qty = 0.0
+        self.bids = np.empty((0, 2)) # (levels, [price, qty]), best first
+        self.asks = np.empty((0, 2))
+        self.last_price = 0.0
+        self.last_qty = 0.0
+        self.updated_at = 0.0 # time.monotonic() of the last quote update
+        self.event_time = 0 # Exchange event time (ms) when provided
+
+class MarketDataCache:
+    """
+    In-process market-data cache (best bid/ask, depth, last trade) fed by the websocket
+    feed. Readers such as the execution algorithms get quotes with no network I/O;
+    `get_quote` only falls back to a REST fetch_ticker when the cached quote is stale.
+    """
+
+    def __init__(self, max_age: float = 2.0):
+        """
+        Args:
+            max_age (float): Default seconds after which a cached quote is considered stale.
+        """
+        self.max_age = max_age
+        self.books: Dict[str, _Book] = {}
+        self.order_books = None # Optional LocalOrderBookManager serving full-depth views
+        self.metrics = {
+            'depth_updates': 0,
+            'ticker_updates': 0,
+            'trade_updates': 0,
+            'hits': 0,
+            'stale': 0,
+            'rest_fallbacks': 0
+        }
+
+    def _book(self, symbol: str) -> _Book:
+        key = symbol_key(symbol)
+        book = self.books.get(key)
+        if book is None:
+            book = self.books[key] = _Book()
+        return book
+
+    # --- Writers (feed side) ---
+
+    def update_depth(self, symbol: str, data: Dict):
+        """Partial depth payload ({'bids': [[p, q], ...], 'asks': ...}, Binance depth<N>)."""
+        bids = data.get('bids') or data.get('b') or []
+        asks = data.get('asks') or data.get('a') or []
+        book = self._book(symbol)
+        book.bids = np.asarray(bids, dtype=np.float64).reshape(-1, 2)
+        book.asks = np.asarray(asks, dtype=np.float64).reshape(-1, 2)
+        if len(book.bids):
+            book.bid, book.bid_qty = book.bids[0]
+        if len(book.asks):
+            book.ask, book.ask_qty = book.asks[0]
+        book.updated_at = time.monotonic()
+        book.event_time = data.get('E', book.event_time)
+        self.metrics['depth_updates'] += 1
+
+    def update_ticker(self, symbol: str, data: Dict):
+        """24h ticker payload: best bid/ask ('b'/'a' with sizes 'B'/'A') and last price ('c')."""
+        book = self._book(symbol)
+        if 'b' in data and 'a' in data:
+            book.bid = float(data['b'])
+            book.ask = float(data['a'])
+            book.bid_qty = float(data.get('B', 0.0))
+            book.ask_qty = float(data.get('A', 0.0))
+            book.updated_at = time.monotonic()
+        if 'c' in data:
+            book.last_price = float(data['c'])
+        book.event_time = data.get('E', book.event_time)
+        self.metrics['ticker_updates'] += 1
+
+    def update_quote(self, symbol: str, bid: float, ask: float, bid_qty: float = 0.0, ask_qty: float = 0.0):
+        book = self._book(symbol)
+        book.bid, book.ask, book.bid_qty, book.ask_qty = bid, ask, bid_qty, ask_qty
+        book.updated_at = time.monotonic()
+
+    def on_trade(self, trade: Dict):
+        """Trade listener (normalised trade dict, see core.vwap_executor.parse_agg_trade)."""
+        book = self._book(trade['symbol'])
+        book.last_price = trade['price']
+        book.last_qty = trade['quantity']
+        self.metrics['trade_updates'] += 1
+
+    # --- Readers ---
+
+    def top(self, symbol: str, max_age: Optional[float] = None) -> Optional[Tuple[float, float]]:
+        """(bid, ask) if a quote younger than `max_age` is cached, else None."""
+        book = self.books.get(symbol_key(symbol))
+        if book is None or not book.updated_at:
+            return None
+        if time.monotonic() - book.updated_at > (self.max_age if max_age is None else max_age):
+            return None
+        return book.bid, book.ask
+
+    def depth(self, symbol: str, levels: int = 10) -> Tuple[np.ndarray, np.ndarray]:
+        """Top `levels` of the cached bids and asks as (levels, 2) arrays (views), from the local book when synced."""
+        if self.order_books is not None:
+            views = self.order_books.top(symbol, levels)
+            if views is not None:
+                return views
+        book = self.books.get(symbol_key(symbol))
+        if book is None:
+            empty = np.empty((0, 2))
+            return empty, empty
+        return book.bids[:levels], book.asks[:levels]
+
+    def last_price(self, symbol: str) -> float:
+        book = self.books.get(symbol_key(symbol))
+        return book.last_price if book is not None else 0.0
+
+    def age(self, symbol: str) -> Optional[float]:
+        book = self.books.get(symbol_key(symbol))
+        if book is None or not book.updated_at:
+            return None
+        return time.monotonic() - book.updated_at
+
+    async def get_quote(self, symbol: str, exchange=None, max_age: Optional[float] = None) -> Dict:
+        """
+        Best bid/ask from the cache; fetch_ticker over REST only if the cache is stale
+        (the REST result is cached too). Raises if stale and no exchange is given.
+        """
+        quote = self.top(symbol, max_age)
+        if quote is not None:
+            self.metrics['hits'] += 1
+            return {'bid': quote[0], 'ask': quote[1], 'last': self.last_price(symbol), 'source': 'cache'}
+
+        self.metrics['stale'] += 1
+        if exchange is None:
+            raise LookupError(f"No fresh quote cached for {symbol}")
+        self.metrics['rest_fallbacks'] += 1
+        logger.warning(f"Cached quote for {symbol} is stale (age={self.age(symbol)}). Falling back to REST.")
+        ticker = await exchange.fetch_ticker(symbol)
+        self.update_quote(symbol, ticker['bid'], ticker['ask'], ticker.get('bidVolume') or 0.0, ticker.get('askVolume') or 0.0)
+        if ticker.get('last'):
+            self._book(symbol).last_price = ticker['last']
+        return {'bid': ticker['bid'], 'ask': ticker['ask'], 'last': ticker.get('last'), 'source': 'rest'}
+
+# Process-wide cache shared by the feed and the execution engine
+market_cache = MarketDataCache()
@@ -0,0 +1,334 @@
+import asyncio
+import logging
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+class OrderStatus:
+    NEW = 'new'
+    PARTIALLY_FILLED = 'partially_filled'
+    FILLED = 'filled'
+    CANCELED = 'canceled'
+    REJECTED = 'rejected'
+
+TERMINAL_STATUSES = frozenset({OrderStatus.FILLED, OrderStatus.CANCELED, OrderStatus.REJECTED})
+
+# Allowed transitions of the order state machine
+TRANSITIONS = {
+    OrderStatus.NEW: frozenset({OrderStatus.PARTIALLY_FILLED, OrderStatus.FILLED, OrderStatus.CANCELED, OrderStatus.REJECTED}),
+    OrderStatus.PARTIALLY_FILLED: frozenset({OrderStatus.PARTIALLY_FILLED, OrderStatus.FILLED, OrderStatus.CANCELED})
+}
+
+# CCXT unified order statuses
+CCXT_STATUS = {
+    'open': OrderStatus.NEW,
+    'closed': OrderStatus.FILLED,
+    'canceled': OrderStatus.CANCELED,
+    'cancelled': OrderStatus.CANCELED,
+    'expired': OrderStatus.CANCELED,
+    'rejected': OrderStatus.REJECTED
+}
+
+TRADE_HISTORY_COLUMNS = ['time', 'symbol', 'side', 'price', 'quantity', 'strategy', 'pnl', 'order_id', 'status']
+
+class TrackedOrder:
+    """One of our orders; slots keep thousands of live orders compact."""
+    __slots__ = (
+        'order_id', 'client_id', 'symbol', 'side', 'price', 'quantity',
+        'filled', 'avg_fill_price', 'status', 'strategy', 'realized_pnl',
+        'created_at', 'updated_at'
+    )
+
+    def __init__(self, order_id: str, symbol: str, side: str, quantity: float, price: float, client_id: Optional[str] = None, strategy: Optional[str] = None):
+        self.order_id = order_id
+        self.client_id = client_id
+        self.symbol = symbol
+        self.side = side
+        self.price = price
+        self.quantity = quantity
+        self.filled = 0.0
+        self.avg_fill_price = 0.0
+        self.status = OrderStatus.NEW
+        self.strategy = strategy
+        self.realized_pnl = 0.0
+        self.created_at = time.time()
+        self.updated_at = self.created_at
+
+    @property
+    def remaining(self) -> float:
+        return max(self.quantity - self.filled, 0.0)
+
+    @property
+    def is_terminal(self) -> bool:
+        return self.status in TERMINAL_STATUSES
+
+    def __repr__(self) -> str:
+        return f"TrackedOrder({self.order_id}, {self.symbol}, {self.side}, {self.filled}/{self.quantity} @ {self.price}, {self.status})"
+
+class Position:
+    """Average-cost position with incrementally maintained realized PnL."""
+    __slots__ = ('symbol', 'quantity', 'avg_price', 'realized_pnl', 'mark_price')
+
+    def __init__(self, symbol: str):
+        self.symbol = symbol
+        self.quantity = 0.0
+        self.avg_price = 0.0
+        self.realized_pnl = 0.0
+        self.mark_price = 0.0
+
+    def apply_fill(self, signed_quantity: float, price: float) -> float:
+        """Apply a fill and return the PnL it realized (closing part only)."""
+        realized = 0.0
+        if self.quantity and (self.quantity > 0) != (signed_quantity > 0):
+            closed = min(abs(signed_quantity), abs(self.quantity))
+            direction = 1.0 if self.quantity > 0 else -1.0
+            realized = closed * (price - self.avg_price) * direction
+            self.realized_pnl += realized
+        new_quantity = self.quantity + signed_quantity
+        if abs(new_quantity) < 1e-12:
+            self.quantity = 0.0
+            self.avg_price = 0.0
+        elif self.quantity == 0 or (self.quantity > 0) != (new_quantity > 0):
+            # Opened, or flipped through flat: the remainder is a new position at this price
+            self.quantity = new_quantity
+            self.avg_price = price
+        elif (self.quantity > 0) == (signed_quantity > 0):
+            self.avg_price = (self.avg_price * self.quantity + price * signed_quantity) / new_quantity
+            self.quantity = new_quantity
+        else:
+            self.quantity = new_quantity # Partial close keeps the entry price
+        if not self.mark_price:
+            self.mark_price = price
+        return realized
+
+    @property
+    def unrealized_pnl(self) -> float:
+        if not self.quantity or not self.mark_price:
+            return 0.0
+        return (self.mark_price - self.avg_price) * self.quantity
+
+class OrderTracker:
+    """
+    State machine and indexes for our own orders (new -> partially_filled -> filled / canceled / rejected).
+    Orders are indexed by exchange id, client id and symbol; terminal orders leave the
+    live indexes immediately and are written to TimescaleDB `trade_history` in batches,
+    so memory is bounded by the number of working orders. Fills update per-symbol
+    average-cost positions, giving realized and unrealized PnL without rescans.
+    """
+
+    def __init__(self, db=None, flush_size: int = 100, flush_interval: float = 5.0, max_buffer: int = 100000):
+        """
+        Args:
+            db: Connected TimescaleDB wrapper (with `.pool`); None keeps history in memory only.
+            flush_size (int): Terminal orders buffered before a write is triggered.
+            flush_interval (float): Max seconds a terminal order waits to be written.
+            max_buffer (int): Oldest unwritten rows are dropped beyond this (DB outage guard).
+        """
+        self.db = db
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.max_buffer = max_buffer
+        self.orders: Dict[str, TrackedOrder] = {}
+        self.by_client_id: Dict[str, str] = {}
+        self.by_symbol: Dict[str, Set[str]] = {}
+        self.positions: Dict[str, Position] = {}
+        self._history: List[Tuple] = []
+        self._flush_task: Optional[asyncio.Task] = None
+        self._loop_task: Optional[asyncio.Task] = None
+        self.metrics = {
+            'orders': 0,
+            'fills': 0,
+            'evicted': 0,
+            'rows_written': 0,
+            'rows_dropped': 0,
+            'invalid_transitions': 0,
+            'closed_short': 0
+        }
+
+    # --- Lifecycle events ---
+
+    def add(self, order_id: str, symbol: str, side: str, quantity: float, price: float, client_id: Optional[str] = None, strategy: Optional[str] = None) -> TrackedOrder:
+        order = TrackedOrder(order_id, symbol, side, quantity, price, client_id, strategy)
+        self.orders[order_id] = order
+        if client_id:
+            self.by_client_id[client_id] = order_id
+        self.by_symbol.setdefault(symbol, set()).add(order_id)
+        self.metrics['orders'] += 1
+        return order
+
+    def on_fill(self, order_id: str, quantity: float, price: float) -> Optional[TrackedOrder]:
+        """Apply an incremental fill of `quantity` at `price`."""
+        order = self.orders.get(order_id)
+        if order is None or quantity <= 0:
+            return None
+        status = OrderStatus.FILLED if order.filled + quantity >= order.quantity - 1e-12 else OrderStatus.PARTIALLY_FILLED
+        if not self._transition(order, status):
+            return None
+
+        order.avg_fill_price = (order.avg_fill_price * order.filled + price * quantity) / (order.filled + quantity)
+        order.filled += quantity
+        signed = quantity if order.side == 'buy' else -quantity
+        position = self.positions.get(order.symbol)
+        if position is None:
+            position = self.positions[order.symbol] = Position(order.symbol)
+        order.realized_pnl += position.apply_fill(signed, price)
+        self.metrics['fills'] += 1
+
+        if order.is_terminal:
+            self._evict(order)
+        return order
+
+    def on_cancel(self, order_id: str, rejected: bool = False) -> Optional[TrackedOrder]:
+        order = self.orders.get(order_id)
+        if order is None:
+            return None
+        if not self._transition(order, OrderStatus.REJECTED if rejected else OrderStatus.CANCELED):
+            return None
+        self._evict(order)
+        return order
+
+    def on_exchange_update(self, update: Dict) -> Tuple[Optional[TrackedOrder], float, float]:
+        """
+        Reconcile a CCXT order dict (from create_order / fetch_order / a user-data stream).
+        Cumulative `filled` / `cost` are turned into the incremental fill since the last update.
+        A 'closed' order is final at its reported `filled`, even when that is short of the
+        requested quantity (lot-size rounding); `remaining` is then the unfilled part.
+
+        Returns:
+            (order, fill_quantity, fill_price): fill_quantity is 0 if nothing new filled.
+        """
+        order = self.orders.get(str(update.get('id')))
+        if order is None:
+            return None, 0.0, 0.0
+
+        status = CCXT_STATUS.get(update.get('status'))
+        fill_quantity = fill_price = 0.0
+        filled = update.get('filled')
+        if filled is None:
+            filled = order.quantity if status == OrderStatus.FILLED else 0.0 # 'closed' without a fill count means complete
+        if filled > order.filled + 1e-12:
+            fill_quantity = filled - order.filled
+            cost = update.get('cost')
+            if cost:
+                fill_price = (cost - order.avg_fill_price * order.filled) / fill_quantity
+            else:
+                fill_price = update.get('average') or update.get('price') or order.price
+            self.on_fill(order.order_id, fill_quantity, fill_price)
+
+        if not order.is_terminal:
+            if status in (OrderStatus.CANCELED, OrderStatus.REJECTED) or (status == OrderStatus.FILLED and not order.filled):
+                self.on_cancel(order.order_id, rejected=status == OrderStatus.REJECTED)
+            elif status == OrderStatus.FILLED:
+                # Closed short of the requested quantity: finalise at what actually filled
+                self.metrics['closed_short'] += 1
+                if self._transition(order, OrderStatus.FILLED):
+                    self._evict(order)
+        return order, fill_quantity, fill_price
+
+    def mark(self, symbol: str, price: float):
+        """Update the mark price used for unrealized PnL."""
+        position = self.positions.get(symbol)
+        if position is not None:
+            position.mark_price = price
+
+    def _transition(self, order: TrackedOrder, status: str) -> bool:
+        if status not in TRANSITIONS.get(order.status, ()):
+            self.metrics['invalid_transitions'] += 1
+            logger.warning(f"Ignoring invalid order transition {order.status} -> {status} for {order.order_id}")
+            return False
+        order.status = status
+        order.updated_at = time.time()
+        return True
+
+    def _evict(self, order: TrackedOrder):
+        """Drop a terminal order from the live indexes and queue it for trade_history."""
+        self.orders.pop(order.order_id, None)
+        if order.client_id:
+            self.by_client_id.pop(order.client_id, None)
+        ids = self.by_symbol.get(order.symbol)
+        if ids is not None:
+            ids.discard(order.order_id)
+            if not ids:
+                del self.by_symbol[order.symbol]
+        self.metrics['evicted'] += 1
+
+        self._history.append((
+            datetime.fromtimestamp(order.updated_at, tz=timezone.utc),
+            order.symbol,
+            order.side,
+            order.avg_fill_price or order.price,
+            order.filled,
+            order.strategy,
+            order.realized_pnl,
+            order.order_id,
+            order.status
+        ))
+        if len(self._history) > self.max_buffer:
+            dropped = len(self._history) - self.max_buffer
+            del self._history[:dropped]
+            self.metrics['rows_dropped'] += dropped
+        if len(self._history) >= self.flush_size and self.db is not None and self._flush_task is None:
+            try:
+                self._flush_task = asyncio.get_running_loop().create_task(self._flush_soon())
+            except RuntimeError:
+                pass # No running loop; the periodic flush picks the rows up
+
+    # --- Queries ---
+
+    def get(self, order_id: str) -> Optional[TrackedOrder]:
+        return self.orders.get(order_id)
+
+    def get_by_client_id(self, client_id: str) -> Optional[TrackedOrder]:
+        order_id = self.by_client_id.get(client_id)
+        return self.orders.get(order_id) if order_id else None
+
+    def open_orders(self, symbol: Optional[str] = None) -> List[TrackedOrder]:
+        if symbol is None:
+            return list(self.orders.values())
+        return [self.orders[order_id] for order_id in self.by_symbol.get(symbol, ())]
+
+    @property
+    def realized_pnl(self) -> float:
+        return sum(position.realized_pnl for position in self.positions.values())
+
+    @property
+    def unrealized_pnl(self) -> float:
+        return sum(position.unrealized_pnl for position in self.positions.values())
+
+    # --- Persistence ---
+
+    async def start(self):
+        if self._loop_task is None and self.db is not None:
+            self._loop_task = asyncio.create_task(self._flush_loop())
+
+    async def flush(self):
+        """Write buffered terminal orders to trade_history in one COPY."""
+        if not self._history or self.db is None or self.db.pool is None:
+            return
+        rows, self._history = self._history, []
+        try:
+            async with self.db.pool.acquire() as conn:
+                await conn.copy_records_to_table('trade_history', records=rows, columns=TRADE_HISTORY_COLUMNS)
+            self.metrics['rows_written'] += len(rows)
+        except Exception as e:
+            logger.error(f"trade_history flush failed ({len(rows)} rows kept for retry): {e}")
+            self._history = rows + self._history
+
+    async def close(self):
+        if self._loop_task:
+            self._loop_task.cancel()
+            self._loop_task = None
+        await self.flush()
+
+    async def _flush_soon(self):
+        try:
+            await self.flush()
+        finally:
+            self._flush_task = None
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
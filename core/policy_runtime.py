@@ -0,0 +1,74 @@
+import logging
+import os
+from typing import Optional, Tuple
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+class PolicyRuntime:
+    """
+    Inference-only runtime for policies exported by backend/brain/policy_export.py.
+    Serves ONNX (onnxruntime) or TorchScript files on CPU without importing
+    stable-baselines3 or gymnasium. `predict` mirrors SB3's (actions, state) return,
+    so a runtime can stand in wherever an SB3 model's predict is called.
+    """
+    EXTENSIONS = ('.onnx', '.pt')
+
+    def __init__(self, path: str, num_threads: int = 1):
+        """
+        Args:
+            path (str): Exported policy file (.onnx or .pt).
+            num_threads (int): Intra-op threads; 1 keeps single-row latency lowest.
+        """
+        self.path = path
+        if path.endswith('.onnx'):
+            import onnxruntime as ort
+            options = ort.SessionOptions()
+            options.intra_op_num_threads = num_threads
+            self._session = ort.InferenceSession(path, sess_options=options, providers=['CPUExecutionProvider'])
+            self._input_name = self._session.get_inputs()[0].name
+            self._run = self._run_onnx
+        else:
+            import torch
+            torch.set_num_threads(num_threads)
+            self._torch = torch
+            self._module = torch.jit.load(path, map_location='cpu')
+            self._module.eval()
+            self._run = self._run_torchscript
+        logger.info(f"Loaded exported policy from {path}")
+
+    @classmethod
+    def find(cls, model_path: str) -> Optional['PolicyRuntime']:
+        """
+        Load `<model_path>.onnx` or `<model_path>.pt` if one exists and is at least as
+        new as `<model_path>.zip`, else None. An export older than the zip predates the
+        last training run, so the caller should load the SB3 model instead.
+        """
+        zip_path = model_path + '.zip'
+        trained_at = os.path.getmtime(zip_path) if os.path.exists(zip_path) else None
+        for extension in cls.EXTENSIONS:
+            path = model_path + extension
+            if not os.path.exists(path):
+                continue
+            if trained_at is not None and os.path.getmtime(path) < trained_at:
+                logger.warning(f"Ignoring stale exported policy {path}: older than {zip_path} (re-run policy_export)")
+                continue
+            try:
+                return cls(path)
+            except Exception as e:
+                logger.error(f"Failed to load exported policy {path}: {e}")
+        return None
+
+    def predict(self, observation, deterministic: bool = True) -> Tuple[np.ndarray, None]:
+        """Actions for a (n, n_features) or (n_features,) observation."""
+        obs = np.asarray(observation, dtype=np.float32)
+        if obs.ndim == 1:
+            obs = obs.reshape(1, -1)
+        return self._run(obs).reshape(-1), None
+
+    def _run_onnx(self, obs: np.ndarray) -> np.ndarray:
+        return np.asarray(self._session.run(None, {self._input_name: obs})[0], dtype=np.int64)
+
+    def _run_torchscript(self, obs: np.ndarray) -> np.ndarray:
+        with self._torch.inference_mode():
+            return self._module(self._torch.from_numpy(obs)).numpy().astype(np.int64)
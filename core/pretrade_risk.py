@@ -0,0 +1,223 @@
+import asyncio
+import logging
+import math
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Tuple
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+@dataclass(frozen=True)
+class SymbolLimits:
+    """Static pre-trade limits for one symbol (inf disables a check)."""
+    max_notional: float = math.inf # Per order, quote currency
+    max_position: float = math.inf # Absolute net position incl. open orders, base units
+    max_orders_per_second: float = math.inf
+    price_band_pct: float = 0.05 # Max distance of a limit price from mid
+    quote_max_age: float = 5.0 # Seconds before a cached quote is ignored by the band check
+
+class _SymbolState:
+    """Everything one check needs, reachable through a single dict lookup."""
+    __slots__ = ('limits', 'position', 'pending', 'tokens', 'refilled_at', 'bid', 'ask', 'quote_ts')
+
+    def __init__(self, limits: SymbolLimits):
+        self.limits = limits
+        self.position = 0.0 # Filled net position
+        self.pending = 0.0 # Signed quantity of open orders
+        self.tokens = max(limits.max_orders_per_second, 1.0)
+        self.refilled_at = time.monotonic()
+        self.bid = 0.0
+        self.ask = 0.0
+        self.quote_ts = 0.0
+
+class PreTradeRiskGate:
+    """
+    Synchronous pre-trade checks run by ExecutionEngine before every order.
+    All inputs are precomputed (limits, positions, cached top of book, a VaR flag
+    refreshed by a background task), so a check is a handful of float comparisons
+    with no I/O. An accepted check reserves the order's quantity as pending exposure
+    before the caller awaits the exchange, so concurrent orders see each other; the
+    caller releases it with `on_cancel` if the order is never placed.
+    Check latency is recorded in a ring buffer for p50/p99 reporting.
+    """
+    LATENCY_SAMPLES = 4096
+
+    def __init__(
+        self,
+        default_limits: Optional[SymbolLimits] = None,
+        limits: Optional[Dict[str, SymbolLimits]] = None,
+        var_check: Optional[Callable[[], bool]] = None,
+        var_refresh_interval: float = 5.0,
+        market_cache=None
+    ):
+        """
+        Args:
+            default_limits (SymbolLimits): Limits for symbols without an explicit entry.
+            limits (Dict[str, SymbolLimits]): Per-symbol limits.
+            var_check (Callable[[], bool]): Returns True when the VaR budget is exhausted,
+                e.g. a closure over RiskEngine.check_risk. Run off the order path.
+            var_refresh_interval (float): Seconds between VaR budget refreshes.
+            market_cache (MarketDataCache): Stream-fed quotes for the price band when no
+                quote was pushed through update_quote.
+        """
+        self.default_limits = default_limits or SymbolLimits()
+        self.var_check = var_check
+        self.market_cache = market_cache
+        self.var_refresh_interval = var_refresh_interval
+        self.var_breached = False
+        self.var_updated_at: Optional[float] = None
+        self._states: Dict[str, _SymbolState] = {}
+        for symbol, symbol_limits in (limits or {}).items():
+            self.set_limits(symbol, symbol_limits)
+
+        self._task: Optional[asyncio.Task] = None
+        self._latencies = np.zeros(self.LATENCY_SAMPLES)
+        self._latency_count = 0
+        self.metrics = {
+            'checks': 0,
+            'rejects': 0,
+            'reject_reasons': {},
+            'max_latency_us': 0.0
+        }
+
+    # --- State updates ---
+
+    def set_limits(self, symbol: str, limits: SymbolLimits):
+        state = self._state(symbol)
+        state.limits = limits
+        state.tokens = min(state.tokens, max(limits.max_orders_per_second, 1.0))
+
+    def update_quote(self, symbol: str, bid: float, ask: float, timestamp: Optional[float] = None):
+        """Cache top of book for the fat-finger band (fed from the market-data stream)."""
+        state = self._state(symbol)
+        state.bid = bid
+        state.ask = ask
+        state.quote_ts = time.monotonic() if timestamp is None else timestamp
+
+    def record_order(self, symbol: str, side: str, amount: float):
+        """Count an open order against the position limit (done by `check` unless reserve=False)."""
+        self._state(symbol).pending += amount if side == 'buy' else -amount
+
+    def on_fill(self, symbol: str, side: str, amount: float):
+        """Move a filled quantity from open orders into the position."""
+        state = self._state(symbol)
+        signed = amount if side == 'buy' else -amount
+        state.pending -= signed
+        state.position += signed
+
+    def on_cancel(self, symbol: str, side: str, remaining: float):
+        """Release the unfilled quantity of a cancelled/rejected order."""
+        self._state(symbol).pending -= remaining if side == 'buy' else -remaining
+
+    def _state(self, symbol: str) -> _SymbolState:
+        state = self._states.get(symbol)
+        if state is None:
+            state = self._states[symbol] = _SymbolState(self.default_limits)
+        return state
+
+    # --- Check ---
+
+    def check(self, symbol: str, side: str, amount: float, price: float, reserve: bool = True) -> Tuple[bool, str]:
+        """
+        Args:
+            reserve (bool): On acceptance, add the order to pending exposure immediately.
+
+        Returns:
+            Tuple[bool, str]: (accepted, reason). Reason is 'ok' or the failed check.
+        """
+        started = time.perf_counter()
+        reason = self._evaluate(symbol, side, amount, price)
+        if reserve and reason == 'ok':
+            self._states[symbol].pending += amount if side == 'buy' else -amount
+        elapsed = time.perf_counter() - started
+
+        self._latencies[self._latency_count % self.LATENCY_SAMPLES] = elapsed
+        self._latency_count += 1
+        self.metrics['checks'] += 1
+        elapsed_us = elapsed * 1e6
+        if elapsed_us > self.metrics['max_latency_us']:
+            self.metrics['max_latency_us'] = elapsed_us
+        if reason != 'ok':
+            self.metrics['rejects'] += 1
+            self.metrics['reject_reasons'][reason] = self.metrics['reject_reasons'].get(reason, 0) + 1
+            logger.warning(f"Pre-trade reject {side.upper()} {amount} {symbol} @ {price}: {reason}")
+            return False, reason
+        return True, reason
+
+    def _evaluate(self, symbol: str, side: str, amount: float, price: float) -> str:
+        if not (amount > 0 and price > 0):
+            return 'invalid_order'
+        state = self._state(symbol)
+        limits = state.limits
+
+        if amount * price > limits.max_notional:
+            return 'notional'
+
+        signed = amount if side == 'buy' else -amount
+        exposure = state.position + state.pending
+        if abs(exposure + signed) > limits.max_position:
+            return 'position'
+
+        # Only risk-increasing orders are blocked while the VaR budget is exhausted
+        if self.var_breached and abs(exposure + signed) > abs(exposure):
+            return 'var_budget'
+
+        if state.bid > 0 and state.ask > 0 and time.monotonic() - state.quote_ts <= limits.quote_max_age:
+            quote = (state.bid, state.ask)
+        elif self.market_cache is not None:
+            quote = self.market_cache.top(symbol, limits.quote_max_age)
+        else:
+            quote = None
+        if quote is not None and quote[0] > 0 and quote[1] > 0:
+            mid = 0.5 * (quote[0] + quote[1])
+            if abs(price - mid) > limits.price_band_pct * mid:
+                return 'price_band'
+
+        # Token bucket: refill at max_orders_per_second, burst of one second (at least one order,
+        # so rates below 1/s still admit an order every 1/rate seconds)
+        rate = limits.max_orders_per_second
+        if rate != math.inf:
+            now = time.monotonic()
+            state.tokens = min(max(rate, 1.0), state.tokens + (now - state.refilled_at) * rate)
+            state.refilled_at = now
+            if state.tokens < 1.0:
+                return 'order_rate'
+            state.tokens -= 1.0
+
+        return 'ok'
+
+    # --- Background VaR budget ---
+
+    async def start(self):
+        if self._task is None and self.var_check is not None:
+            self._task = asyncio.create_task(self._var_loop())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+    async def refresh_var(self):
+        """Evaluate the VaR budget in a worker thread and publish the flag."""
+        loop = asyncio.get_running_loop()
+        self.var_breached = bool(await loop.run_in_executor(None, self.var_check))
+        self.var_updated_at = time.monotonic()
+
+    async def _var_loop(self):
+        while True:
+            try:
+                await self.refresh_var()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"VaR budget refresh failed: {e}")
+            await asyncio.sleep(self.var_refresh_interval)
+
+    def latency_percentiles(self, percentiles: List[float] = (50, 99)) -> Dict[str, float]:
+        """Check latency percentiles in microseconds over the recent samples."""
+        samples = self._latencies[:min(self._latency_count, self.LATENCY_SAMPLES)]
+        if not samples.size:
+            return {}
+        values = np.percentile(samples, percentiles) * 1e6
+        return {f'p{p:g}_us': float(v) for p, v in zip(percentiles, values)}
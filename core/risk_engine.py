@@ -1,69 +1,252 @@
 import numpy as np
 from scipy.stats import norm
 import logging
-from typing import List, Dict
+from typing import List, Dict, Optional
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("RiskEngine")
 
+class ReturnWindow:
+    """
+    Rolling window of returns for one symbol with incrementally maintained risk state.
+    Keeps a ring buffer (arrival order), a sorted copy (for historical quantiles) and
+    running sums (for parametric VaR); VaR/CVaR are refreshed on push, so reads are O(1).
+    """
+
+    def __init__(self, size: int, confidence_level: float):
+        self.size = size
+        self.confidence_level = confidence_level
+        self.z = norm.ppf(1 - confidence_level)
+        self._ring = np.zeros(size)
+        self._sorted = np.empty(size)
+        self._pos = 0
+        self.count = 0
+        self._sum = 0.0
+        self._sumsq = 0.0
+        self.historical_var = 0.0
+        self.cvar = 0.0
+
+    def push(self, value: float):
+        n = self.count
+        if n == self.size:
+            # Evict the oldest value from the sorted copy and the running sums
+            old = self._ring[self._pos]
+            i = int(np.searchsorted(self._sorted[:n], old))
+            self._sorted[i:n - 1] = self._sorted[i + 1:n]
+            self._sum -= old
+            self._sumsq -= old * old
+            n -= 1
+        i = int(np.searchsorted(self._sorted[:n], value))
+        self._sorted[i + 1:n + 1] = self._sorted[i:n]
+        self._sorted[i] = value
+        self._ring[self._pos] = value
+        self._pos = (self._pos + 1) % self.size
+        self.count = n + 1
+        self._sum += value
+        self._sumsq += value * value
+        if self._pos == 0:
+            # Re-anchor the running sums once per lap to stop float drift
+            self._sum = float(self._ring[:self.count].sum())
+            self._sumsq = float(np.dot(self._ring[:self.count], self._ring[:self.count]))
+        self._refresh()
+
+    def _refresh(self):
+        """Historical VaR (np.percentile 'linear' on the sorted window) and CVaR."""
+        values = self._sorted[:self.count]
+        rank = (1 - self.confidence_level) * (self.count - 1)
+        lo = int(rank)
+        hi = min(lo + 1, self.count - 1)
+        var = abs(values[lo] + (values[hi] - values[lo]) * (rank - lo))
+        tail = int(np.searchsorted(values, -var))
+        self.historical_var = var
+        self.cvar = abs(values[:tail].mean()) if tail else var
+
+    @property
+    def mean(self) -> float:
+        return self._sum / self.count if self.count else 0.0
+
+    @property
+    def std(self) -> float:
+        if not self.count:
+            return 0.0
+        mean = self.mean
+        return float(np.sqrt(max(self._sumsq / self.count - mean * mean, 0.0)))
+
+    @property
+    def parametric_var(self) -> float:
+        return abs(self.mean + self.std * self.z)
+
+    def values(self) -> np.ndarray:
+        """Window contents in arrival order (copy)."""
+        if self.count < self.size:
+            return self._ring[:self.count].copy()
+        return np.concatenate((self._ring[self._pos:], self._ring[:self._pos]))
+
 class RiskEngine:
     """
     Advanced Risk Engine calculating VaR (Value at Risk) and CVaR (Conditional VaR).
     Acts as a gatekeeper for all trades.
+
+    Return history is fed in as it arrives (`update_returns`) and kept per symbol in
+    rolling windows plus an EWMA covariance matrix, so `check_risk` only combines
+    precomputed state for the current positions instead of recomputing from history.
     """
-    def __init__(self, confidence_level: float = 0.95, max_drawdown_limit: float = 0.02):
+    def __init__(self, confidence_level: float = 0.95, max_drawdown_limit: float = 0.02, window: int = 250, ewma_lambda: float = 0.94):
+        """
+        Args:
+            confidence_level (float): VaR confidence (0.95 -> 5% tail).
+            max_drawdown_limit (float): VaR limit as a fraction of portfolio value.
+            window (int): Returns kept per symbol for historical VaR/CVaR.
+            ewma_lambda (float): Decay of the covariance estimate (RiskMetrics uses 0.94).
+        """
         self.confidence_level = confidence_level
         self.max_drawdown_limit = max_drawdown_limit # 2% max drawdown allowed per trade/day
+        self.window = window
+        self.ewma_lambda = ewma_lambda
+        self.z = norm.ppf(1 - confidence_level)
+
+        self.windows: Dict[str, ReturnWindow] = {}
+        self.symbol_index: Dict[str, int] = {}
+        self._cov = np.zeros((0, 0))
+        self.covariance_updates = 0
+
+        # Baseline window for when no return history has been fed yet (drawn once, not per check)
+        self._baseline = ReturnWindow(100, confidence_level)
+        for value in np.random.normal(0.001, 0.02, 100):
+            self._baseline.push(value)
 
     def calculate_var(self, returns: List[float], method: str = "historical") -> float:
         """
         Calculate Value at Risk (VaR).
         """
-        if not returns:
+        if returns is None or len(returns) == 0:
             return 0.0
 
         if method == "historical":
             # Historical Simulation
             var = np.percentile(returns, (1 - self.confidence_level) * 100)
             return abs(var)
-        
+
         elif method == "parametric":
             # Parametric (Variance-Covariance)
             mu = np.mean(returns)
             sigma = np.std(returns)
             var = norm.ppf(1 - self.confidence_level, mu, sigma)
             return abs(var)
-        
+
         return 0.0
 
     def calculate_cvar(self, returns: List[float]) -> float:
         """
         Calculate Conditional Value at Risk (CVaR) / Expected Shortfall.
         """
-        if not returns:
+        if returns is None or len(returns) == 0:
             return 0.0
-            
+
+        returns = np.asarray(returns, dtype=np.float64)
         var = self.calculate_var(returns, method="historical")
         # CVaR is the average of losses exceeding VaR
-        losses = [r for r in returns if r < -var]
-        if not losses:
+        losses = returns[returns < -var]
+        if not losses.size:
             return var
-        return abs(np.mean(losses))
+        return abs(losses.mean())
+
+    # --- Streaming state ---
+
+    def update_return(self, symbol: str, value: float):
+        """Append one return to a symbol's rolling window (covariance is updated by update_returns)."""
+        self._window(symbol).push(value)
 
-    def check_risk(self, portfolio_value: float, positions: List[Dict], historical_returns: List[float] = None) -> bool:
+    def update_returns(self, returns: Dict[str, float]):
+        """
+        Feed one period of returns across symbols: updates every rolling window and the
+        EWMA covariance (symbols absent from this period count as a zero return).
+        """
+        for symbol, value in returns.items():
+            self._window(symbol).push(value)
+        r = np.zeros(len(self.symbol_index))
+        for symbol, value in returns.items():
+            r[self.symbol_index[symbol]] = value
+        lam = self.ewma_lambda
+        if not self.covariance_updates:
+            self._cov = np.outer(r, r)
+        else:
+            self._cov *= lam
+            self._cov += (1 - lam) * np.outer(r, r)
+        self.covariance_updates += 1
+
+    def _window(self, symbol: str) -> ReturnWindow:
+        window = self.windows.get(symbol)
+        if window is None:
+            window = self.windows[symbol] = ReturnWindow(self.window, self.confidence_level)
+            self.symbol_index[symbol] = len(self.symbol_index)
+            n = len(self.symbol_index)
+            cov = np.zeros((n, n))
+            cov[:n - 1, :n - 1] = self._cov
+            self._cov = cov
+        return window
+
+    def covariance(self, symbols: List[str]) -> np.ndarray:
+        """EWMA covariance sub-matrix for the given symbols."""
+        idx = [self.symbol_index[symbol] for symbol in symbols]
+        return self._cov[np.ix_(idx, idx)]
+
+    def symbol_var(self, symbol: str, method: str = "historical") -> float:
+        window = self.windows.get(symbol)
+        if window is None or not window.count:
+            return 0.0
+        return window.historical_var if method == "historical" else window.parametric_var
+
+    def symbol_cvar(self, symbol: str) -> float:
+        window = self.windows.get(symbol)
+        return window.cvar if window is not None and window.count else 0.0
+
+    def portfolio_var(self, positions: List[Dict], portfolio_value: float) -> Optional[float]:
+        """
+        Parametric portfolio VaR as a fraction of portfolio value, z * sqrt(w' S w) over
+        the EWMA covariance S. None if no position has return history yet.
+        """
+        if portfolio_value <= 0:
+            return None
+        idx, exposure = [], []
+        for position in positions:
+            i = self.symbol_index.get(position.get('symbol'))
+            if i is not None:
+                idx.append(i)
+                exposure.append(position_exposure(position))
+        if not idx:
+            return None
+        w = np.asarray(exposure) / portfolio_value
+        cov = self._cov[np.ix_(idx, idx)]
+        return abs(self.z) * float(np.sqrt(max(w @ cov @ w, 0.0)))
+
+    def check_risk(self, portfolio_value: float, positions: List[Dict], historical_returns: List[float] = None, require_history: bool = False) -> bool:
         """
         Check if the current state allows for a new trade.
         Returns True if Risk is too high (VETO), False otherwise.
+
+        Uses, in order: explicitly passed returns, portfolio VaR from the streamed
+        covariance for the current positions, or the baseline window.
+
+        Args:
+            require_history (bool): Report "not breached" instead of falling back to the
+                synthetic baseline window when there is no real return data (for automated
+                gates that must not veto on fabricated returns).
         """
         # 1. Check Max Drawdown
         # This would typically track peak equity, here we simplify
-        # Assuming we get historical returns passed in or we mock them
-        if not historical_returns:
-            # Mock returns if not provided (e.g. for initial testing)
-            historical_returns = np.random.normal(0.001, 0.02, 100).tolist()
-
-        var = self.calculate_var(historical_returns)
-        cvar = self.calculate_cvar(historical_returns)
+        if historical_returns is not None and len(historical_returns):
+            var = self.calculate_var(historical_returns)
+            cvar = self.calculate_cvar(historical_returns)
+        else:
+            var = self.portfolio_var(positions or [], portfolio_value)
+            if var is not None:
+                cvar = _normal_cvar(var, self.confidence_level)
+            elif require_history:
+                logger.debug("Risk Assessment skipped: no return history for the current positions")
+                return False
+            else:
+                var, cvar = self._baseline.historical_var, self._baseline.cvar
 
         logger.info(f"Risk Assessment: VaR={var:.4f}, CVaR={cvar:.4f}")
 
@@ -74,3 +257,18 @@ class RiskEngine:
             return True # Risk is HIGH
 
         return False # Risk is ACCEPTABLE
+
+def position_exposure(position: Dict) -> float:
+    """Signed notional of a position dict ('notional', 'value', or quantity * price)."""
+    for key in ('notional', 'value'):
+        if key in position:
+            return float(position[key])
+    quantity = float(position.get('quantity', position.get('amount', 0.0)))
+    if position.get('side') in ('sell', 'short'):
+        quantity = -abs(quantity)
+    return quantity * float(position.get('price', position.get('entry_price', 0.0)))
+
+def _normal_cvar(var: float, confidence_level: float) -> float:
+    """Zero-mean normal expected shortfall matching a parametric VaR."""
+    z = norm.ppf(confidence_level)
+    return var * norm.pdf(z) / ((1 - confidence_level) * z)
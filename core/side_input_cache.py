@@ -0,0 +1,219 @@
+import asyncio
+import json
+import logging
+import time
+from typing import Any, Dict, Iterable, Optional
+import redis.asyncio as redis
+from config.config import settings
+
+logger = logging.getLogger(__name__)
+
+class SideInputCache:
+    """
+    Local cache of slow-moving side inputs (on-chain / sentiment factors) stored in Redis.
+    A background task keeps values fresh from keyspace notifications, with a periodic
+    MGET as fallback; `get` only reads process memory, so strategies do no I/O per tick.
+
+    JSON values carrying a 'timestamp' (epoch seconds or ms) are aged from the
+    producer's stamp. Otherwise, while keyspace notifications are confirmed enabled
+    on the server, a value's age restarts only on a write notification or when MGET
+    returns a different value, so a producer that stops writing goes stale after
+    `ttl_seconds`. Without notifications, rewrites of an unchanged value cannot be
+    told apart from a stopped producer, so every successful poll refreshes the age.
+    Deleted or expired keys are dropped at once.
+    """
+    PRODUCER_TIMESTAMP_FIELD = 'timestamp'
+    DROP_EVENTS = ('del', 'expired', 'evicted')
+
+    def __init__(self, keys: Iterable[str], ttl_seconds: float = 120.0, refresh_interval: float = 30.0, configure_notifications: bool = False):
+        """
+        Args:
+            keys (Iterable[str]): Redis keys to mirror (e.g. 'whale_sentiment').
+            ttl_seconds (float): Values older than this are treated as missing.
+            refresh_interval (float): Seconds between fallback full refreshes.
+            configure_notifications (bool): Enable keyspace events on the server (CONFIG SET).
+        """
+        self.keys = list(keys)
+        self.ttl_seconds = ttl_seconds
+        self.refresh_interval = refresh_interval
+        self.configure_notifications = configure_notifications
+        self.notifications_enabled = False # Server confirmed to publish keyspace events for our keys
+        self.redis = None
+        self.running = False
+        self._tasks = []
+        self._values: Dict[str, Any] = {}
+        self._raw: Dict[str, str] = {}
+        self._updated_at: Dict[str, float] = {} # time.monotonic() of the producer's last write
+        self.metrics = {
+            'hits': 0,
+            'misses': 0,
+            'stale_reads': 0,
+            'updates': 0,
+            'unchanged': 0,
+            'removed': 0,
+            'notifications': 0,
+            'refreshes': 0,
+            'errors': 0
+        }
+
+    async def start(self):
+        """Connect and launch the background refresh tasks (returns immediately)."""
+        if self.running:
+            return
+        self.running = True
+        self.redis = redis.Redis(
+            host=settings.REDIS_HOST,
+            port=settings.REDIS_PORT,
+            db=settings.REDIS_DB,
+            decode_responses=True
+        )
+        self._tasks = [
+            asyncio.create_task(self._refresh_loop()),
+            asyncio.create_task(self._notification_loop())
+        ]
+        logger.info(f"Side input cache started for {self.keys}")
+
+    async def stop(self):
+        self.running = False
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
+        if self.redis:
+            await self.redis.close()
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """Cached value, or `default` if missing or older than the TTL. Never does I/O."""
+        updated_at = self._updated_at.get(key)
+        if updated_at is None:
+            self.metrics['misses'] += 1
+            return default
+        if time.monotonic() - updated_at > self.ttl_seconds:
+            self.metrics['stale_reads'] += 1
+            return default
+        self.metrics['hits'] += 1
+        return self._values[key]
+
+    def age(self, key: str) -> Optional[float]:
+        """Seconds since the producer last wrote the key (None if unknown)."""
+        updated_at = self._updated_at.get(key)
+        return None if updated_at is None else time.monotonic() - updated_at
+
+    def set_local(self, key: str, raw: Optional[str], written: bool = False):
+        """
+        Parse and store a raw Redis value (None removes it).
+
+        Args:
+            key (str): Cached key.
+            raw (Optional[str]): Value as read from Redis.
+            written (bool): The producer is known to have just written the key (keyspace event).
+                Otherwise an unchanged value keeps its previous age while notifications are
+                enabled, and is treated as rewritten when they are not.
+        """
+        if raw is None:
+            self.remove_local(key)
+            return
+        if not written and self._raw.get(key) == raw:
+            self.metrics['unchanged'] += 1
+            if not self.notifications_enabled:
+                self._updated_at[key] = time.monotonic() - self._producer_age(self._values[key])
+            return
+        value = _parse(raw)
+        self._raw[key] = raw
+        self._values[key] = value
+        self._updated_at[key] = time.monotonic() - self._producer_age(value)
+        self.metrics['updates'] += 1
+
+    def remove_local(self, key: str):
+        if self._updated_at.pop(key, None) is not None:
+            self.metrics['removed'] += 1
+        self._values.pop(key, None)
+        self._raw.pop(key, None)
+
+    def _producer_age(self, value: Any) -> float:
+        """Seconds since the producer stamped `value`, 0 if it carries no timestamp."""
+        if not isinstance(value, dict):
+            return 0.0
+        stamp = value.get(self.PRODUCER_TIMESTAMP_FIELD)
+        if not isinstance(stamp, (int, float)):
+            return 0.0
+        if stamp > 1e11: # Milliseconds
+            stamp /= 1000.0
+        return max(time.time() - stamp, 0.0)
+
+    async def refresh(self):
+        """Fetch all keys in one round trip."""
+        values = await self.redis.mget(self.keys)
+        for key, raw in zip(self.keys, values):
+            self.set_local(key, raw)
+        self.metrics['refreshes'] += 1
+
+    async def _refresh_loop(self):
+        while self.running:
+            try:
+                await self.refresh()
+            except Exception as e:
+                self.metrics['errors'] += 1
+                logger.warning(f"Side input refresh failed: {e}")
+            await asyncio.sleep(self.refresh_interval)
+
+    async def _notifications_configured(self) -> bool:
+        """Whether the server publishes keyspace events for string writes (CONFIG GET may be disabled)."""
+        try:
+            config = await self.redis.config_get('notify-keyspace-events')
+        except Exception as e:
+            logger.info(f"Cannot read notify-keyspace-events ({e}); side inputs are aged by polling")
+            return False
+        flags = config.get('notify-keyspace-events') or ''
+        return 'K' in flags and ('$' in flags or 'A' in flags)
+
+    async def _notification_loop(self):
+        """Re-read a key as soon as Redis reports it was written; drop it when deleted or expired."""
+        db_index = settings.REDIS_DB
+        channels = {f"__keyspace@{db_index}__:{key}": key for key in self.keys}
+        while self.running:
+            try:
+                if self.configure_notifications:
+                    await self.redis.config_set('notify-keyspace-events', 'Kg$xe')
+                pubsub = self.redis.pubsub()
+                try:
+                    await pubsub.subscribe(*channels)
+                    self.notifications_enabled = await self._notifications_configured()
+                    async for message in pubsub.listen():
+                        if message['type'] != 'message':
+                            continue
+                        key = channels.get(message['channel'])
+                        if key is None:
+                            continue
+                        self.metrics['notifications'] += 1
+                        if message['data'] in self.DROP_EVENTS:
+                            self.remove_local(key)
+                        else:
+                            self.set_local(key, await self.redis.get(key), written=True)
+                finally:
+                    self.notifications_enabled = False
+                    await _close_pubsub(pubsub) # Don't leak the old connection on reconnect
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.metrics['errors'] += 1
+                logger.warning(f"Side input subscription error: {e}. Reconnecting in 5s...")
+                await asyncio.sleep(5)
+
+async def _close_pubsub(pubsub):
+    """Release the subscription's connection (aclose on redis-py >= 5, close before)."""
+    try:
+        close = getattr(pubsub, 'aclose', None) or pubsub.close
+        await close()
+    except Exception as e:
+        logger.debug(f"Closing side input subscription failed: {e}")
+
+def _parse(raw: str) -> Any:
+    """Float strings become floats, JSON is decoded, anything else is kept as-is."""
+    try:
+        return float(raw)
+    except ValueError:
+        pass
+    try:
+        return json.loads(raw)
+    except ValueError:
+        return raw
@@ -1,6 +1,9 @@
+import asyncio
 import logging
-import random
-from typing import Dict, List, Tuple
+import time
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from core.market_cache import symbol_key
 
 logger = logging.getLogger("SmartOrderRouter")
 
@@ -8,8 +11,23 @@ class SmartOrderRouter:
     """
     Smart Order Routing (SOR).
     Splits large orders across multiple exchanges (Binance, Uniswap, Bybit) based on liquidity depth to minimize slippage.
+
+    With L2 ladders per venue and symbol (`update_book` / `update_books`, e.g. from
+    GlobalLiquidityWall or the CEX feed) or attached LocalOrderBooks (`attach_local_book`, read in place
+    at routing time), routing walks the merged, fee-adjusted books greedily: every level of every
+    venue is sorted by effective price and taken best-first until the quantity is filled,
+    which minimizes total cost including fees. Without books it falls back to splitting
+    proportionally to the scalar `liquidity_depths`.
     """
-    def __init__(self):
+    def __init__(self, venues: Optional[Dict] = None, fees: Optional[Dict[str, float]] = None, default_fee: float = 0.001, venue_timeout: float = 2.0, max_book_age: float = 5.0):
+        """
+        Args:
+            venues (Dict): Venue name -> CCXT-compatible client used by execute_splits.
+            fees (Dict[str, float]): Taker fee per venue (e.g. 0.001 = 10 bps).
+            default_fee (float): Fee for venues without an entry.
+            venue_timeout (float): Seconds each venue gets to acknowledge a child order.
+            max_book_age (float): Books older than this are ignored by routing.
+        """
         self.exchanges = ["Binance", "Uniswap", "Bybit"]
         # Mock liquidity depths (Volume available at best bid/ask)
         self.liquidity_depths = {
@@ -17,6 +35,15 @@ class SmartOrderRouter:
             "Uniswap": 2.0,
             "Bybit": 5.0
         }
+        self.venues = venues or {}
+        self.fees = fees or {}
+        self.default_fee = default_fee
+        self.venue_timeout = venue_timeout
+        self.max_book_age = max_book_age
+        # (venue, symbol) -> (bids, asks, updated_at); ladders are (levels, 2) [price, qty], best first
+        self.books: Dict[Tuple[str, str], Tuple[np.ndarray, np.ndarray, float]] = {}
+        self.local_books: Dict[Tuple[str, str], Tuple[object, int]] = {} # (venue, symbol) -> (LocalOrderBook, levels)
+        self.last_route: Dict = {}
 
     def update_liquidity(self, exchange: str, depth: float):
         """
@@ -25,12 +52,46 @@ class SmartOrderRouter:
         if exchange in self.exchanges:
             self.liquidity_depths[exchange] = depth
 
+    def update_book(self, venue: str, book: Dict, symbol: Optional[str] = None):
+        """
+        Store a venue's L2 ladder ({'bids': [[price, qty], ...], 'asks': [...]}, CCXT format)
+        for `symbol` (defaults to the book's own 'symbol' field).
+        """
+        symbol = symbol or book.get('symbol')
+        if not symbol:
+            raise ValueError(f"Order book for {venue} has no symbol")
+        bids = _ladder(book.get('bids'))
+        asks = _ladder(book.get('asks'))
+        self.books[(venue, symbol_key(symbol))] = (bids, asks, time.monotonic())
+
+    def update_books(self, books: Dict[str, Dict], symbol: Optional[str] = None):
+        """Bulk update, e.g. from GlobalLiquidityWall.fetch_order_books()."""
+        for venue, book in books.items():
+            self.update_book(venue, book, symbol)
+
+    def attach_local_book(self, venue: str, book, levels: int = 100):
+        """Route over a live LocalOrderBook's top `levels` (zero-copy views) instead of pushed ladders."""
+        self.local_books[(venue, symbol_key(book.symbol))] = (book, levels)
+
+    def _ladders(self, key: Tuple[str, str]) -> Tuple[np.ndarray, np.ndarray]:
+        local = self.local_books.get(key)
+        if local is not None:
+            book, levels = local
+            return book.top(levels)
+        bids, asks, _ = self.books[key]
+        return bids, asks
+
     def route_order(self, symbol: str, side: str, quantity: float) -> Dict[str, float]:
         """
-        Splits the order quantity across exchanges proportional to their liquidity.
+        Splits the order quantity across exchanges: cost-minimizing over live L2 books
+        when available, otherwise proportional to their liquidity.
         """
         logger.info(f"Routing order: {side} {quantity} {symbol}...")
-        
+        if self._fresh_books(symbol):
+            plan = self.plan_order(symbol, side, quantity)
+            logger.info(f"Order splits: {plan['splits']} (avg {plan['avg_price']:.6g}, fees {plan['fees']:.6g})")
+            return plan['splits']
+
         total_liquidity = sum(self.liquidity_depths.values())
         if total_liquidity == 0:
             logger.error("No liquidity available on any exchange!")
@@ -44,10 +105,9 @@ class SmartOrderRouter:
 
         for exchange, depth in sorted_exchanges:
             # Simple proportional split logic
-            # In a real SOR, this would consider order book impact cost (slippage model)
             share = depth / total_liquidity
             split_qty = round(quantity * share, 6)
-            
+
             if split_qty > 0:
                 order_splits[exchange] = split_qty
                 remaining_qty -= split_qty
@@ -60,13 +120,129 @@ class SmartOrderRouter:
         logger.info(f"Order splits: {order_splits}")
         return order_splits
 
-    async def execute_splits(self, order_splits: Dict[str, float]):
+    def plan_order(self, symbol: str, side: str, quantity: float) -> Dict:
         """
-        Mock execution of split orders.
+        Cost-minimizing split over the fresh venue books for `symbol`.
+
+        Returns:
+            Dict: splits (venue -> qty), limit_prices (venue -> worst level taken),
+                  avg_price (before fees), fees, total_cost (signed notional incl. fees),
+                  unfilled (quantity beyond all visible depth).
         """
-        for exchange, qty in order_splits.items():
-            logger.info(f"Executing {qty} on {exchange}...")
-            # await exchange_api.place_order(...)
-            # Simulate latency
-            # await asyncio.sleep(0.01) 
+        started = time.perf_counter()
+        key = symbol_key(symbol)
+        venues = self._fresh_books(symbol)
+        buy = side == 'buy'
+        ladders = [self._ladders((venue, key))[1 if buy else 0] for venue in venues]
+        sizes = [len(ladder) for ladder in ladders]
+        if not sum(sizes):
+            return {'splits': {}, 'limit_prices': {}, 'avg_price': 0.0, 'fees': 0.0, 'total_cost': 0.0, 'unfilled': quantity}
+
+        levels = np.concatenate(ladders)
+        venue_index = np.repeat(np.arange(len(venues)), sizes)
+        fee_rates = np.array([self.fees.get(venue, self.default_fee) for venue in venues])[venue_index]
+        prices, qtys = levels[:, 0], levels[:, 1]
+
+        # Effective price per unit: what a buyer pays / a seller receives after fees
+        effective = prices * (1 + fee_rates) if buy else -(prices * (1 - fee_rates))
+        order = np.argsort(effective, kind='stable')
+        sorted_qty = qtys[order]
+        filled_before = np.cumsum(sorted_qty) - sorted_qty
+        take = np.clip(quantity - filled_before, 0.0, sorted_qty)
+        used = take > 0
+        taken_idx = order[used]
+        taken_qty = take[used]
+
+        per_venue = np.bincount(venue_index[taken_idx], weights=taken_qty, minlength=len(venues))
+        notional = taken_qty @ prices[taken_idx]
+        fees = taken_qty @ (prices[taken_idx] * fee_rates[taken_idx])
+        filled = taken_qty.sum()
+        unfilled = quantity - filled
+        if unfilled <= 1e-9 * quantity: # Float residue of the cumulative sum
+            unfilled = 0.0
+
+        limit_prices = {}
+        for index in np.flatnonzero(per_venue > 0):
+            venue_prices = prices[taken_idx][venue_index[taken_idx] == index]
+            limit_prices[venues[index]] = float(venue_prices.max() if buy else venue_prices.min())
+
+        plan = {
+            'splits': {venues[i]: float(per_venue[i]) for i in np.flatnonzero(per_venue > 0)},
+            'limit_prices': limit_prices,
+            'avg_price': float(notional / filled) if filled else 0.0,
+            'fees': float(fees),
+            'total_cost': float(notional + fees if buy else -(notional - fees)),
+            'unfilled': float(unfilled),
+            'latency_ms': (time.perf_counter() - started) * 1000
+        }
+        if plan['unfilled'] > 0:
+            logger.warning(f"Visible depth short by {plan['unfilled']} for {side} {quantity}")
+        self.last_route = plan
+        return plan
+
+    def _fresh_books(self, symbol: str) -> List[str]:
+        """Venues with a fresh book for `symbol` (attached local books take precedence)."""
+        key = symbol_key(symbol)
+        now = time.monotonic()
+        venues = [
+            venue for (venue, book_symbol), (_, _, updated_at) in self.books.items()
+            if book_symbol == key and now - updated_at <= self.max_book_age and (venue, key) not in self.local_books
+        ]
+        venues += [
+            venue for (venue, book_symbol), (book, _) in self.local_books.items()
+            if book_symbol == key and book.synced and now - book.updated_at <= self.max_book_age
+        ]
+        return venues
+
+    async def execute_splits(self, order_splits: Dict[str, float], symbol: Optional[str] = None, side: Optional[str] = None, limit_prices: Optional[Dict[str, float]] = None) -> Dict[str, Optional[Dict]]:
+        """
+        Send the child orders to all venues concurrently, each under its own timeout.
+        Venues without a configured client are only logged (dry run).
+
+        Args:
+            limit_prices (Dict[str, float]): Per-venue limit prices from the same plan
+                (plan_order(...)['limit_prices']); venues without one get market orders.
+
+        Returns:
+            Dict[str, Optional[Dict]]: Venue -> order response (None if it failed or timed out).
+        """
+        limit_prices = limit_prices or {}
+        venues = list(order_splits)
+        results = await asyncio.gather(*(
+            self._execute_child(venue, symbol, side, order_splits[venue], limit_prices.get(venue)) for venue in venues
+        ))
         logger.info("All splits executed.")
+        return dict(zip(venues, results))
+
+    async def route_and_execute(self, symbol: str, side: str, quantity: float) -> Dict[str, Optional[Dict]]:
+        """Plan over the fresh books for `symbol` and send that plan's splits at its limit prices."""
+        if not self._fresh_books(symbol):
+            return await self.execute_splits(self.route_order(symbol, side, quantity), symbol, side)
+        plan = self.plan_order(symbol, side, quantity)
+        return await self.execute_splits(plan['splits'], symbol, side, plan['limit_prices'])
+
+    async def _execute_child(self, venue: str, symbol: Optional[str], side: Optional[str], qty: float, price: Optional[float]) -> Optional[Dict]:
+        client = self.venues.get(venue)
+        logger.info(f"Executing {qty} on {venue}...")
+        if client is None or symbol is None or side is None:
+            return None
+        order_type = 'limit' if price else 'market'
+        try:
+            return await asyncio.wait_for(client.create_order(symbol, order_type, side, qty, price), self.venue_timeout)
+        except asyncio.TimeoutError:
+            logger.error(f"{venue} did not acknowledge {side} {qty} {symbol} within {self.venue_timeout}s")
+        except Exception as e:
+            logger.error(f"{venue} rejected {side} {qty} {symbol}: {e}")
+        return None
+
+def _ladder(levels) -> np.ndarray:
+    """CCXT levels ([price, amount, ...extra fields such as kraken's timestamp]) as an (n, 2) float array."""
+    if levels is None or len(levels) == 0:
+        return np.empty((0, 2))
+    try:
+        ladder = np.asarray(levels, dtype=np.float64)
+    except ValueError: # Ragged rows (extra fields on some levels only)
+        ladder = np.asarray([level[:2] for level in levels], dtype=np.float64)
+    if ladder.ndim != 2 or ladder.shape[1] < 2:
+        raise ValueError(f"Order book levels must be [price, amount, ...] rows, got shape {ladder.shape}")
+    return ladder[:, :2]
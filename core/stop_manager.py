@@ -0,0 +1,289 @@
+import bisect
+import heapq
+import itertools
+import logging
+from typing import Dict, List, Optional
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+class StopOrder:
+    """A protective stop on one position (sub-account, symbol, long or short)."""
+    __slots__ = ('stop_id', 'symbol', 'side', 'quantity', 'account', 'kind', 'stop_price', 'trailing_pct', 'entry_price', 'active', 'triggered_price')
+
+    def __init__(self, stop_id: int, symbol: str, side: str, quantity: Optional[float], account: Optional[str], kind: str, stop_price: float, trailing_pct: float, entry_price: float):
+        self.stop_id = stop_id
+        self.symbol = symbol
+        self.side = side # Position side: 'long' or 'short'
+        self.quantity = quantity
+        self.account = account
+        self.kind = kind # 'fixed' or 'trailing'
+        self.stop_price = stop_price
+        self.trailing_pct = trailing_pct
+        self.entry_price = entry_price
+        self.active = True
+        self.triggered_price = 0.0
+
+    @property
+    def close_side(self) -> str:
+        return 'sell' if self.side == 'long' else 'buy'
+
+    def __repr__(self) -> str:
+        return f"StopOrder({self.stop_id}, {self.symbol}, {self.side}, {self.kind}, stop={self.stop_price}, pct={self.trailing_pct})"
+
+class _SortedStops:
+    """Fixed stops of one side as parallel sorted arrays (stop price, stop id)."""
+
+    def __init__(self):
+        self.prices = np.empty(0)
+        self.ids = np.empty(0, dtype=np.int64)
+
+    def add(self, price: float, stop_id: int):
+        i = int(np.searchsorted(self.prices, price, side='right'))
+        self.prices = np.insert(self.prices, i, price)
+        self.ids = np.insert(self.ids, i, stop_id)
+
+    def pop_at_or_above(self, price: float) -> np.ndarray:
+        """Ids with stop >= price (long stops hit by a falling price)."""
+        i = int(np.searchsorted(self.prices, price, side='left'))
+        if i == len(self.prices):
+            return self.ids[:0]
+        hit = self.ids[i:]
+        self.prices, self.ids = self.prices[:i], self.ids[:i]
+        return hit
+
+    def pop_at_or_below(self, price: float) -> np.ndarray:
+        """Ids with stop <= price (short stops hit by a rising price)."""
+        i = int(np.searchsorted(self.prices, price, side='right'))
+        if not i:
+            return self.ids[:0]
+        hit = self.ids[:i]
+        self.prices, self.ids = self.prices[i:], self.ids[i:]
+        return hit
+
+class _TrailingGroup:
+    """Trailing stops sharing one extreme (high-water mark for longs, low-water for shorts), sorted by pct."""
+    __slots__ = ('extreme', 'pcts', 'ids', 'version')
+
+    def __init__(self, extreme: float, pcts: np.ndarray, ids: np.ndarray):
+        self.extreme = extreme
+        self.pcts = pcts
+        self.ids = ids
+        self.version = 0 # Bumped on every change; older heap entries for the group are stale
+
+class _TrailingStops:
+    """
+    Trailing stops of one side. Every stop whose extreme the price moves past ends up
+    with the same extreme, so stops are kept in groups by extreme; a price move merges
+    the overtaken groups (found by bisect) into one. A stop in a group triggers when
+    its pct <= the adverse move from the group extreme, so each group's hits are a
+    prefix of its pct-sorted array, and the group's next trigger price is set by its
+    smallest pct. Groups are indexed in a heap by that trigger price, so an update
+    only visits groups that actually triggered: O(log n + k) plus the (amortized)
+    merge of overtaken groups.
+    """
+    TRIGGER_TOLERANCE = 1e-12 # Heap prefilter slack; hits are decided by the exact move test
+
+    def __init__(self, long: bool):
+        self.long = long
+        self.groups: List[_TrailingGroup] = []
+        self._keys: List[float] = [] # Sort keys for bisect: extreme (long) or -extreme (short)
+        self._heap: List[tuple] = [] # (heap key, seq, version, group); heap key = -trigger (long) or trigger (short)
+        self._seq = itertools.count()
+
+    def _schedule(self, group: _TrailingGroup):
+        """(Re)index a changed group by its next trigger price."""
+        group.version += 1
+        if len(group.ids):
+            pct = group.pcts[0]
+            trigger = group.extreme * (1 - pct) if self.long else group.extreme * (1 + pct)
+            heapq.heappush(self._heap, (-trigger if self.long else trigger, next(self._seq), group.version, group))
+        if len(self._heap) > 2 * len(self.groups) + 64:
+            self._heap[:] = [entry for entry in self._heap if entry[2] == entry[3].version] # In place: update() holds a reference
+            heapq.heapify(self._heap)
+
+    def add(self, extreme: float, pct: float, stop_id: int):
+        key = extreme if self.long else -extreme
+        i = bisect.bisect_left(self._keys, key)
+        if i < len(self._keys) and self._keys[i] == key:
+            group = self.groups[i]
+            j = int(np.searchsorted(group.pcts, pct, side='right'))
+            group.pcts = np.insert(group.pcts, j, pct)
+            group.ids = np.insert(group.ids, j, stop_id)
+            if j == 0: # New smallest pct moves the group's trigger price
+                self._schedule(group)
+            return
+        group = _TrailingGroup(extreme, np.array([pct]), np.array([stop_id], dtype=np.int64))
+        self._keys.insert(i, key)
+        self.groups.insert(i, group)
+        self._schedule(group)
+
+    def update(self, price: float) -> np.ndarray:
+        """Advance extremes to `price` and pop every triggered stop id."""
+        key = price if self.long else -price
+        overtaken = bisect.bisect_left(self._keys, key)
+        if overtaken:
+            merged = self.groups[:overtaken]
+            for group in merged:
+                group.version += 1 # Invalidate their heap entries
+            pcts = np.concatenate([group.pcts for group in merged])
+            ids = np.concatenate([group.ids for group in merged])
+            order = np.argsort(pcts, kind='stable')
+            if overtaken < len(self._keys) and self._keys[overtaken] == key:
+                group = self.groups[overtaken]
+                pcts = np.concatenate((pcts[order], group.pcts))
+                ids = np.concatenate((ids[order], group.ids))
+                order = np.argsort(pcts, kind='stable')
+                group.pcts, group.ids = pcts[order], ids[order]
+                del self.groups[:overtaken], self._keys[:overtaken]
+            else:
+                group = _TrailingGroup(price, pcts[order], ids[order])
+                self.groups[:overtaken] = [group]
+                self._keys[:overtaken] = [key]
+            self._schedule(group)
+
+        hits = []
+        heap = self._heap
+        slack = self.TRIGGER_TOLERANCE
+        near_misses = []
+        while heap:
+            heap_key, _, version, group = heap[0]
+            trigger = -heap_key if self.long else heap_key
+            if (price > trigger * (1 + slack)) if self.long else (price < trigger * (1 - slack)):
+                break
+            heapq.heappop(heap)
+            if version != group.version:
+                continue
+            move = 1.0 - price / group.extreme if self.long else price / group.extreme - 1.0
+            n = int(np.searchsorted(group.pcts, move, side='right'))
+            if not n:
+                near_misses.append(group)
+                continue
+            hits.append(group.ids[:n])
+            group.pcts, group.ids = group.pcts[n:], group.ids[n:]
+            if len(group.ids):
+                self._schedule(group)
+            else:
+                group.version += 1
+                i = bisect.bisect_left(self._keys, group.extreme if self.long else -group.extreme)
+                del self.groups[i], self._keys[i]
+        for group in near_misses:
+            self._schedule(group)
+        return np.concatenate(hits) if hits else np.empty(0, dtype=np.int64)
+
+    def stop_price(self, stop_id: int, pct: float) -> Optional[float]:
+        for group in self.groups:
+            if stop_id in group.ids:
+                return group.extreme * (1 - pct) if self.long else group.extreme * (1 + pct)
+        return None
+
+class _SymbolStops:
+    __slots__ = ('fixed_long', 'fixed_short', 'trailing_long', 'trailing_short')
+
+    def __init__(self):
+        self.fixed_long = _SortedStops()
+        self.fixed_short = _SortedStops()
+        self.trailing_long = _TrailingStops(long=True)
+        self.trailing_short = _TrailingStops(long=False)
+
+class StopManager:
+    """
+    Fixed and trailing stops for many symbols and sub-accounts, long and short.
+    Fixed stops live in sorted price arrays and trailing stops in groups keyed by
+    their high/low-water mark and indexed by next trigger price, so a price update
+    finds every triggered stop in O(log n + k) per symbol (plus amortized group
+    merges) instead of scanning all stops.
+    """
+
+    def __init__(self):
+        self.stops: Dict[int, StopOrder] = {}
+        self._books: Dict[str, _SymbolStops] = {}
+        self._ids = itertools.count(1)
+        self.metrics = {'updates': 0, 'triggered': 0, 'cancelled': 0}
+
+    def _book(self, symbol: str) -> _SymbolStops:
+        book = self._books.get(symbol)
+        if book is None:
+            book = self._books[symbol] = _SymbolStops()
+        return book
+
+    def add_fixed(self, symbol: str, side: str, stop_price: float, quantity: Optional[float] = None, account: Optional[str] = None) -> StopOrder:
+        """Stop-loss at a fixed price for a 'long' (triggers at or below) or 'short' (at or above) position."""
+        stop = StopOrder(next(self._ids), symbol, side, quantity, account, 'fixed', stop_price, 0.0, stop_price)
+        book = self._book(symbol)
+        (book.fixed_long if side == 'long' else book.fixed_short).add(stop_price, stop.stop_id)
+        self.stops[stop.stop_id] = stop
+        return stop
+
+    def add_trailing(self, symbol: str, side: str, entry_price: float, trailing_pct: float, quantity: Optional[float] = None, account: Optional[str] = None) -> StopOrder:
+        """Trailing stop `trailing_pct` (e.g. 0.02) behind the best price seen since entry."""
+        stop = StopOrder(next(self._ids), symbol, side, quantity, account, 'trailing', 0.0, trailing_pct, entry_price)
+        book = self._book(symbol)
+        trailing = book.trailing_long if side == 'long' else book.trailing_short
+        trailing.add(entry_price, trailing_pct, stop.stop_id)
+        stop.stop_price = entry_price * (1 - trailing_pct) if side == 'long' else entry_price * (1 + trailing_pct) # Its group's extreme is entry_price
+        self.stops[stop.stop_id] = stop
+        return stop
+
+    def cancel(self, stop_id: int) -> bool:
+        """Deactivate a stop; its array entry is discarded lazily when reached."""
+        stop = self.stops.pop(stop_id, None)
+        if stop is None:
+            return False
+        stop.active = False
+        self.metrics['cancelled'] += 1
+        return True
+
+    def on_price(self, symbol: str, price: float) -> List[StopOrder]:
+        """Process a price update and return the stops it triggered (removed from the manager)."""
+        book = self._books.get(symbol)
+        if book is None:
+            return []
+        self.metrics['updates'] += 1
+        hit_ids = (
+            book.fixed_long.pop_at_or_above(price),
+            book.fixed_short.pop_at_or_below(price),
+            book.trailing_long.update(price),
+            book.trailing_short.update(price)
+        )
+        triggered = []
+        for ids in hit_ids:
+            for stop_id in ids.tolist():
+                stop = self.stops.pop(stop_id, None)
+                if stop is None: # Cancelled earlier
+                    continue
+                stop.active = False
+                stop.triggered_price = price
+                triggered.append(stop)
+        if triggered:
+            self.metrics['triggered'] += len(triggered)
+            logger.warning(f"{len(triggered)} stop(s) triggered for {symbol} at {price}")
+        return triggered
+
+    def current_stop_price(self, stop_id: int) -> Optional[float]:
+        """Current trigger price of an active stop (trailing stops move with the market)."""
+        stop = self.stops.get(stop_id)
+        if stop is None:
+            return None
+        if stop.kind == 'fixed':
+            return stop.stop_price
+        book = self._books[stop.symbol]
+        trailing = book.trailing_long if stop.side == 'long' else book.trailing_short
+        return trailing.stop_price(stop_id, stop.trailing_pct)
+
+    def active_stops(self, symbol: Optional[str] = None) -> List[StopOrder]:
+        return [stop for stop in self.stops.values() if symbol is None or stop.symbol == symbol]
+
+def close_orders(triggered: List[StopOrder]) -> List[Dict]:
+    """Aggregate triggered stops into one close order per (account, symbol, side)."""
+    batches: Dict[tuple, Dict] = {}
+    for stop in triggered:
+        if not stop.quantity:
+            continue
+        key = (stop.account, stop.symbol, stop.close_side)
+        batch = batches.get(key)
+        if batch is None:
+            batch = batches[key] = {'account': stop.account, 'symbol': stop.symbol, 'side': stop.close_side, 'amount': 0.0, 'price': stop.triggered_price, 'stop_ids': []}
+        batch['amount'] += stop.quantity
+        batch['stop_ids'].append(stop.stop_id)
+    return list(batches.values())
@@ -0,0 +1,193 @@
+import logging
+import math
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, List, Optional, Sequence
+import numpy as np
+from core.risk_engine import RiskEngine, position_exposure
+
+logger = logging.getLogger(__name__)
+
+SCENARIO_METHODS = ('bootstrap', 'parametric', 'gan')
+
+@dataclass
+class StressReport:
+    """Tail metrics of simulated portfolio PnL (currency units; losses are positive)."""
+    method: str
+    n_scenarios: int
+    horizon: int
+    portfolio_value: float
+    symbols: List[str]
+    mean_pnl: float
+    std_pnl: float
+    worst_pnl: float
+    probability_of_loss: float
+    var: Dict[float, float] = field(default_factory=dict)
+    cvar: Dict[float, float] = field(default_factory=dict)
+
+    def to_dict(self) -> Dict:
+        """Flat dict, including VaR/CVaR as fractions of portfolio value."""
+        out = {
+            'method': self.method,
+            'n_scenarios': self.n_scenarios,
+            'horizon': self.horizon,
+            'mean_pnl': self.mean_pnl,
+            'std_pnl': self.std_pnl,
+            'worst_pnl': self.worst_pnl,
+            'probability_of_loss': self.probability_of_loss
+        }
+        for level in self.var:
+            pct = f"{level * 100:g}"
+            out[f'var_{pct}'] = self.var[level]
+            out[f'cvar_{pct}'] = self.cvar[level]
+            if self.portfolio_value > 0:
+                out[f'var_{pct}_pct'] = self.var[level] / self.portfolio_value
+                out[f'cvar_{pct}_pct'] = self.cvar[level] / self.portfolio_value
+        return out
+
+class StressTestEngine:
+    """
+    Monte Carlo portfolio stress testing on top of RiskEngine state.
+    Joint return scenarios are drawn in fixed-size chunks (bootstrap of the rolling
+    history, multivariate normal from the EWMA covariance, or MarketGAN samples),
+    positions are revalued as one matrix-vector product per chunk, and only the
+    worst tail of PnL is retained, so memory stays O(chunk_size + tail) for any
+    number of scenarios.
+    """
+
+    def __init__(self, risk_engine: RiskEngine, confidence_levels: Sequence[float] = (0.95, 0.99), chunk_size: int = 10000, seed: Optional[int] = None):
+        """
+        Args:
+            risk_engine (RiskEngine): Source of return history and covariance (fed via update_returns).
+            confidence_levels (Sequence[float]): Levels reported in VaR/CVaR.
+            chunk_size (int): Scenarios generated and revalued per step.
+            seed (int): RNG seed for reproducible runs.
+        """
+        self.risk_engine = risk_engine
+        self.confidence_levels = tuple(sorted(confidence_levels))
+        self.chunk_size = chunk_size
+        self.rng = np.random.default_rng(seed)
+
+    def run(
+        self,
+        positions: List[Dict],
+        portfolio_value: float,
+        n_scenarios: int = 50000,
+        method: str = 'bootstrap',
+        horizon: int = 1,
+        gan=None,
+        gan_scale: float = 0.05
+    ) -> StressReport:
+        """
+        Simulate `n_scenarios` joint return paths of `horizon` periods and report tail metrics.
+
+        Args:
+            positions (List[Dict]): Positions as passed to RiskEngine.check_risk.
+            portfolio_value (float): Used to express VaR/CVaR as fractions.
+            method (str): 'bootstrap', 'parametric' or 'gan'.
+            gan (MarketGAN): Trained generator for method='gan' (feature_dim == number of symbols).
+            gan_scale (float): Return per unit of generator output (outputs are tanh-bounded).
+        """
+        if method not in SCENARIO_METHODS:
+            raise ValueError(f"Unknown scenario method '{method}' (expected one of {SCENARIO_METHODS})")
+
+        symbols, exposure = self._exposures(positions)
+        if not symbols:
+            raise ValueError("No positions with return history to stress")
+
+        # Streaming accumulators; only the k worst outcomes are kept
+        tail_size = _tail_count(self.confidence_levels[0], n_scenarios)
+        worst = np.empty(0)
+        total = total_sq = 0.0
+        losses = 0
+
+        for returns in self.scenarios(symbols, n_scenarios, method, horizon, gan, gan_scale):
+            pnl = returns @ exposure
+            total += float(pnl.sum())
+            total_sq += float(np.dot(pnl, pnl))
+            losses += int(np.count_nonzero(pnl < 0))
+            worst = np.concatenate((worst, pnl))
+            if worst.size > tail_size:
+                worst = np.partition(worst, tail_size - 1)[:tail_size]
+
+        worst.sort()
+        mean = total / n_scenarios
+        report = StressReport(
+            method=method,
+            n_scenarios=n_scenarios,
+            horizon=horizon,
+            portfolio_value=portfolio_value,
+            symbols=symbols,
+            mean_pnl=mean,
+            std_pnl=math.sqrt(max(total_sq / n_scenarios - mean * mean, 0.0)),
+            worst_pnl=float(worst[0]),
+            probability_of_loss=losses / n_scenarios
+        )
+        for level in self.confidence_levels:
+            k = _tail_count(level, n_scenarios)
+            report.var[level] = max(-float(worst[k - 1]), 0.0)
+            report.cvar[level] = max(-float(worst[:k].mean()), 0.0)
+
+        logger.info(f"Stress test ({method}, {n_scenarios} scenarios, {horizon}-period): " + ", ".join(
+            f"VaR{level:.0%}={report.var[level]:.2f} CVaR{level:.0%}={report.cvar[level]:.2f}" for level in self.confidence_levels
+        ))
+        return report
+
+    def scenarios(self, symbols: List[str], n_scenarios: int, method: str = 'bootstrap', horizon: int = 1, gan=None, gan_scale: float = 0.05) -> Iterator[np.ndarray]:
+        """Yield (chunk, n_symbols) arrays of compounded `horizon`-period returns."""
+        n_symbols = len(symbols)
+        if method == 'bootstrap':
+            history = self._joint_history(symbols)
+        elif method == 'parametric':
+            factor = self._cholesky(symbols)
+        elif gan is None or gan.feature_dim != n_symbols:
+            raise ValueError(f"method='gan' needs a MarketGAN with feature_dim={n_symbols}")
+
+        remaining = n_scenarios
+        while remaining > 0:
+            size = min(self.chunk_size, remaining)
+            draws = size * horizon
+            if method == 'bootstrap':
+                # Whole rows, so cross-asset correlation of each historical period is kept
+                period_returns = history[self.rng.integers(0, len(history), draws)]
+            elif method == 'parametric':
+                period_returns = self.rng.standard_normal((draws, n_symbols)) @ factor.T
+            else:
+                period_returns = gan.generate_scenario(draws) * gan_scale
+            period_returns = period_returns.reshape(size, horizon, n_symbols)
+            if horizon == 1:
+                yield period_returns[:, 0, :]
+            else:
+                yield np.expm1(np.log1p(period_returns).sum(axis=1))
+            remaining -= size
+
+    def _exposures(self, positions: List[Dict]):
+        """Net exposure per symbol with return history (positions without history are skipped)."""
+        exposure: Dict[str, float] = {}
+        for position in positions:
+            symbol = position.get('symbol')
+            if symbol not in self.risk_engine.windows:
+                logger.warning(f"No return history for {symbol}; excluded from stress test.")
+                continue
+            exposure[symbol] = exposure.get(symbol, 0.0) + position_exposure(position)
+        return list(exposure), np.fromiter(exposure.values(), dtype=np.float64, count=len(exposure))
+
+    def _joint_history(self, symbols: List[str]) -> np.ndarray:
+        """Aligned (periods, n_symbols) return history over the periods all symbols share."""
+        columns = [self.risk_engine.windows[symbol].values() for symbol in symbols]
+        periods = min(len(column) for column in columns)
+        if not periods:
+            raise ValueError("Return windows are empty")
+        return np.column_stack([column[len(column) - periods:] for column in columns])
+
+    def _cholesky(self, symbols: List[str]) -> np.ndarray:
+        """Factor L with L L' = EWMA covariance of the symbols (eigen-clipped if not PD)."""
+        cov = self.risk_engine.covariance(symbols)
+        try:
+            return np.linalg.cholesky(cov)
+        except np.linalg.LinAlgError:
+            values, vectors = np.linalg.eigh(cov)
+            return vectors * np.sqrt(np.clip(values, 0.0, None))
+
+def _tail_count(level: float, n_scenarios: int) -> int:
+    """Scenarios in the (1 - level) tail; the epsilon stops 1 - 0.95 rounding 5000.0000001 up."""
+    return max(1, math.ceil((1 - level) * n_scenarios - 1e-9))
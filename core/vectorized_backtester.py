@@ -0,0 +1,164 @@
+import logging
+from typing import Optional, Union
+import numpy as np
+import pandas as pd
+
+from core.backtester import build_summary, print_tca_report
+from core.backtest_results import BacktestResults, FILL_DTYPE
+
+logger = logging.getLogger(__name__)
+
+class VectorizedBacktester:
+    """
+    Signal-Array Backtester.
+    Computes fills, TCA and the equity curve for a whole target-position array at once with NumPy.
+    Fills execute at the close of the bar whose target differs from the previous one,
+    using the same fee and slippage model as EventDrivenBacktester.
+    Target positions are trusted: no cash or inventory checks are applied.
+    """
+
+    def __init__(self, initial_capital: float = 10000.0, maker_fee: float = 0.001, taker_fee: float = 0.002, slippage_model: float = 0.0005, order_type: str = 'market'):
+        """
+        Args:
+            initial_capital (float): Starting cash.
+            maker_fee (float): Fee for limit orders (0.1% default).
+            taker_fee (float): Fee for market orders (0.2% default).
+            slippage_model (float): Estimated slippage percentage (0.05% default).
+            order_type (str): 'market' or 'limit', selects the fee applied to every fill.
+        """
+        self.initial_capital = initial_capital
+        self.maker_fee = maker_fee
+        self.taker_fee = taker_fee
+        self.slippage_model = slippage_model
+        self.order_type = order_type
+        self.last_results: Optional[BacktestResults] = None
+
+    @staticmethod
+    def positions_from_signals(signals, quantity: Union[float, np.ndarray], allow_short: bool = False, symbols=None) -> np.ndarray:
+        """
+        Convert Brain-style actions into a target-position array.
+
+        Args:
+            signals: Array of 0 (Hold), 1 (Buy), 2 (Sell) per bar.
+            quantity: Position size taken on a buy (scalar or per-bar array).
+            allow_short (bool): If True a sell goes short `quantity`, otherwise it goes flat.
+            symbols: Optional per-bar symbol labels; holds are carried forward per symbol.
+
+        Returns:
+            np.ndarray: Target position per bar.
+        """
+        signals = np.asarray(signals)
+        size = np.broadcast_to(np.asarray(quantity, dtype=np.float64), signals.shape)
+
+        target = np.full(signals.shape, np.nan)
+        buys = signals == 1
+        sells = signals == 2
+        target[buys] = size[buys]
+        target[sells] = -size[sells] if allow_short else 0.0
+
+        if symbols is None:
+            return _forward_fill(target)
+
+        codes, uniques = pd.factorize(np.asarray(symbols))
+        for code in range(len(uniques)):
+            idx = np.flatnonzero(codes == code)
+            target[idx] = _forward_fill(target[idx])
+        return target
+
+    def run(self, data: pd.DataFrame, positions) -> BacktestResults:
+        """
+        Backtest a target-position array.
+
+        Args:
+            data (pd.DataFrame): Bars with 'close' and optionally 'symbol' (one row per bar and symbol).
+            positions: Target position (in units of the asset) held after each row.
+
+        Returns:
+            BacktestResults: Equity curve, fills and risk metrics; `summary` has the same
+                             keys as EventDrivenBacktester.summary().
+        """
+        prices = data['close'].to_numpy(dtype=np.float64)
+        target = np.asarray(positions, dtype=np.float64)
+        if target.shape != prices.shape:
+            raise ValueError(f"positions has shape {target.shape}, expected {prices.shape}")
+
+        n = len(prices)
+        if 'symbol' in data.columns:
+            codes, symbols = pd.factorize(data['symbol'])
+        else:
+            codes, symbols = np.zeros(n, dtype=np.int64), [None]
+
+        # 1. Previous target per symbol, and mark-to-market value of all holdings per row
+        prev = np.zeros(n)
+        holdings_value = np.zeros(n)
+        gross_exposure = np.zeros(n)
+        for code in range(len(symbols)):
+            idx = np.flatnonzero(codes == code)
+            if len(idx) == 0:
+                continue
+            prev[idx[1:]] = target[idx[:-1]]
+
+            # Carry this symbol's last (position, price) forward onto other symbols' rows
+            last = np.full(n, -1, dtype=np.int64)
+            last[idx] = idx
+            np.maximum.accumulate(last, out=last)
+            seen = last >= 0
+            marked = target[last[seen]] * prices[last[seen]]
+            holdings_value[seen] += marked
+            gross_exposure[seen] += np.abs(marked)
+
+        # 2. Fills with slippage: buys execute higher, sells lower
+        trade_qty = target - prev
+        slippage_impact = prices * self.slippage_model
+        exec_price = prices + np.sign(trade_qty) * slippage_impact
+
+        # 3. Fees and cash
+        fee_rate = self.maker_fee if self.order_type == 'limit' else self.taker_fee
+        commission = np.abs(trade_qty) * exec_price * fee_rate
+        cash = self.initial_capital - np.cumsum(trade_qty * exec_price + commission)
+
+        equity = cash + holdings_value
+
+        traded = np.flatnonzero(trade_qty)
+        fills = np.empty(len(traded), dtype=FILL_DTYPE)
+        fills['bar'] = traded
+        fills['symbol_code'] = codes[traded]
+        fills['side'] = np.sign(trade_qty[traded])
+        fills['quantity'] = np.abs(trade_qty[traded])
+        fills['price'] = exec_price[traded]
+        fills['commission'] = commission[traded]
+        fills['slippage'] = slippage_impact[traded]
+        fills['cost'] = fills['quantity'] * fills['price'] + fills['side'] * fills['commission']
+
+        portfolio_value = float(equity[-1]) if n else self.initial_capital
+        summary = build_summary(
+            self.initial_capital,
+            portfolio_value,
+            len(traded),
+            float(fills['commission'].sum()),
+            float(np.dot(fills['slippage'], fills['quantity']))
+        )
+
+        timestamps = data['timestamp'].to_numpy() if 'timestamp' in data.columns else np.arange(n)
+        self.last_results = BacktestResults(
+            initial_capital=self.initial_capital,
+            timestamps=timestamps,
+            equity=equity,
+            gross_exposure=gross_exposure,
+            fills=fills,
+            symbols=list(symbols),
+            summary=summary
+        )
+        return self.last_results
+
+    def generate_report(self):
+        """Generate Performance Report with TCA for the last run."""
+        print_tca_report(self.last_results.summary)
+
+def _forward_fill(values: np.ndarray) -> np.ndarray:
+    """Forward-fill NaNs, starting flat (0.0) before the first signal."""
+    mask = ~np.isnan(values)
+    idx = np.where(mask, np.arange(len(values)), 0)
+    np.maximum.accumulate(idx, out=idx)
+    filled = values[idx]
+    return np.where(np.isnan(filled), 0.0, filled)
@@ -0,0 +1,356 @@
+import asyncio
+import itertools
+import json
+import logging
+import time
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence
+from core.market_cache import symbol_key
+
+logger = logging.getLogger(__name__)
+
+def parse_agg_trade(payload: Dict) -> Dict:
+    """Binance aggTrade payload (or an already-normalised trade) -> {symbol, ts, price, quantity}."""
+    if 'price' in payload:
+        return payload
+    return {
+        'symbol': payload['s'],
+        'ts': payload['T'] / 1000.0,
+        'price': float(payload['p']),
+        'quantity': float(payload['q'])
+    }
+
+def load_trade_recording(path: str) -> Iterator[Dict]:
+    """
+    Read a recorded trade stream: one JSON message per line, either raw aggTrade
+    payloads or combined-stream envelopes ({"stream": ..., "data": {...}}).
+    """
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            message = json.loads(line)
+            payload = message.get('data', message)
+            if payload.get('e', 'aggTrade') == 'aggTrade':
+                yield parse_agg_trade(payload)
+
+class VWAPExecutor:
+    """
+    Event-driven VWAP / POV execution for one parent order.
+
+    Market volume is accumulated per time bucket from the live trade stream (trade
+    timestamps drive the clock, so a recorded stream replays deterministically).
+    VWAP mode targets the cumulative volume profile: within a bucket, progress is
+    measured by realized bucket volume against a forecast (realized volume so far
+    scaled by the profile), falling back to elapsed time before a forecast exists.
+    POV mode targets `participation_rate` of market volume since start. Child orders
+    are limit orders at the last traded price via ExecutionEngine.place_limit_order,
+    so no REST price lookup is made per child.
+
+    The schedule is paced by committed quantity (filled plus still working), while
+    completion and participation count fills only, read from the engine's
+    OrderTracker. At each bucket boundary children from earlier buckets that are
+    still working are canceled; their unfilled quantity returns to the schedule and
+    is re-sent at the current price. After the profile ends the rest is swept the
+    same way until filled or the caller's timeout.
+    """
+
+    def __init__(
+        self,
+        engine,
+        symbol: str,
+        side: str,
+        total_amount: float,
+        volume_profile: Optional[Sequence[float]] = None,
+        bucket_seconds: float = 60.0,
+        participation_rate: Optional[float] = None,
+        max_participation: Optional[float] = None,
+        min_child: float = 0.0,
+        price_offset_bps: float = 0.0
+    ):
+        """
+        Args:
+            engine (ExecutionEngine): Places and cancels the child orders; its `orders` tracker supplies fills.
+            symbol (str): Trading pair as passed to the exchange (e.g. 'BTC/USDT').
+            side (str): 'buy' or 'sell'.
+            total_amount (float): Parent order quantity.
+            volume_profile (Sequence[float]): Expected share of volume per bucket (VWAP mode).
+            bucket_seconds (float): Length of one profile bucket (also the re-pricing interval).
+            participation_rate (float): Share of market volume to trade (POV mode, no profile).
+            max_participation (float): Optional cap on executed / market volume in VWAP mode.
+            min_child (float): Smallest child order worth sending.
+            price_offset_bps (float): Limit price offset from the last trade (positive = more aggressive).
+        """
+        if volume_profile is None and participation_rate is None:
+            raise ValueError("Either volume_profile (VWAP) or participation_rate (POV) is required")
+        self.engine = engine
+        self.symbol = symbol
+        self.side = side
+        self.total_amount = total_amount
+        self.bucket_seconds = bucket_seconds
+        self.participation_rate = participation_rate
+        self.max_participation = max_participation
+        self.min_child = min_child
+        self.price_offset_bps = price_offset_bps
+
+        if volume_profile is not None:
+            profile = [max(float(share), 0.0) for share in volume_profile]
+            total = sum(profile)
+            self.profile = [share / total for share in profile]
+            self.cumulative_profile = [0.0] + list(itertools.accumulate(self.profile))
+        else:
+            self.profile = None
+            self.cumulative_profile = None
+
+        self.start_ts: Optional[float] = None
+        self.bucket_index = 0
+        self.bucket_volume: List[float] = [0.0] * len(self.profile) if self.profile else []
+        self.market_volume = 0.0
+        self.last_price = 0.0
+        self.submitted = 0.0 # Committed: filled plus working (or in flight) child quantity
+        self.filled = 0.0
+        self.canceled_children = 0
+        self.children: List[Dict] = []
+        self.done = asyncio.Event()
+        self._working: List[Dict] = [] # Children resting on the exchange
+        self._closed_filled = 0.0 # Fills of children that are no longer working
+        self._pending = set()
+
+    @property
+    def remaining(self) -> float:
+        """Quantity not yet committed to a child order."""
+        return max(self.total_amount - self.submitted, 0.0)
+
+    @property
+    def unfilled(self) -> float:
+        return max(self.total_amount - self.filled, 0.0)
+
+    def on_trade(self, trade: Dict):
+        """Trade listener (sync; registered with CEXFeed.add_trade_listener)."""
+        if self.done.is_set():
+            return
+        ts = trade['ts']
+        if self.start_ts is None:
+            self.start_ts = ts
+        self.last_price = trade['price']
+        self.market_volume += trade['quantity']
+
+        index = int((ts - self.start_ts) // self.bucket_seconds)
+        if index != self.bucket_index:
+            self.bucket_index = index
+            self._cancel_stale(index)
+        self._sync()
+
+        if self.profile is not None:
+            if index >= len(self.profile):
+                target = self.total_amount # Schedule over: sweep the rest
+            else:
+                self.bucket_volume[index] += trade['quantity']
+                target = self.total_amount * self._vwap_fraction(index, ts)
+                if self.max_participation:
+                    target = min(target, self.max_participation * self.market_volume)
+        else:
+            target = min(self.participation_rate * self.market_volume, self.total_amount)
+
+        child = target - self.submitted
+        if child >= max(self.min_child, 1e-12) or (child > 0 and target >= self.total_amount):
+            self._send_child(child)
+        if self.filled >= self.total_amount - 1e-12:
+            self._finish()
+
+    def _vwap_fraction(self, index: int, ts: float) -> float:
+        """Scheduled share of the parent order done by `ts` (in profile bucket `index`)."""
+        share = self.profile[index]
+        completed = self.cumulative_profile[index]
+        if completed > 0:
+            forecast_total = sum(self.bucket_volume[:index]) / completed
+            forecast_bucket = forecast_total * share
+            progress = min(self.bucket_volume[index] / forecast_bucket, 1.0) if forecast_bucket > 0 else 1.0
+        else:
+            progress = min((ts - self.start_ts - index * self.bucket_seconds) / self.bucket_seconds, 1.0)
+        return completed + share * progress
+
+    def _send_child(self, amount: float):
+        amount = min(amount, self.remaining)
+        if amount <= 0 or self.last_price <= 0:
+            return
+        offset = self.last_price * self.price_offset_bps / 10000.0
+        price = self.last_price + offset if self.side == 'buy' else self.last_price - offset
+        # Reserve the quantity now so the schedule stays deterministic while the order is in flight
+        self.submitted += amount
+        child = {'bucket': self.bucket_index, 'amount': amount, 'price': price, 'order': None, 'tracked': None, 'filled': 0.0, 'fill_price': 0.0, 'canceling': False}
+        self.children.append(child)
+        self._spawn(self._place(child))
+
+    def _spawn(self, coro):
+        task = asyncio.get_running_loop().create_task(coro)
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+
+    async def _place(self, child: Dict):
+        order = await self.engine.place_limit_order(self.symbol, self.side, child['amount'], child['price'], strategy='vwap' if self.profile else 'pov')
+        child['order'] = order
+        if order is None:
+            # Rejected (risk gate / exchange): release the reservation, retried on later trades
+            self.submitted -= child['amount']
+            if self.done.is_set() and self.remaining > 0:
+                logger.warning(f"VWAP child of {child['amount']} {self.symbol} failed after schedule end.")
+            return
+        tracked = self.engine.orders.get(str(order['id']))
+        if tracked is None:
+            # Already terminal in the placement response (e.g. fully filled) and evicted from the tracker
+            child['filled'] = min(order.get('filled') or 0.0, child['amount'])
+            child['fill_price'] = order.get('average') or child['price']
+            self._closed_filled += child['filled']
+            self.submitted -= child['amount'] - child['filled']
+        else:
+            child['tracked'] = tracked
+            self._working.append(child)
+        self._sync()
+
+    def _sync(self):
+        """Collect fills of working children; ended ones return their unfilled quantity to the schedule."""
+        filled = self._closed_filled
+        working = []
+        for child in self._working:
+            order = child['tracked']
+            child['filled'] = order.filled
+            child['fill_price'] = order.avg_fill_price
+            if order.is_terminal:
+                self._closed_filled += order.filled
+                self.submitted -= order.remaining
+            else:
+                working.append(child)
+            filled += order.filled
+        self._working = working
+        self.filled = filled
+
+    def _cancel_stale(self, bucket: int):
+        """Cancel working children placed before `bucket`; the schedule re-sends them at the current price."""
+        for child in self._working:
+            if child['bucket'] < bucket and not child['canceling']:
+                child['canceling'] = True
+                self._spawn(self._cancel(child))
+
+    async def _cancel(self, child: Dict):
+        if await self.engine.cancel_order(child['tracked'].order_id):
+            self.canceled_children += 1
+        else:
+            child['canceling'] = False # Filled meanwhile or transient error; retried next bucket
+        self._sync()
+
+    def _finish(self):
+        if not self.done.is_set():
+            self.done.set()
+            logger.info(f"{'VWAP' if self.profile else 'POV'} {self.symbol}: {self.filled}/{self.total_amount} filled ({self.submitted} committed) in {len(self.children)} children.")
+
+    async def wait(self, timeout: Optional[float] = None):
+        """Wait until the parent is filled (or the timeout), then cancel children still working."""
+        try:
+            await asyncio.wait_for(self.done.wait(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Execution for {self.symbol} timed out with {self.unfilled} unfilled.")
+            self._finish()
+        if self._pending:
+            await asyncio.gather(*self._pending, return_exceptions=True)
+        working = [child for child in self._working if not child['canceling']]
+        if working:
+            for child in working:
+                child['canceling'] = True
+            await asyncio.gather(*(self._cancel(child) for child in working), return_exceptions=True)
+        self._sync()
+
+    def summary(self) -> Dict:
+        self._sync()
+        placed = [child for child in self.children if child['order'] is not None]
+        quantity = sum(child['amount'] for child in placed)
+        filled = sum(child['filled'] for child in placed)
+        return {
+            'symbol': self.symbol,
+            'side': self.side,
+            'target': self.total_amount,
+            'submitted': quantity,
+            'filled': filled,
+            'children': len(placed),
+            'canceled_children': self.canceled_children,
+            'avg_limit_price': sum(child['amount'] * child['price'] for child in placed) / quantity if quantity else 0.0,
+            'avg_fill_price': sum(child['filled'] * child['fill_price'] for child in placed) / filled if filled else 0.0,
+            'market_volume': self.market_volume,
+            'participation': filled / self.market_volume if self.market_volume else 0.0
+        }
+
+class PaperExchange:
+    """
+    Minimal CCXT-shaped exchange for offline replays. Orders rest until a replayed
+    trade prints through their limit (`on_trade`), filling up to the trade's size.
+    """
+
+    def __init__(self):
+        self.orders: List[Dict] = []
+        self._open: Dict[str, Dict] = {}
+
+    async def create_order(self, symbol, type, side, amount, price=None, params=None):
+        order = {
+            'id': str(len(self.orders) + 1),
+            'symbol': symbol,
+            'type': type,
+            'side': side,
+            'amount': amount,
+            'price': price,
+            'status': 'open',
+            'filled': 0.0,
+            'cost': 0.0,
+            'timestamp': int(time.time() * 1000)
+        }
+        self.orders.append(order)
+        self._open[order['id']] = order
+        return dict(order)
+
+    async def cancel_order(self, order_id, symbol=None):
+        order = self._open.pop(order_id, None)
+        if order is None:
+            raise ValueError(f"Order {order_id} is not open")
+        order['status'] = 'canceled'
+        return dict(order)
+
+    def on_trade(self, trade: Dict) -> List[Dict]:
+        """Fill open orders the trade crosses, oldest first; returns their updated order dicts."""
+        key = symbol_key(trade['symbol'])
+        available = trade['quantity']
+        updates = []
+        for order in list(self._open.values()):
+            if available <= 0:
+                break
+            if symbol_key(order['symbol']) != key:
+                continue
+            crossed = trade['price'] <= order['price'] if order['side'] == 'buy' else trade['price'] >= order['price']
+            if not crossed:
+                continue
+            quantity = min(order['amount'] - order['filled'], available)
+            available -= quantity
+            order['filled'] += quantity
+            order['cost'] += quantity * order['price']
+            if order['filled'] >= order['amount'] - 1e-12:
+                order['status'] = 'closed'
+                del self._open[order['id']]
+            updates.append(dict(order))
+        return updates
+
+async def replay_trades(executor: VWAPExecutor, trades: Iterable[Dict], exchange: Optional[PaperExchange] = None) -> Dict:
+    """
+    Drive an executor from recorded trades (e.g. load_trade_recording(path)) and return
+    its summary. Child placements run between trades exactly as they would live; with a
+    PaperExchange, each trade first fills the resting children it crosses.
+    """
+    for trade in trades:
+        trade = parse_agg_trade(trade)
+        if exchange is not None:
+            for update in exchange.on_trade(trade):
+                executor.engine.on_order_update(update)
+        executor.on_trade(trade)
+        await asyncio.sleep(0)
+        if executor.done.is_set():
+            break
+    executor._finish()
+    await executor.wait()
+    return executor.summary()
@@ -0,0 +1,193 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from datetime import datetime, timezone
+from typing import Deque, Dict, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+MARKET_DATA_COLUMNS = ('time', 'symbol', 'price', 'volume', 'source')
+
+OVERFLOW_POLICIES = ('drop_oldest', 'drop_newest', 'block')
+
+def market_data_row(symbol: str, price: float, volume: float, event_time_ms: int, source: str = 'binance_ws') -> Tuple:
+    """One market_data row stamped with the exchange event time (ms since epoch)."""
+    return (datetime.fromtimestamp(event_time_ms / 1000.0, tz=timezone.utc), symbol, price, volume, source)
+
+class BatchWriter:
+    """
+    Write-behind buffer for one TimescaleDB table.
+
+    Producers enqueue row tuples synchronously (`add`) or with backpressure (`put`);
+    a single background task writes them with `copy_records_to_table` whenever
+    `batch_size` rows are waiting or `flush_interval_ms` has passed, so the number of
+    tasks and pool connections in use stays constant however fast rows arrive.
+    The queue is bounded by `max_queue`; what happens when it is full is set by
+    `overflow`: 'drop_oldest', 'drop_newest', or 'block' (`put` waits for a flush,
+    `add` rejects the row).
+    """
+
+    def __init__(
+        self,
+        db,
+        table: str,
+        columns: Sequence[str],
+        batch_size: int = 1000,
+        flush_interval_ms: float = 250.0,
+        max_queue: int = 100000,
+        overflow: str = 'drop_oldest'
+    ):
+        """
+        Args:
+            db: TimescaleDB wrapper (with `.pool`); rows are kept until it is connected.
+            table (str): Target table.
+            columns (Sequence[str]): Column names matching the row tuples.
+            batch_size (int): Queued rows that trigger an immediate flush.
+            flush_interval_ms (float): Max time a row waits before being written.
+            max_queue (int): Queue bound (also caps rows kept for retry after a failed flush).
+            overflow (str): One of OVERFLOW_POLICIES.
+        """
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"overflow must be one of {OVERFLOW_POLICIES}")
+        self.db = db
+        self.table = table
+        self.columns = list(columns)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval_ms / 1000.0
+        self.max_queue = max_queue
+        self.overflow = overflow
+        self._queue: Deque[Tuple] = deque()
+        self._wake = asyncio.Event()
+        self._space = asyncio.Event()
+        self._space.set()
+        self._task: Optional[asyncio.Task] = None
+        self.metrics = {
+            'rows_queued': 0,
+            'rows_written': 0,
+            'rows_dropped': 0,
+            'rows_rejected': 0,
+            'flushes': 0,
+            'flush_errors': 0,
+            'flush_seconds': 0.0,
+            'last_flush_ms': 0.0,
+            'max_flush_ms': 0.0,
+            'max_queue_depth': 0
+        }
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._queue)
+
+    # --- Producers ---
+
+    def add(self, row: Tuple) -> bool:
+        """Enqueue without waiting. Returns False if the row was dropped or rejected."""
+        queue = self._queue
+        if len(queue) >= self.max_queue:
+            if self.overflow == 'drop_oldest':
+                queue.popleft()
+                self.metrics['rows_dropped'] += 1
+            elif self.overflow == 'drop_newest':
+                self.metrics['rows_dropped'] += 1
+                return False
+            else:
+                self.metrics['rows_rejected'] += 1
+                self._space.clear()
+                return False
+        queue.append(row)
+        self.metrics['rows_queued'] += 1
+        depth = len(queue)
+        if depth > self.metrics['max_queue_depth']:
+            self.metrics['max_queue_depth'] = depth
+        if depth >= self.batch_size:
+            self._wake.set()
+        return True
+
+    async def put(self, row: Tuple) -> bool:
+        """Enqueue, waiting for queue space under the 'block' policy (backpressure)."""
+        if self.overflow == 'block':
+            while len(self._queue) >= self.max_queue:
+                self._space.clear()
+                self._wake.set()
+                await self._space.wait()
+        return self.add(row)
+
+    # --- Flushing ---
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._flush_loop())
+
+    async def flush(self):
+        """Write everything queued so far in one COPY."""
+        if not self._queue or self.db is None or self.db.pool is None:
+            return
+        rows = list(self._queue)
+        self._queue.clear()
+        self._space.set()
+        started = time.perf_counter()
+        try:
+            async with self.db.pool.acquire() as conn:
+                await conn.copy_records_to_table(self.table, records=rows, columns=self.columns)
+        except asyncio.CancelledError:
+            self._requeue(rows, trim=False) # Shutdown mid-write: close() retries them all
+            raise
+        except Exception as e:
+            self.metrics['flush_errors'] += 1
+            logger.error(f"{self.table} flush failed ({len(rows)} rows kept for retry): {e}")
+            self._requeue(rows)
+            return
+        elapsed = time.perf_counter() - started
+        self.metrics['flushes'] += 1
+        self.metrics['rows_written'] += len(rows)
+        self.metrics['flush_seconds'] += elapsed
+        self.metrics['last_flush_ms'] = elapsed * 1000
+        if elapsed * 1000 > self.metrics['max_flush_ms']:
+            self.metrics['max_flush_ms'] = elapsed * 1000
+
+    def _requeue(self, rows, trim: bool = True):
+        """Put failed rows back in front of newer ones, keeping the newest max_queue rows if `trim`."""
+        self._queue.extendleft(reversed(rows))
+        excess = len(self._queue) - self.max_queue if trim else 0
+        if excess > 0:
+            for _ in range(excess):
+                self._queue.popleft()
+            self.metrics['rows_dropped'] += excess
+        if len(self._queue) >= self.max_queue:
+            self._space.clear()
+
+    async def _flush_loop(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            errors = self.metrics['flush_errors']
+            try:
+                await self.flush()
+                if self.metrics['flush_errors'] != errors:
+                    await asyncio.sleep(self.flush_interval) # Back off instead of retrying per row
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"{self.table} writer error: {e}")
+
+    async def close(self):
+        """Stop the background task and write what is left."""
+        if self._task:
+            task, self._task = self._task, None
+            task.cancel()
+            try:
+                await task # Lets an in-flight COPY requeue its rows first
+            except asyncio.CancelledError:
+                pass
+        await self.flush()
+
+    def stats(self) -> Dict:
+        flushes = self.metrics['flushes']
+        stats = dict(self.metrics)
+        stats['queue_depth'] = len(self._queue)
+        stats['avg_flush_ms'] = self.metrics['flush_seconds'] / flushes * 1000 if flushes else 0.0
+        return stats
@@ -1,13 +1,55 @@
 import redis.asyncio as redis
+import asyncio
 import logging
 import json
+import struct
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import numpy as np
 from config.config import settings
 
 logger = logging.getLogger(__name__)
 
+# Binary order-book snapshot: header followed by float64 [price, qty] rows, bids then asks.
+# Header: magic, format version, sequence (exchange update id), event time (ms), bid levels, ask levels;
+# padded to 32 bytes so the float64 body stays 8-byte aligned for np.frombuffer.
+OB_MAGIC = b'OB'
+OB_FORMAT_VERSION = 1
+OB_HEADER = struct.Struct('<2sBxqqII4x')
+
+def encode_order_book(bids, asks, seq: int = 0, ts: Optional[int] = None) -> bytes:
+    """Pack [price, qty] ladders (lists of strings/floats or (n, 2) arrays) into the binary snapshot format."""
+    bids = np.ascontiguousarray(np.asarray(bids, dtype=np.float64).reshape(-1, 2))
+    asks = np.ascontiguousarray(np.asarray(asks, dtype=np.float64).reshape(-1, 2))
+    if ts is None:
+        ts = int(time.time() * 1000)
+    return OB_HEADER.pack(OB_MAGIC, OB_FORMAT_VERSION, seq, ts, len(bids), len(asks)) + bids.tobytes() + asks.tobytes()
+
+def decode_order_book(blob: bytes) -> Dict:
+    """
+    Unpack a binary snapshot. `bids`/`asks` are read-only (n, 2) float64 views over `blob`.
+
+    Raises:
+        ValueError: If the blob is not a snapshot of a supported version.
+    """
+    if len(blob) < OB_HEADER.size:
+        raise ValueError("Order book blob shorter than its header")
+    magic, version, seq, ts, n_bids, n_asks = OB_HEADER.unpack_from(blob)
+    if magic != OB_MAGIC or version != OB_FORMAT_VERSION:
+        raise ValueError(f"Unsupported order book encoding (magic={magic!r}, version={version})")
+    body = np.frombuffer(blob, dtype=np.float64, count=2 * (n_bids + n_asks), offset=OB_HEADER.size).reshape(-1, 2)
+    return {'version': version, 'lastUpdateId': seq, 'E': ts, 'bids': body[:n_bids], 'asks': body[n_bids:]}
+
 class RedisClient:
-    def __init__(self):
+    def __init__(self, binary_order_books: bool = True):
+        """
+        Args:
+            binary_order_books (bool): Store order books in the binary snapshot format
+                (False writes the legacy JSON strings). Reads accept both.
+        """
         self.redis = None
+        self.raw = None # Same server without response decoding, for binary values
+        self.binary_order_books = binary_order_books
 
     async def connect(self):
         try:
@@ -17,22 +59,177 @@ class RedisClient:
                 db=settings.REDIS_DB,
                 decode_responses=True
             )
+            self.raw = redis.Redis(
+                host=settings.REDIS_HOST,
+                port=settings.REDIS_PORT,
+                db=settings.REDIS_DB,
+                decode_responses=False
+            )
             await self.redis.ping()
             logger.info("Connected to Redis")
         except Exception as e:
             logger.error(f"Failed to connect to Redis: {e}")
             raise
 
+    def _encode_book(self, data: dict):
+        if not self.binary_order_books or self.raw is None:
+            return json.dumps(data)
+        bids = data.get('bids', data.get('b', []))
+        asks = data.get('asks', data.get('a', []))
+        return encode_order_book(bids, asks, data.get('lastUpdateId', data.get('u', 0)), data.get('E'))
+
+    def _decode_book(self, blob) -> Optional[Dict]:
+        if blob is None:
+            return None
+        if isinstance(blob, bytes) and blob[:2] == OB_MAGIC:
+            return decode_order_book(blob)
+        return json.loads(blob) # Legacy / JSON-mode entries
+
     async def set_order_book(self, symbol: str, data: dict):
-        await self.redis.set(f"ob:{symbol}", json.dumps(data))
+        await self.set_order_books({symbol: data})
+
+    async def set_order_books(self, books: Dict[str, dict]):
+        """Write several order books in one pipelined round trip."""
+        client = self.raw if self.binary_order_books and self.raw is not None else self.redis
+        pipe = client.pipeline(transaction=False)
+        for symbol, data in books.items():
+            pipe.set(f"ob:{symbol}", self._encode_book(data))
+        await pipe.execute()
+
+    async def get_order_book(self, symbol: str) -> Optional[Dict]:
+        """Latest book for a symbol; binary entries come back with (n, 2) float64 arrays."""
+        client = self.raw if self.raw is not None else self.redis
+        return self._decode_book(await client.get(f"ob:{symbol}"))
 
-    async def get_order_book(self, symbol: str):
-        data = await self.redis.get(f"ob:{symbol}")
-        return json.loads(data) if data else None
+    async def get_order_books(self, symbols: List[str]) -> Dict[str, Optional[Dict]]:
+        client = self.raw if self.raw is not None else self.redis
+        blobs = await client.mget([f"ob:{symbol}" for symbol in symbols])
+        return {symbol: self._decode_book(blob) for symbol, blob in zip(symbols, blobs)}
 
     async def close(self):
         if self.redis:
             await self.redis.close()
+            if self.raw:
+                await self.raw.close()
             logger.info("Redis connection closed")
 
+class CoalescingWriter:
+    """
+    Latest-value-wins write buffer for hot market-data keys.
+
+    Writers call `set` / `set_json` / `set_order_book` synchronously; only the newest
+    value per key is kept until the next flush, which sends everything pending as
+    one MSET. Values are serialized at flush time, so superseded updates cost neither
+    a round trip nor an encode. With N updates to K keys per window, Redis sees one
+    command instead of N.
+    """
+
+    def __init__(self, client: RedisClient, flush_interval_ms: float = 50.0, max_pending: int = 10000):
+        """
+        Args:
+            client (RedisClient): Connected client (binary values go through its raw connection).
+            flush_interval_ms (float): Flush window.
+            max_pending (int): Distinct pending keys that trigger an early flush.
+        """
+        self.client = client
+        self.flush_interval = flush_interval_ms / 1000.0
+        self.max_pending = max_pending
+        self._pending: Dict[str, Tuple[Callable[[Any], Any], Any]] = {}
+        self._wake = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self.metrics = {
+            'writes': 0,
+            'keys_coalesced': 0,
+            'keys_flushed': 0,
+            'flushes': 0,
+            'round_trips_saved': 0,
+            'flush_errors': 0,
+            'last_flush_ms': 0.0,
+            'max_flush_ms': 0.0
+        }
+
+    def _put(self, key: str, encoder: Callable[[Any], Any], value: Any):
+        pending = self._pending
+        if key in pending:
+            self.metrics['keys_coalesced'] += 1
+        pending[key] = (encoder, value)
+        self.metrics['writes'] += 1
+        if len(pending) >= self.max_pending:
+            self._wake.set()
+
+    def set(self, key: str, value):
+        """Queue an already-encoded value (str or bytes)."""
+        self._put(key, None, value)
+
+    def set_json(self, key: str, value):
+        self._put(key, json.dumps, value)
+
+    def set_order_book(self, symbol: str, data: dict):
+        """Queue `ob:{symbol}` in the client's order-book encoding (binary or JSON)."""
+        self._put(f"ob:{symbol}", self.client._encode_book, data)
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._flush_loop())
+
+    async def flush(self):
+        """Send every pending key in one MSET."""
+        client = self.client.raw if self.client.raw is not None else self.client.redis
+        if not self._pending or client is None:
+            return
+        batch, self._pending = self._pending, {}
+        started = time.perf_counter()
+        try:
+            mapping = {key: value if encoder is None else encoder(value) for key, (encoder, value) in batch.items()}
+            await client.mset(mapping)
+        except asyncio.CancelledError:
+            self._restore(batch)
+            raise
+        except Exception as e:
+            self.metrics['flush_errors'] += 1
+            logger.error(f"Redis coalesced flush of {len(batch)} keys failed: {e}")
+            self._restore(batch)
+            return
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        self.metrics['flushes'] += 1
+        self.metrics['keys_flushed'] += len(batch)
+        self.metrics['round_trips_saved'] = self.metrics['writes'] - self.metrics['flushes']
+        self.metrics['last_flush_ms'] = elapsed_ms
+        if elapsed_ms > self.metrics['max_flush_ms']:
+            self.metrics['max_flush_ms'] = elapsed_ms
+
+    def _restore(self, batch: Dict):
+        """Put a failed batch back without overwriting newer values written meanwhile."""
+        for key, entry in batch.items():
+            self._pending.setdefault(key, entry)
+
+    async def _flush_loop(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            try:
+                await self.flush()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Redis writer error: {e}")
+
+    async def close(self):
+        """Stop the flusher and send what is pending."""
+        if self._task:
+            task, self._task = self._task, None
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        await self.flush()
+
 redis_client = RedisClient()
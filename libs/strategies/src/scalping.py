@@ -1,66 +1,55 @@
 from strategies.base_strategy import BaseStrategy
-from core.brain import Brain
-from core.feature_engineering import FeatureEngineer
-from config.config import settings
-import pandas as pd
+from core.brain import Brain, BrainBatcher
+from core.feature_engineering import StreamingFeatureEngineer
+from core.side_input_cache import SideInputCache
 import logging
-import redis
-import json
+from typing import Optional
 
 logger = logging.getLogger(__name__)
 
 class ScalpingStrategy(BaseStrategy):
-    def __init__(self):
+    def __init__(self, brain_batcher: Optional[BrainBatcher] = None):
+        """
+        Args:
+            brain_batcher (BrainBatcher): Shared micro-batcher, so many strategy instances
+                                          are served by one batched forward pass.
+        """
         super().__init__("Scalping Alpha")
-        self.brain = Brain()
-        self.fe = FeatureEngineer()
-        self.data_buffer = []
+        self.brain = brain_batcher.brain if brain_batcher else Brain()
+        self.brain_batcher = brain_batcher
+        # Incremental indicators keep their own rolling state, so no raw tick history is needed
+        self.fe = StreamingFeatureEngineer()
         
-        # Redis Connection for On-Chain Data
-        try:
-            self.redis_client = redis.Redis(
-                host=settings.REDIS_HOST,
-                port=settings.REDIS_PORT,
-                db=settings.REDIS_DB,
-                decode_responses=True
-            )
-        except Exception as e:
-            logger.error(f"Failed to connect to Redis: {e}")
-            self.redis_client = None
+        # On-Chain Data, mirrored from Redis in the background (no I/O on the tick path)
+        self.side_inputs = SideInputCache(["whale_sentiment"])
 
     async def on_tick(self, market_data):
-        # Accumulate data
-        self.data_buffer.append(market_data)
-        if len(self.data_buffer) > 50:
-            self.data_buffer.pop(0)
-        
-        # Convert to DataFrame
-        df = pd.DataFrame(self.data_buffer)
-        
-        # Feature Engineering
-        features = self.fe.calculate_features(df)
+        if not self.side_inputs.running:
+            try:
+                await self.side_inputs.start()
+            except Exception as e:
+                logger.error(f"Failed to start side input cache: {e}")
+
+        # Feature Engineering (incremental, O(1) per tick)
+        features = self.fe.update(market_data)
         
-        if not features.empty:
+        if features is not None:
             signal = await self.generate_signal(features)
             return signal
         return 0
 
     async def generate_signal(self, features):
-        # 1. Fetch Whale Sentiment from Redis
-        whale_sentiment_score = 0
-        if self.redis_client:
-            try:
-                data = self.redis_client.get("whale_sentiment")
-                if data:
-                    # Assuming data is JSON or float string
-                    # If it's a simple float string:
-                    whale_sentiment_score = float(data)
-            except Exception as e:
-                logger.warning(f"Could not read whale sentiment: {e}")
+        # 1. Whale Sentiment from the local cache (neutral if missing or stale)
+        whale_sentiment_score = self.side_inputs.get("whale_sentiment", 0)
+        if not isinstance(whale_sentiment_score, (int, float)):
+            whale_sentiment_score = 0
 
         # 2. Use ML Brain
         # Pass on-chain data to brain if needed, or just use it to adjust the output
-        action = self.brain.predict(features)
+        if self.brain_batcher:
+            action = await self.brain_batcher.predict(features)
+        else:
+            action = self.brain.predict(features)
         
         # 3. Adjust Logic based on Whale Sentiment
         # If Whale Sentiment is strongly positive, override HOLD/SELL to BUY or confirm BUY